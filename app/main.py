@@ -6,13 +6,17 @@ from fastapi.staticfiles import StaticFiles
 from starlette.middleware.sessions import SessionMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.middleware.trustedhost import TrustedHostMiddleware
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from itsdangerous import BadSignature
 
 from pathlib import Path
 from uuid import uuid4
 from datetime import datetime, timezone, timedelta
 import sqlite3
 from sqlalchemy import create_engine, text
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 import os
 import hashlib
 import secrets
@@ -24,10 +28,16 @@ import base64
 import hmac
 import struct
 import time
-import random
-import string
-import shutil
 import re
+import queue
+import threading
+import asyncio
+import functools
+import contextlib
+import atexit
+import inspect
+import logging
+from concurrent.futures import ThreadPoolExecutor
 
 # Security utilities
 from app.security import (
@@ -37,9 +47,6 @@ from app.security import (
 )
 from app.referral_ingest import parse_referral_attachment
 
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.pdfgen import canvas
 import urllib.request
 import urllib.parse
 import json as _json
@@ -47,6 +54,9 @@ import json as _json
 # Azure Blob Storage
 try:
     from azure.storage.blob import BlobServiceClient, BlobSasPermissions, generate_blob_sas
+    from azure.core.pipeline.transport import RequestsTransport
+    import requests
+    from requests.adapters import HTTPAdapter
 except ImportError:
     BlobServiceClient = None
     print("[WARNING] azure-storage-blob not installed, blob storage disabled")
@@ -65,14 +75,32 @@ DB_PATH = Path(os.environ.get("DB_PATH", str(BASE_DIR / "hub.db")))
 UPLOAD_DIR = Path(os.environ.get("UPLOAD_DIR", str(BASE_DIR / "uploads")))
 UPLOAD_DIR.mkdir(exist_ok=True, parents=True)
 
+SQLITE_CONSTRAINT_UNIQUE = getattr(sqlite3, "SQLITE_CONSTRAINT_UNIQUE", 2067)
+
 # Storage TTL constants (in days)
 REFERRAL_FILE_TTL_DAYS = int(os.environ.get("REFERRAL_FILE_TTL_DAYS", "7"))   # delete uploaded file after 7 days
 CASE_RECORD_TTL_DAYS   = int(os.environ.get("CASE_RECORD_TTL_DAYS",   "28"))  # keep case record/PDF for 28 days
 
+# Routine per-request messages go through logging so they cost nothing when LOG_LEVEL filters them.
+# Only the app's own "radflow" logger is configured here; the root logger (and with it the Azure
+# SDK's per-request HTTP logging) is left to the server's defaults.
+app_logger = logging.getLogger("radflow")
+if not app_logger.handlers:
+    _log_handler = logging.StreamHandler()
+    _log_handler.setFormatter(logging.Formatter("%(levelname)s [%(name)s] %(message)s"))
+    app_logger.addHandler(_log_handler)
+app_logger.setLevel(getattr(logging, (os.environ.get("LOG_LEVEL") or "INFO").strip().upper(), logging.INFO))
+app_logger.propagate = False
+blob_logger = logging.getLogger("radflow.blob")
+
 # Azure Blob Storage config
 AZURE_STORAGE_CONNECTION_STRING = os.environ.get("AZURE_STORAGE_CONNECTION_STRING", "")
 REFERRAL_BLOB_CONTAINER = os.environ.get("REFERRAL_BLOB_CONTAINER", "referrals")
 BLOB_STORAGE_ENABLED = bool(AZURE_STORAGE_CONNECTION_STRING and BlobServiceClient)
+# Idle connections kept open to the storage account for reuse. Sized above the threadpool (40
+# threads by default) so every concurrent blob call can return its connection to the pool.
+BLOB_MAX_CONNECTIONS = max(1, int(os.environ.get("BLOB_MAX_CONNECTIONS", "64")))
+BLOB_TRANSFER_CHUNK_BYTES = 4 * 1024 * 1024
 
 if BLOB_STORAGE_ENABLED:
     print(f"[startup] Azure Blob Storage ENABLED (container={REFERRAL_BLOB_CONTAINER})")
@@ -82,14 +110,13 @@ else:
 # SMTP notification settings
 SMTP_HOST = os.environ.get("SMTP_HOST", "")
 SMTP_PORT = int(os.environ.get("SMTP_PORT", "587"))
+SMTP_USER = os.environ.get("SMTP_USER", "")
+SMTP_PASSWORD = os.environ.get("SMTP_PASSWORD", "") or os.environ.get("SMTP_PASS", "")
+SMTP_FROM = os.environ.get("SMTP_FROM") or SMTP_USER
 
 # iRefer API settings
 IREFER_API_KEY = os.environ.get("IREFER_API_KEY", "")
 _irefer_guidelines_cache: list = []  # in-memory cache, populated on first request
-SMTP_USER = os.environ.get("SMTP_USER", "")
-SMTP_PASSWORD = os.environ.get("SMTP_PASSWORD", "") or os.environ.get("SMTP_PASS", "")
-SMTP_PASS = SMTP_PASSWORD
-SMTP_FROM = os.environ.get("SMTP_FROM", SMTP_USER)
 
 # Log paths at startup for debugging persistence issues
 print(f"[startup] BASE_DIR={BASE_DIR}, DB_PATH={DB_PATH}, UPLOAD_DIR={UPLOAD_DIR}")
@@ -123,22 +150,31 @@ def generate_case_ids(count: int, institution_id: int | None = None) -> list[str
     date_prefix = datetime.now(timezone.utc).strftime("%Y%m%d")
     inst = get_institution(int(institution_id), None) if institution_id else None
     inst_code = _institution_case_code(inst.get("name") if inst else None, institution_id) if institution_id else None
-    like_pattern = f"{date_prefix}-{inst_code}-%" if inst_code else f"{date_prefix}-%"
+    id_prefix = f"{date_prefix}-{inst_code}-" if inst_code else f"{date_prefix}-"
 
+    # The highest trailing "-NNNN" sequence is computed by the database in one aggregate,
+    # rather than shipping every id for the day back here.
     conn = get_db()
     try:
-        rows = conn.execute("SELECT id FROM cases WHERE id LIKE ?", (like_pattern,)).fetchall()
+        if using_postgres():
+            max_seq = conn.execute_scalar(
+                "SELECT MAX(CAST(substring(id from '-([0-9]+)$') AS INTEGER)) AS max_seq "
+                "FROM cases WHERE id LIKE ?",
+                (f"{id_prefix}%",),
+            )
+        else:
+            # GLOB is case-sensitive, so SQLite can range-scan the primary key for the prefix.
+            max_seq = conn.execute_scalar(
+                "SELECT MAX(CAST(substr(id, length(rtrim(id, '0123456789')) + 1) AS INTEGER)) AS max_seq "
+                "FROM cases WHERE id GLOB ? "
+                "AND length(rtrim(id, '0123456789')) < length(id) "
+                "AND substr(rtrim(id, '0123456789'), -1) = '-'",
+                (f"{id_prefix}*",),
+            )
     finally:
         conn.close()
 
-    max_seq = 0
-    for row in rows or []:
-        case_id = row.get("id") if isinstance(row, dict) else row[0]
-        if not case_id or "-" not in case_id:
-            continue
-        suffix = str(case_id).rsplit("-", 1)[-1]
-        if suffix.isdigit():
-            max_seq = max(max_seq, int(suffix))
+    max_seq = int(max_seq or 0)
 
     if inst_code:
         return [f"{date_prefix}-{inst_code}-{max_seq + idx + 1:04d}" for idx in range(total)]
@@ -164,41 +200,64 @@ def normalize_case_attachment(case_dict: dict) -> dict:
         return case_dict
 
     if BLOB_STORAGE_ENABLED and not str(path).startswith("/"):
-        if not blob_exists(str(path)):
-            clear_case_stored_filepath(case_dict.get("id"))
-            case_dict["stored_filepath"] = None
-        return case_dict
-
-    if not Path(path).exists():
+        missing = not blob_exists(str(path))
+    else:
+        missing = not os.path.exists(path)
+    if missing:
         clear_case_stored_filepath(case_dict.get("id"))
         case_dict["stored_filepath"] = None
     return case_dict
 
 
+# Label lookups run once per row in case tables and exports; build the maps once.
+_DECISION_LABELS = {
+    "approve": "Approved",
+    "approved": "Approved",
+    "approve with comment": "Approved with Comment",
+    "approved with comment": "Approved with Comment",
+    "reject": "Rejected",
+    "rejected": "Rejected",
+}
+_LEGACY_DECISION_LABELS = {
+    "justified": "Approved",
+    "justified with comment": "Approved with Comment",
+    "not justified": "Rejected",
+}
+_CASE_STATUS_LABELS = {
+    "pending": "Pending",
+    "vetted": "Approved",
+    "rejected": "Rejected",
+    "reopened": "Reopened",
+    "not_required": "Not Required",
+}
+_CASE_EVENT_LABELS = {
+    "CREATED": "Case Created",
+    "SUBMITTED": "Case Created",
+    "ASSIGNED": "Practitioner Assignment Updated",
+    "OPENED": "Case Opened by Practitioner",
+    "VETTED": "Decision Recorded",
+    "REJECTED": "Case Rejected",
+    "REOPENED": "Case Reopened",
+    "EDITED": "Case Edited",
+    "REPORT_SENT": "Justification Sent",
+    "JUSTIFICATION_NOT_REQUIRED": "No Justification Required",
+    "REPORT_SENT_RESET": "Justification Sent Reset",
+    "DELETED": "Case Deleted",
+    "EXAM_CATALOGUE_EXCEPTION": "Temporary Uncatalogued Exam",
+}
+
+
 def normalize_decision_label(value: str | None) -> str:
     normalized = str(value or "").strip().lower()
-    mapping = {
-        "approve": "Approved",
-        "approved": "Approved",
-        "approve with comment": "Approved with Comment",
-        "approved with comment": "Approved with Comment",
-        "reject": "Rejected",
-        "rejected": "Rejected",
-    }
-    return mapping.get(normalized, "")
+    return _DECISION_LABELS.get(normalized, "")
 
 
 def display_decision_label(value: str | None, fallback_status: str | None = None) -> str:
     normalized = normalize_decision_label(value)
     if normalized:
         return normalized
-    legacy_mapping = {
-        "justified": "Approved",
-        "justified with comment": "Approved with Comment",
-        "not justified": "Rejected",
-    }
     raw = str(value or "").strip()
-    mapped = legacy_mapping.get(raw.lower(), raw)
+    mapped = _LEGACY_DECISION_LABELS.get(raw.lower(), raw)
     if mapped:
         return mapped
     return display_case_status(fallback_status)
@@ -206,35 +265,17 @@ def display_decision_label(value: str | None, fallback_status: str | None = None
 
 def display_case_status(status_value: str | None) -> str:
     status = str(status_value or "").strip().lower()
-    mapping = {
-        "pending": "Pending",
-        "vetted": "Approved",
-        "rejected": "Rejected",
-        "reopened": "Reopened",
-        "not_required": "Not Required",
-    }
-    return mapping.get(status, status.title() if status else "")
+    label = _CASE_STATUS_LABELS.get(status)
+    if label is not None:
+        return label
+    return status.title() if status else ""
 
 
 def display_case_event_label(event_type_value: str | None) -> str:
     event_type = str(event_type_value or "").strip().upper()
-    mapping = {
-        "CREATED": "Case Created",
-        "SUBMITTED": "Case Created",
-        "ASSIGNED": "Practitioner Assignment Updated",
-        "OPENED": "Case Opened by Practitioner",
-        "VETTED": "Decision Recorded",
-        "REJECTED": "Case Rejected",
-        "REOPENED": "Case Reopened",
-        "EDITED": "Case Edited",
-        "REPORT_SENT": "Justification Sent",
-        "JUSTIFICATION_NOT_REQUIRED": "No Justification Required",
-        "REPORT_SENT_RESET": "Justification Sent Reset",
-        "DELETED": "Case Deleted",
-        "EXAM_CATALOGUE_EXCEPTION": "Temporary Uncatalogued Exam",
-    }
-    if event_type in mapping:
-        return mapping[event_type]
+    label = _CASE_EVENT_LABELS.get(event_type)
+    if label is not None:
+        return label
     if not event_type:
         return ""
     return event_type.replace("_", " ").title()
@@ -272,49 +313,79 @@ def is_inline_previewable(filename: str | None) -> bool:
     return any(name.endswith(ext) for ext in previewable_exts)
 
 
+ATTACHMENT_PREVIEW_HEAD = '<!doctype html><html><head><meta charset="utf-8"><link rel="stylesheet" href="/static/css/attachment-preview.css"></head>'
+ATTACHMENT_PREVIEW_UNAVAILABLE_MESSAGE = "Preview is not available for this file type in the current environment."
+
+
+def render_pdf_frame_preview_html(src: str) -> HTMLResponse:
+    return HTMLResponse(
+        f"""{ATTACHMENT_PREVIEW_HEAD}<body class="preview-frame"><iframe src="{html.escape(src)}#view=FitH"></iframe></body></html>"""
+    )
+
+
+def render_image_preview_html(src: str, filename: str) -> HTMLResponse:
+    return HTMLResponse(
+        f"""{ATTACHMENT_PREVIEW_HEAD}<body class="preview-image"><img src="{html.escape(src)}" alt="{html.escape(filename)}"></body></html>"""
+    )
+
+
+def render_preview_unavailable_html(filename: str, href: str, link_label: str, message: str = ATTACHMENT_PREVIEW_UNAVAILABLE_MESSAGE, new_tab: bool = True) -> HTMLResponse:
+    target = ' target="_blank" rel="noopener"' if new_tab else ""
+    return HTMLResponse(
+        f"""{ATTACHMENT_PREVIEW_HEAD}<body class="preview-card"><div class="card"><div class="name">{html.escape(filename)}</div><div class="msg">{html.escape(message)}</div><a class="btn" href="{html.escape(href)}"{target}>{html.escape(link_label)}</a></div></body></html>"""
+    )
+
+
+# Text and DOCX previews wrap a variable body in constant markup; keep that markup pre-encoded.
+TEXT_PREVIEW_HEAD = b"""<!doctype html>
+<html><head><meta charset="utf-8"><style>html,body{margin:0;background:#fff;color:#0f172a;font-family:Segoe UI,Arial,sans-serif}pre{margin:0;padding:18px;white-space:pre-wrap;word-break:break-word;font-size:14px;line-height:1.5}</style></head>
+<body><pre>"""
+TEXT_PREVIEW_TAIL = b"</pre></body></html>"
+DOCX_PREVIEW_HEAD = b"""<!doctype html>
+<html><head><meta charset="utf-8"><style>
+html,body{margin:0;background:#fff;color:#0f172a;font-family:Segoe UI,Arial,sans-serif}
+.docx-wrap{padding:20px 22px;font-size:14px;line-height:1.6}
+p{margin:0 0 12px}
+table{border-collapse:collapse;width:100%;margin:10px 0 16px}
+td{border:1px solid #cbd5e1;padding:8px 10px;vertical-align:top}
+</style></head><body><div class="docx-wrap">"""
+DOCX_PREVIEW_TAIL = b"</div></body></html>"
+
+
 def render_text_preview_html(file_bytes: bytes) -> HTMLResponse:
     try:
         text_content = file_bytes.decode("utf-8")
     except UnicodeDecodeError:
         text_content = file_bytes.decode("latin-1", errors="replace")
     safe_text = html.escape(text_content)
-    return HTMLResponse(
-        f"""<!doctype html>
-<html><head><meta charset="utf-8"><style>html,body{{margin:0;background:#fff;color:#0f172a;font-family:Segoe UI,Arial,sans-serif}}pre{{margin:0;padding:18px;white-space:pre-wrap;word-break:break-word;font-size:14px;line-height:1.5}}</style></head>
-<body><pre>{safe_text}</pre></body></html>"""
-    )
+    return HTMLResponse(TEXT_PREVIEW_HEAD + safe_text.encode("utf-8") + TEXT_PREVIEW_TAIL)
 
 
 def render_docx_preview_html(file_bytes: bytes, label: str = "this document") -> HTMLResponse | None:
     try:
         from docx import Document
         doc = Document(io.BytesIO(file_bytes))
+        # Every fragment goes into one buffer that is joined once, rather than joining per row/table.
         blocks: list[str] = []
+        append = blocks.append
+        escape = html.escape
         for para in doc.paragraphs:
             text_value = (para.text or "").strip()
             if text_value:
-                blocks.append(f"<p>{html.escape(text_value)}</p>")
+                append(f"<p>{escape(text_value)}</p>")
         for table in doc.tables:
-            rows_html: list[str] = []
+            if not table.rows:
+                continue
+            append("<table>")
             for row in table.rows:
-                cells = "".join(f"<td>{html.escape((cell.text or '').strip())}</td>" for cell in row.cells)
-                rows_html.append(f"<tr>{cells}</tr>")
-            if rows_html:
-                blocks.append(f"<table>{''.join(rows_html)}</table>")
+                append("<tr>")
+                for cell in row.cells:
+                    append(f"<td>{escape((cell.text or '').strip())}</td>")
+                append("</tr>")
+            append("</table>")
         if not blocks:
-            blocks.append(f"<p>No previewable text found in {html.escape(label)}.</p>")
-        return HTMLResponse(
-            """<!doctype html>
-<html><head><meta charset="utf-8"><style>
-html,body{margin:0;background:#fff;color:#0f172a;font-family:Segoe UI,Arial,sans-serif}
-.docx-wrap{padding:20px 22px;font-size:14px;line-height:1.6}
-p{margin:0 0 12px}
-table{border-collapse:collapse;width:100%;margin:10px 0 16px}
-td{border:1px solid #cbd5e1;padding:8px 10px;vertical-align:top}
-</style></head><body><div class="docx-wrap">"""
-            + "".join(blocks)
-            + "</div></body></html>"
-        )
+            append(f"<p>No previewable text found in {escape(label)}.</p>")
+        return HTMLResponse(DOCX_PREVIEW_HEAD + "".join(blocks).encode("utf-8") + DOCX_PREVIEW_TAIL)
     except Exception as exc:
         print(f"[attachment-preview] docx preview failed for {label}: {exc}")
         return None
@@ -334,15 +405,57 @@ def load_case_attachment_bytes(stored_path: str | None) -> bytes | None:
 # -------------------------
 # Azure Blob Storage Helpers
 # -------------------------
+# One service client per process: derived clients share its HTTP pipeline and connection pool,
+# so building a fresh one per call only adds TLS handshakes and connection churn. The pool never
+# blocks: streamed downloads hold their connection until the client finishes reading, so when
+# all pooled connections are busy an extra one is opened and dropped after use instead of
+# leaving other blob calls waiting on a slow download.
+_blob_service_client = None
+_blob_container_client = None
+_blob_client_lock = threading.Lock()
+
+
 def get_blob_service_client():
-    """Get BlobServiceClient from connection string."""
+    """Get the shared BlobServiceClient, creating it from the connection string on first use."""
+    global _blob_service_client
     if not BLOB_STORAGE_ENABLED:
         return None
-    try:
-        return BlobServiceClient.from_connection_string(AZURE_STORAGE_CONNECTION_STRING)
-    except Exception as e:
-        print(f"[BLOB] Failed to create blob service client: {e}")
+    if _blob_service_client is not None:
+        return _blob_service_client
+    with _blob_client_lock:
+        if _blob_service_client is None:
+            try:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=BLOB_MAX_CONNECTIONS, pool_block=False)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _blob_service_client = BlobServiceClient.from_connection_string(
+                    AZURE_STORAGE_CONNECTION_STRING,
+                    transport=RequestsTransport(
+                        session=session, session_owner=False, connection_timeout=10, read_timeout=60
+                    ),
+                    retry_total=3,
+                    max_single_get_size=BLOB_TRANSFER_CHUNK_BYTES,
+                    max_chunk_get_size=BLOB_TRANSFER_CHUNK_BYTES,
+                )
+            except Exception as e:
+                blob_logger.error("Failed to create blob service client: %s", e)
+                return None
+        return _blob_service_client
+
+
+def get_blob_container_client():
+    """Get the shared ContainerClient for the referral container."""
+    global _blob_container_client
+    if _blob_container_client is not None:
+        return _blob_container_client
+    client = get_blob_service_client()
+    if not client:
         return None
+    with _blob_client_lock:
+        if _blob_container_client is None:
+            _blob_container_client = client.get_container_client(REFERRAL_BLOB_CONTAINER)
+        return _blob_container_client
 
 
 def upload_to_blob(
@@ -362,16 +475,15 @@ def upload_to_blob(
         if not blob_name:
             ext = Path(original_filename).suffix or ".bin"
             blob_name = f"{case_id}{ext}"
-        client = get_blob_service_client()
-        if not client:
+        container_client = get_blob_container_client()
+        if not container_client:
             return None
-        
-        container_client = client.get_container_client(REFERRAL_BLOB_CONTAINER)
+
         container_client.upload_blob(blob_name, file_bytes, overwrite=True)
-        print(f"[BLOB] Uploaded {blob_name} to {REFERRAL_BLOB_CONTAINER}")
+        blob_logger.info("Uploaded %s to %s", blob_name, REFERRAL_BLOB_CONTAINER)
         return blob_name  # Store blob name in DB
     except Exception as e:
-        print(f"[BLOB] Upload failed for {case_id}: {e}")
+        blob_logger.warning("Upload failed for %s: %s", case_id, e)
         return None
 
 
@@ -379,15 +491,15 @@ def delete_blob(blob_name: str | None) -> None:
     if not BLOB_STORAGE_ENABLED or not blob_name:
         return
 
+    _blob_exists_cache.pop(blob_name, None)
     try:
-        client = get_blob_service_client()
-        if not client:
+        container_client = get_blob_container_client()
+        if not container_client:
             return
 
-        container_client = client.get_container_client(REFERRAL_BLOB_CONTAINER)
         container_client.delete_blob(blob_name, delete_snapshots="include")
     except Exception as exc:
-        print(f"[BLOB] Delete failed for {blob_name}: {exc}")
+        blob_logger.warning("Delete failed for %s: %s", blob_name, exc)
 
 
 def download_from_blob(blob_name: str) -> bytes | None:
@@ -399,35 +511,72 @@ def download_from_blob(blob_name: str) -> bytes | None:
         return None
     
     try:
-        client = get_blob_service_client()
-        if not client:
+        container_client = get_blob_container_client()
+        if not container_client:
             return None
-        
-        container_client = client.get_container_client(REFERRAL_BLOB_CONTAINER)
+
         blob_client = container_client.get_blob_client(blob_name)
         
         download_stream = blob_client.download_blob()
         return download_stream.readall()
     except Exception as e:
-        print(f"[BLOB] Download failed for {blob_name}: {e}")
+        blob_logger.warning("Download failed for %s: %s", blob_name, e)
         return None
 
 
+def stream_from_blob(blob_name: str):
+    """
+    Open a blob for download without buffering it.
+    Returns an iterator of byte chunks, or None if the blob is missing, empty or unreadable.
+    """
+    if not BLOB_STORAGE_ENABLED or not blob_name:
+        return None
+
+    try:
+        container_client = get_blob_container_client()
+        if not container_client:
+            return None
+
+        # download_blob() fetches the first range up front, so a missing blob fails here,
+        # before any response has started.
+        downloader = container_client.get_blob_client(blob_name).download_blob()
+    except Exception as e:
+        blob_logger.warning("Download failed for %s: %s", blob_name, e)
+        return None
+    if not downloader.size:
+        return None
+    return downloader.chunks()
+
+
+# Positive exists() answers are reused briefly so reopening a case page doesn't HEAD the blob
+# again; deletes through delete_blob() drop the entry straight away.
+BLOB_EXISTS_CACHE_SECONDS = 60.0
+_blob_exists_cache: dict[str, float] = {}
+
+
 def blob_exists(blob_name: str) -> bool:
     """Check if a blob exists in storage."""
     if not BLOB_STORAGE_ENABLED or not blob_name:
         return False
-    
+
+    now = time.monotonic()
+    if _blob_exists_cache.get(blob_name, 0.0) > now:
+        return True
+
     try:
-        client = get_blob_service_client()
-        if not client:
+        container_client = get_blob_container_client()
+        if not container_client:
             return False
-        
-        container_client = client.get_container_client(REFERRAL_BLOB_CONTAINER)
+
         blob_client = container_client.get_blob_client(blob_name)
-        return blob_client.exists()
+        exists = blob_client.exists()
+        if exists:
+            if len(_blob_exists_cache) >= 4096:
+                _blob_exists_cache.clear()
+            _blob_exists_cache[blob_name] = now + BLOB_EXISTS_CACHE_SECONDS
+        return exists
     except Exception as e:
-        print(f"[BLOB] exists() check failed for {blob_name}: {e}")
+        blob_logger.warning("exists() check failed for %s: %s", blob_name, e)
         return False
 
 
@@ -480,23 +629,22 @@ app.mount("/static", StaticFiles(directory=str(BASE_DIR / "static")), name="stat
 
 APP_ENV = (os.environ.get("APP_ENV") or os.environ.get("ENVIRONMENT") or "development").strip().lower()
 IS_PRODUCTION = APP_ENV in {"production", "prod", "staging"}
+# Templates only change on deploy outside development, so skip Jinja's per-render mtime check.
+templates.env.auto_reload = not IS_PRODUCTION
 DEFAULT_APP_SECRET = "dev-secret-change-me"
 APP_SECRET = os.environ.get("APP_SECRET", DEFAULT_APP_SECRET)
 SESSION_TIMEOUT_MINUTES = 20  # Session expires after 20 minutes of inactivity
+SESSION_REFRESH_SECONDS = 60  # Sliding-window login_time is only rewritten (and the cookie re-issued) this often
 
 APP_BASE_URL = os.environ.get("APP_BASE_URL", "http://localhost:8000")
 DATABASE_URL = os.environ.get("DATABASE_URL", "")
-SMTP_HOST = os.environ.get("SMTP_HOST")
-SMTP_PORT = int(os.environ.get("SMTP_PORT", "587"))
-SMTP_USER = os.environ.get("SMTP_USER")
-SMTP_PASSWORD = os.environ.get("SMTP_PASSWORD") or os.environ.get("SMTP_PASS")
-SMTP_PASS = SMTP_PASSWORD
-SMTP_FROM = os.environ.get("SMTP_FROM") or SMTP_USER
 LOGO_DARK_URL = os.environ.get("LOGO_DARK_URL", "/static/images/logo-light.png")
 ALLOW_DIAGNOSTIC_ENDPOINT = (os.environ.get("ALLOW_DIAGNOSTIC_ENDPOINT") or "").strip().lower() in {"1", "true", "yes"}
 COOKIE_HTTPS_ONLY = IS_PRODUCTION or APP_BASE_URL.startswith("https://")
 TRUSTED_HOSTS = [host.strip() for host in (os.environ.get("TRUSTED_HOSTS") or "").split(",") if host.strip()]
 OWNER_ADMIN_USERNAME = (os.environ.get("OWNER_ADMIN_USERNAME", "P.Mendyk") or "P.Mendyk").strip() or "P.Mendyk"
+PDF_RENDER_WORKERS = max(1, int(os.environ.get("PDF_RENDER_WORKERS", "2")))
+PDF_RENDER_EXECUTOR = ThreadPoolExecutor(max_workers=PDF_RENDER_WORKERS, thread_name_prefix="pdf-render")
 
 
 def validate_security_configuration() -> None:
@@ -527,8 +675,60 @@ validate_security_configuration()
 if TRUSTED_HOSTS:
     app.add_middleware(TrustedHostMiddleware, allowed_hosts=TRUSTED_HOSTS)
 
+class SlidingSessionMiddleware(SessionMiddleware):
+    """Signed-cookie sessions that only re-issue the cookie when the session actually changed.
+
+    Starlette re-signs and re-sends the whole session on every response. Sessions must stay in
+    the cookie so any worker can serve any request, but an unchanged session does not need a
+    new Set-Cookie; get_session_user() refreshes login_time at most every
+    SESSION_REFRESH_SECONDS, which is what keeps the cookie alive for active users.
+
+    Loading, signing and clearing the cookie are left to SessionMiddleware; this only drops the
+    session Set-Cookie it emits when that cookie carries the same payload the request sent.
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        incoming_payload = self._unsigned_payload(HTTPConnection(scope).cookies.get(self.session_cookie))
+        if incoming_payload is None:
+            await super().__call__(scope, receive, send)
+            return
+
+        cookie_prefix = f"{self.session_cookie}="
+
+        def is_unchanged_session_cookie(header_value: str) -> bool:
+            if not header_value.startswith(cookie_prefix):
+                return False
+            signed = header_value[len(cookie_prefix):].split(";", 1)[0]
+            return self._unsigned_payload(signed) == incoming_payload
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                cookies = headers.getlist("set-cookie")
+                kept = [value for value in cookies if not is_unchanged_session_cookie(value)]
+                if len(kept) != len(cookies):
+                    del headers["set-cookie"]
+                    for value in kept:
+                        headers.append("set-cookie", value)
+            await send(message)
+
+        await super().__call__(scope, receive, send_wrapper)
+
+    def _unsigned_payload(self, signed: str | None) -> bytes | None:
+        if not signed:
+            return None
+        try:
+            return self.signer.unsign(signed.encode("utf-8"), max_age=self.max_age)
+        except BadSignature:
+            return None
+
+
 app.add_middleware(
-    SessionMiddleware,
+    SlidingSessionMiddleware,
     secret_key=APP_SECRET,
     same_site="lax",
     https_only=COOKIE_HTTPS_ONLY,
@@ -549,16 +749,38 @@ class HTTPSRedirectMiddleware(BaseHTTPMiddleware):
 app.add_middleware(HTTPSRedirectMiddleware)
 
 # Middleware to add no-cache headers to authenticated pages
-class NoCacheMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        
-        # Add no-cache headers to all responses to prevent browser caching of authenticated pages
-        response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate, private"
-        response.headers["Pragma"] = "no-cache"
-        response.headers["Expires"] = "0"
-        
-        return response
+class NoCacheMiddleware:
+    # Plain ASGI rather than BaseHTTPMiddleware: it only touches the response headers, so the
+    # body (including streamed attachments) passes straight through without being re-queued.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        if path in ("/health", "/healthz"):
+            await self.app(scope, receive, send)
+            return
+        is_static = path.startswith("/static/")
+
+        async def send_with_cache_headers(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if is_static:
+                    # Public assets: the browser may keep them but revalidates each use, so unchanged
+                    # files come back as 304 via StaticFiles' ETag/Last-Modified instead of a full download.
+                    headers["Cache-Control"] = "no-cache"
+                else:
+                    # Add no-cache headers to all other responses to prevent browser caching of authenticated pages
+                    headers["Cache-Control"] = "no-cache, no-store, must-revalidate, private"
+                    headers["Pragma"] = "no-cache"
+                    headers["Expires"] = "0"
+            await send(message)
+
+        await self.app(scope, receive, send_with_cache_headers)
 
 app.add_middleware(NoCacheMiddleware)
 
@@ -608,6 +830,20 @@ def should_allow_same_origin_frame(path: str | None, inline_query_value: str | N
     return False
 
 
+ERROR_PAGE_HEAD_TEMPLATE = """<!DOCTYPE html><html><head><title>Error {status_code}</title>
+        <style>body{{font-family:sans-serif;background:#0f1724;color:#fff;display:flex;align-items:center;justify-content:center;height:100vh;margin:0;}}
+        .box{{text-align:center;}}.btn{{margin-top:20px;padding:10px 20px;background:#1f6feb;color:#fff;border:none;border-radius:6px;text-decoration:none;cursor:pointer;font-size:14px;}}
+        </style></head><body><div class="box"><h2>{status_code}</h2><p>"""
+ERROR_PAGE_TAIL = b"""</p>
+        <a class="btn" href="/">Go Home</a>&nbsp;<a class="btn" href="/login">Login</a></div></body></html>"""
+
+
+@functools.lru_cache(maxsize=64)
+def error_page_head(status_code: int) -> bytes:
+    # Only the detail varies between two errors with the same status, so the head is built once.
+    return ERROR_PAGE_HEAD_TEMPLATE.format(status_code=status_code).encode("utf-8")
+
+
 # Global 401/403 handler — redirect to login instead of showing a raw error
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
@@ -621,11 +857,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
         return RedirectResponse(url=f"/login?expired=1&next={request.url.path}", status_code=303)
     # For other HTTP errors return a simple styled error page
     return HTMLResponse(
-        content=f"""<!DOCTYPE html><html><head><title>Error {exc.status_code}</title>
-        <style>body{{font-family:sans-serif;background:#0f1724;color:#fff;display:flex;align-items:center;justify-content:center;height:100vh;margin:0;}}
-        .box{{text-align:center;}}.btn{{margin-top:20px;padding:10px 20px;background:#1f6feb;color:#fff;border:none;border-radius:6px;text-decoration:none;cursor:pointer;font-size:14px;}}
-        </style></head><body><div class="box"><h2>{exc.status_code}</h2><p>{exc.detail}</p>
-        <a class="btn" href="/">Go Home</a>&nbsp;<a class="btn" href="/login">Login</a></div></body></html>""",
+        content=error_page_head(exc.status_code) + html.escape(str(exc.detail)).encode("utf-8") + ERROR_PAGE_TAIL,
         status_code=exc.status_code,
     )
 
@@ -633,7 +865,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 # -------------------------
 # Health Check Endpoint
 # -------------------------
-@app.get("/health")
+# /health itself is served by the route registered next to the app; this one would never match.
 @app.get("/healthz")
 async def health_check():
     """
@@ -654,34 +886,28 @@ async def diagnostic_schema(request: Request):
     if not ALLOW_DIAGNOSTIC_ENDPOINT and not (user and user.get("is_superuser")):
         raise HTTPException(status_code=404, detail="Not found")
     try:
-        conn = get_db()
-        
-        # Get all tables
+        conn = get_readonly_db()
+
+        # One round trip: table names and institutions columns come back as JSON arrays.
         if using_postgres():
-            result = conn.execute(text("""
-                SELECT tablename 
-                FROM pg_tables 
-                WHERE schemaname = 'public' 
-                ORDER BY tablename
-            """))
-            tables = [row[0] for row in result.fetchall()]
-            
-            # Check institutions columns
-            result = conn.execute(text("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name = 'institutions'
-                ORDER BY ordinal_position
-            """))
-            institutions_columns = [row[0] for row in result.fetchall()]
+            row = conn.execute("""
+                SELECT
+                    (SELECT COALESCE(json_agg(tablename::text ORDER BY tablename), '[]'::json)
+                     FROM pg_tables WHERE schemaname = 'public') AS tables,
+                    (SELECT COALESCE(json_agg(column_name::text ORDER BY ordinal_position), '[]'::json)
+                     FROM information_schema.columns WHERE table_name = 'institutions') AS institutions_columns
+            """).fetchone()
         else:
-            # SQLite
-            result = conn.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")
-            tables = [row[0] for row in result.fetchall()]
-            
-            # Check institutions columns
-            result = conn.execute("PRAGMA table_info(institutions)")
-            institutions_columns = [row[1] for row in result.fetchall()]
+            row = conn.execute("""
+                SELECT
+                    (SELECT json_group_array(name)
+                     FROM (SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name)) AS tables,
+                    (SELECT json_group_array(name) FROM pragma_table_info('institutions')) AS institutions_columns
+            """).fetchone()
+        tables, institutions_columns = (
+            value if isinstance(value, list) else _json.loads(value or "[]")
+            for value in (row["tables"], row["institutions_columns"])
+        )
         
         conn.close()
         
@@ -757,16 +983,38 @@ def partition_admin_notes(note_text: str | None) -> tuple[list[str], list[str]]:
     return base_notes, reopened_notes
 
 
-def parse_iso_dt(value: str | None) -> datetime | None:
-    if not value:
-        return None
+_DISPLAY_DATETIME_FORMAT = "%d/%m/%Y %H:%M"
+
+
+# List pages render the same handful of timestamps over and over; parsed datetimes are immutable.
+@functools.lru_cache(maxsize=4096)
+def _parse_iso_cached(value: str) -> datetime | None:
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
     try:
-        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
-        if dt.tzinfo is None:
-            dt = dt.replace(tzinfo=timezone.utc)
-        return dt.astimezone(timezone.utc)
-    except Exception:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def parse_iso_dt(value: str | None) -> datetime | None:
+    if not value or not isinstance(value, str):
         return None
+    return _parse_iso_cached(value)
+
+
+# Admin lists (protocols, institutions) reformat the same stored timestamps on every render.
+# Kept in Python rather than SQL strftime: the stored values carry mixed offsets and formats,
+# and Postgres has no strftime.
+@functools.lru_cache(maxsize=4096)
+def _format_display_datetime_cached(value_str: str) -> str:
+    dt = _parse_iso_cached(value_str)
+    if not dt:
+        return value_str
+    return dt.strftime(_DISPLAY_DATETIME_FORMAT)
 
 
 def format_display_datetime(value: str | None, fallback: str = "") -> str:
@@ -775,10 +1023,7 @@ def format_display_datetime(value: str | None, fallback: str = "") -> str:
     value_str = str(value).strip()
     if not value_str:
         return fallback
-    dt = parse_iso_dt(value_str)
-    if not dt:
-        return value_str
-    return dt.strftime("%d/%m/%Y %H:%M")
+    return _format_display_datetime_cached(value_str)
 
 
 def format_display_date(value: str | None, fallback: str = "") -> str:
@@ -790,20 +1035,23 @@ templates.env.filters["display_datetime"] = format_display_datetime
 templates.env.filters["display_case_event_label"] = display_case_event_label
 
 
-def tat_seconds(created_at: str | None, vetted_at: str | None) -> int:
-    created_dt = parse_iso_dt(created_at)
+def tat_seconds(
+    created_at: str | datetime | None,
+    vetted_at: str | None,
+    now: datetime | None = None,
+) -> int:
+    # List views pass an already-parsed created_at and a single `now` for the whole page.
+    created_dt = created_at if isinstance(created_at, datetime) else parse_iso_dt(created_at)
     if not created_dt:
         return 0
-    end_dt = parse_iso_dt(vetted_at) or datetime.now(timezone.utc)
+    end_dt = parse_iso_dt(vetted_at) or now or datetime.now(timezone.utc)
     return max(0, int((end_dt - created_dt).total_seconds()))
 
 
 def format_tat(seconds: int) -> str:
     minutes_total = seconds // 60
-    hours_total = minutes_total // 60
-    days = hours_total // 24
-    minutes = minutes_total % 60
-    hours = hours_total % 24
+    hours_total, minutes = divmod(minutes_total, 60)
+    days, hours = divmod(hours_total, 24)
 
     if days > 0:
         return f"{days}d {hours:02}h {minutes:02}m"
@@ -817,104 +1065,353 @@ def format_tat(seconds: int) -> str:
 # -------------------------
 # DB
 # -------------------------
-def get_db() -> sqlite3.Connection:
-    # If DATABASE_URL is set, return a SQLAlchemy-backed connection wrapper
-    database_url = os.environ.get("DATABASE_URL")
-    if database_url:
-        # lazy create engine
-        global SA_ENGINE
-        if 'SA_ENGINE' not in globals():
-            SA_ENGINE = create_engine(database_url)
-
-        class SAResult:
-            def __init__(self, result):
-                self._result = result
-
-            def fetchall(self):
-                try:
-                    return [dict(r) for r in self._result.mappings().all()]
-                except Exception:
-                    return []
-
-            def fetchone(self):
-                try:
-                    row = self._result.mappings().first()
-                    return dict(row) if row else None
-                except Exception:
-                    return None
-
-        class SAConn:
-            def __init__(self, engine):
-                self._conn = engine.connect()
-                self._trans = self._conn.begin()
-
-            def execute(self, sql, params=None):
-                # convert positional ? params to named parameters for SQLAlchemy
-                if params is None:
-                    params = []
-                if isinstance(params, (list, tuple)) and "?" in sql:
-                    # replace ? with :p0, :p1 ...
-                    parts = sql.split("?")
-                    named = []
-                    param_map = {}
-                    for i in range(len(parts) - 1):
-                        name = f":p{i}"
-                        named.append(parts[i] + name)
-                        param_map[f"p{i}"] = params[i]
-                    named.append(parts[-1])
-                    sql_named = "".join(named)
-                    res = self._conn.execute(text(sql_named), param_map)
-                    return SAResult(res)
-                else:
-                    # assume dict or none
-                    if isinstance(params, (list, tuple)):
-                        # convert to positional mapping p0..pn
-                        param_map = {f"p{i}": v for i, v in enumerate(params)}
-                        return SAResult(self._conn.execute(text(sql), param_map))
-                    else:
-                        return SAResult(self._conn.execute(text(sql), params or {}))
-
-            def commit(self):
-                try:
-                    self._trans.commit()
-                except Exception:
-                    pass
-
-            def rollback(self):
-                try:
-                    self._trans.rollback()
-                except Exception:
-                    pass
+SQLITE_POOL_SIZE = max(1, int(os.environ.get("SQLITE_POOL_SIZE", "8")))
+# Prepared statements are cached per connection; pooled connections keep them across requests,
+# so size the cache for the app's distinct statements rather than sqlite3's default of 128.
+# The cache is keyed on the SQL text, so the constant literals in helpers such as get_setting()
+# and verify_user() are reused as-is; only SQL built per call (f-strings with values) misses it.
+SQLITE_STATEMENT_CACHE_SIZE = max(0, int(os.environ.get("SQLITE_STATEMENT_CACHE_SIZE", "512")))
+# Page cache is per connection (negative = KiB); the mmap window is shared through the OS page cache.
+SQLITE_CACHE_SIZE_KIB = max(2000, int(os.environ.get("SQLITE_CACHE_SIZE_KIB", "16000")))
+SQLITE_MMAP_SIZE = max(0, int(os.environ.get("SQLITE_MMAP_SIZE", "268435456")))
+_sqlite_pool: "queue.LifoQueue[tuple[int, str, sqlite3.Connection]]" = queue.LifoQueue(maxsize=SQLITE_POOL_SIZE)
+# PRAGMA optimize refreshes planner statistics (sqlite_stat1) only for tables whose stats look stale.
+# Pooled connections are rarely closed, so it runs when a connection is handed back at most once
+# per interval, whenever a connection is actually closed, and once in full on first open.
+SQLITE_OPTIMIZE_INTERVAL_SECONDS = max(60, int(os.environ.get("SQLITE_OPTIMIZE_INTERVAL_SECONDS", "3600")))
+# Rows ANALYZE samples per index during optimize; keeps the full first-open pass cheap on big tables.
+SQLITE_ANALYSIS_LIMIT = max(100, int(os.environ.get("SQLITE_ANALYSIS_LIMIT", "400")))
+_sqlite_optimized_at: dict[str, float] = {}
+
+
+class PooledSQLiteConnection:
+    """Thin sqlite3.Connection proxy; close() hands the connection back to the pool."""
+
+    def __init__(self, conn: sqlite3.Connection, db_path: str, readonly: bool = False):
+        self._conn = conn
+        self._db_path = db_path
+        self._readonly = readonly
+        if readonly:
+            conn.execute("PRAGMA query_only = ON")
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get("_conn")
+        if conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return getattr(conn, name)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._conn.__exit__(exc_type, exc, tb)
+
+    def execute_scalar(self, sql, params=()):
+        """First column of the first row, or None; skips building a sqlite3.Row for it."""
+        cur = self._conn.cursor()
+        cur.row_factory = None
+        try:
+            row = cur.execute(sql, params).fetchone()
+        finally:
+            cur.close()
+        return row[0] if row else None
 
-            def close(self):
+    def close(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            if self._readonly:
                 try:
-                    self._conn.close()
-                except Exception:
-                    pass
+                    conn.execute("PRAGMA query_only = OFF")
+                except sqlite3.Error:
+                    conn.close()
+                    return
+            _release_sqlite_connection(conn, self._db_path)
 
-        return SAConn(SA_ENGINE)
 
-    # default: sqlite3
-    conn = sqlite3.connect(DB_PATH, timeout=30.0)
+def _open_sqlite_connection(db_path: str) -> sqlite3.Connection:
+    # Pooled connections move between worker threads, but only one request holds one at a time.
+    conn = sqlite3.connect(
+        db_path,
+        timeout=30.0,
+        check_same_thread=False,
+        cached_statements=SQLITE_STATEMENT_CACHE_SIZE,
+    )
     conn.row_factory = sqlite3.Row
     try:
         conn.execute("PRAGMA journal_mode=WAL")
         conn.execute("PRAGMA busy_timeout = 30000")
+        # NORMAL is durable under WAL (only the last commits can roll back on power loss)
+        # and skips the fsync on every commit.
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KIB}")
+        # Per connection, so it also bounds the periodic PRAGMA optimize on release and close.
+        conn.execute(f"PRAGMA analysis_limit={SQLITE_ANALYSIS_LIMIT}")
     except Exception:
         pass
+    if db_path not in _sqlite_optimized_at:
+        _sqlite_optimized_at[db_path] = time.monotonic()
+        try:
+            # 0x10002: analyse every table, not just ones this connection has queried.
+            conn.execute("PRAGMA optimize=0x10002")
+        except sqlite3.Error:
+            pass
     return conn
 
 
+def _optimize_sqlite_connection(conn: sqlite3.Connection, db_path: str, force: bool = False) -> None:
+    now = time.monotonic()
+    if not force and now - _sqlite_optimized_at.get(db_path, 0.0) < SQLITE_OPTIMIZE_INTERVAL_SECONDS:
+        return
+    _sqlite_optimized_at[db_path] = now
+    try:
+        conn.execute("PRAGMA optimize")
+    except sqlite3.Error:
+        pass
+
+
+def _acquire_sqlite_connection(db_path: str) -> sqlite3.Connection:
+    pid = os.getpid()
+    while True:
+        try:
+            pooled_pid, pooled_path, conn = _sqlite_pool.get_nowait()
+        except queue.Empty:
+            return _open_sqlite_connection(db_path)
+        if pooled_pid == pid and pooled_path == db_path:
+            return conn
+        # Inherited across a fork or DB_PATH changed: never reuse it.
+        if pooled_pid == pid:
+            conn.close()
+
+
+def _release_sqlite_connection(conn: sqlite3.Connection, db_path: str) -> None:
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+        _optimize_sqlite_connection(conn, db_path)
+        _sqlite_pool.put_nowait((os.getpid(), db_path, conn))
+    except (queue.Full, sqlite3.Error):
+        _optimize_sqlite_connection(conn, db_path, force=True)
+        conn.close()
+
+
+# Postgres: one engine per process; its QueuePool keeps connections open between requests.
+POSTGRES_POOL_SIZE = max(1, int(os.environ.get("POSTGRES_POOL_SIZE", "25")))
+POSTGRES_MAX_OVERFLOW = max(0, int(os.environ.get("POSTGRES_MAX_OVERFLOW", "25")))
+POSTGRES_POOL_RECYCLE = int(os.environ.get("POSTGRES_POOL_RECYCLE", "300"))
+_sa_engine = None
+_sa_engine_lock = threading.Lock()
+
+
+def _get_sa_engine(database_url: str):
+    global _sa_engine
+    if _sa_engine is None:
+        with _sa_engine_lock:
+            if _sa_engine is None:
+                _sa_engine = create_engine(
+                    database_url,
+                    pool_size=POSTGRES_POOL_SIZE,
+                    max_overflow=POSTGRES_MAX_OVERFLOW,
+                    pool_pre_ping=True,
+                    pool_recycle=POSTGRES_POOL_RECYCLE,
+                )
+    return _sa_engine
+
+
+def close_db_pools() -> None:
+    """Close this process's pooled connections on exit: SQLite ones after PRAGMA optimize."""
+    pid = os.getpid()
+    while True:
+        try:
+            pooled_pid, db_path, conn = _sqlite_pool.get_nowait()
+        except queue.Empty:
+            break
+        # Connections inherited across a fork belong to the parent; leave them alone.
+        if pooled_pid == pid:
+            _optimize_sqlite_connection(conn, db_path, force=True)
+            conn.close()
+    if _sa_engine is not None:
+        _sa_engine.dispose()
+
+
+atexit.register(close_db_pools)
+
+
+# The app issues a fixed set of SQL strings, so the ?-to-:pN rewrite and the parsed text()
+# clause are built once per statement; SQLAlchemy's compiled cache then keys off the clause.
+@functools.lru_cache(maxsize=1024)
+def _sa_text(sql: str):
+    return text(sql)
+
+
+@functools.lru_cache(maxsize=1024)
+def _sa_positional_text(sql: str):
+    """Return (clause, bind names) for sqlite-style ``?`` SQL; names is None if there are none."""
+    if "?" not in sql:
+        return _sa_text(sql), None
+    # replace ? with :p0, :p1 ...
+    parts = sql.split("?")
+    names = tuple(f"p{i}" for i in range(len(parts) - 1))
+    named = [f"{part}:{name}" for part, name in zip(parts, names)]
+    named.append(parts[-1])
+    return text("".join(named)), names
+
+
+class SAResult:
+    def __init__(self, result):
+        self._result = result
+
+    def fetchall(self):
+        try:
+            return [dict(r) for r in self._result.mappings().all()]
+        except Exception:
+            return []
+
+    def fetchone(self):
+        try:
+            row = self._result.mappings().first()
+            return dict(row) if row else None
+        except Exception:
+            return None
+
+    @property
+    def rowcount(self):
+        return self._result.rowcount
+
+    def __iter__(self):
+        for row in self._result.mappings():
+            yield dict(row)
+
+
+class SAConn:
+    """sqlite3-style wrapper over a pooled SQLAlchemy connection; close() returns it to the pool."""
+
+    def __init__(self, engine):
+        # Commit-as-you-go: each commit()/rollback() ends the current transaction and the
+        # next execute() begins a fresh one, so writes after an earlier commit are kept too.
+        self._conn = engine.connect()
+
+    def _execute(self, sql, params):
+        if params is None:
+            params = []
+        if isinstance(params, (list, tuple)):
+            clause, names = _sa_positional_text(sql)
+            if names is not None:
+                # zip stops at the placeholder count, as the old split-based rewrite did
+                param_map = dict(zip(names, params))
+            else:
+                # convert to positional mapping p0..pn
+                param_map = {f"p{i}": v for i, v in enumerate(params)}
+            return self._conn.execute(clause, param_map)
+        # assume dict or none
+        return self._conn.execute(_sa_text(sql), params or {})
+
+    def execute(self, sql, params=None):
+        return SAResult(self._execute(sql, params))
+
+    def execute_scalar(self, sql, params=None):
+        """First column of the first row, or None, without building a dict for the row."""
+        return self._execute(sql, params).scalar()
+
+    def executemany(self, sql, seq_of_params):
+        clause, names = _sa_positional_text(sql)
+        param_maps = [dict(zip(names or (), params)) for params in seq_of_params]
+        if param_maps:
+            # A list of parameter sets makes SQLAlchemy use the driver's batched executemany.
+            self._conn.execute(clause, param_maps)
+
+    def commit(self):
+        try:
+            self._conn.commit()
+        except Exception:
+            pass
+
+    def rollback(self):
+        try:
+            self._conn.rollback()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Same contract as sqlite3.Connection: commit on success, roll back on error, stay open.
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+    def close(self):
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+
+
+def get_db() -> sqlite3.Connection:
+    # If DATABASE_URL was set at startup, return a SQLAlchemy-backed connection wrapper
+    if DATABASE_URL:
+        return SAConn(_get_sa_engine(DATABASE_URL))
+
+    # default: sqlite3, reusing an idle pooled connection when one is available
+    db_path = str(DB_PATH)
+    return PooledSQLiteConnection(_acquire_sqlite_connection(db_path), db_path)
+
+
 def using_postgres() -> bool:
-    return bool(os.environ.get("DATABASE_URL"))
+    return bool(DATABASE_URL)
+
+
+def get_readonly_db():
+    """Connection for read-only paths (diagnostics); any write raises instead of landing."""
+    if using_postgres():
+        conn = get_db()
+        conn.execute("SET TRANSACTION READ ONLY")
+        return conn
+    db_path = str(DB_PATH)
+    return PooledSQLiteConnection(_acquire_sqlite_connection(db_path), db_path, readonly=True)
+
+
+def insert_returning_id(conn, sql: str, params=()) -> int | None:
+    """Run a single-row INSERT and return the new id.
+
+    Postgres gets ``RETURNING id`` appended; SQLite reads the cursor's lastrowid,
+    so neither backend needs a follow-up SELECT.
+    """
+    if using_postgres():
+        row = conn.execute(f"{sql.rstrip()} RETURNING id", params).fetchone()
+        return row["id"] if row else None
+    return conn.execute(sql, params).lastrowid
+
+
+def begin_write_transaction(conn) -> None:
+    """Take SQLite's write lock up front so a check-then-write sequence commits as one unit."""
+    if using_postgres():
+        return
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+
+
+def execute_ddl_script(conn, statements: list[str]) -> None:
+    """Run schema statements as one script: a single round trip on Postgres, one transaction on SQLite."""
+    script = ";\n".join(stmt.strip().rstrip(";") for stmt in statements) + ";"
+    if using_postgres():
+        conn.execute(script, {})
+        return
+    conn.executescript(f"BEGIN;\n{script}\nCOMMIT;")
 
 
 def init_db() -> None:
     if using_postgres():
         conn = get_db()
+        ddl: list[str] = []
 
         # Extended schema tables retained for current database compatibility
-        conn.execute(
+        ddl.append(
             """
             CREATE TABLE IF NOT EXISTS organisations (
                 id SERIAL PRIMARY KEY,
@@ -927,7 +1424,7 @@ def init_db() -> None:
             """
         )
 
-        conn.execute(
+        ddl.append(
             """
             CREATE TABLE IF NOT EXISTS users (
                 id SERIAL PRIMARY KEY,
@@ -946,8 +1443,10 @@ def init_db() -> None:
             )
             """
         )
+        # Superusers are a handful of rows; a partial index finds them without scanning users.
+        ddl.append("CREATE INDEX IF NOT EXISTS idx_users_superuser ON users(username) WHERE is_superuser = 1")
 
-        conn.execute(
+        ddl.append(
             """
             CREATE TABLE IF NOT EXISTS user_sessions (
                 user_id INTEGER PRIMARY KEY,
@@ -958,7 +1457,7 @@ def init_db() -> None:
             """
         )
 
-        conn.execute(
+        ddl.append(
             """
             CREATE TABLE IF NOT EXISTS memberships (
                 id SERIAL PRIMARY KEY,
@@ -972,8 +1471,12 @@ def init_db() -> None:
             )
             """
         )
+        # UNIQUE(org_id, user_id) already serves org-first lookups; this covers per-user ones.
+        ddl.append("CREATE INDEX IF NOT EXISTS idx_memberships_user ON memberships(user_id, is_active)")
+        # Covers the per-org role counts on the owner pages without touching table rows.
+        ddl.append("CREATE INDEX IF NOT EXISTS idx_memberships_org_role ON memberships(org_id, is_active, org_role)")
 
-        conn.execute(
+        ddl.append(
             """
             CREATE TABLE IF NOT EXISTS radiologist_profiles (
                 id SERIAL PRIMARY KEY,
@@ -987,7 +1490,7 @@ def init_db() -> None:
             """
         )
 
-        conn.execute(
+        ddl.append(
             """
             CREATE TABLE IF NOT EXISTS audit_logs (
                 id SERIAL PRIMARY KEY,
@@ -1002,7 +1505,7 @@ def init_db() -> None:
             """
         )
 
-        conn.execute(
+        ddl.append(
             """
             CREATE TABLE IF NOT EXISTS password_reset_tokens (
                 id SERIAL PRIMARY KEY,
@@ -1017,7 +1520,7 @@ def init_db() -> None:
             """
         )
 
-        conn.execute(
+        ddl.append(
             """
             CREATE TABLE IF NOT EXISTS case_events (
                 id SERIAL PRIMARY KEY,
@@ -1035,7 +1538,7 @@ def init_db() -> None:
             """
         )
 
-        conn.execute(
+        ddl.append(
             """
             CREATE TABLE IF NOT EXISTS notify_events (
                 id SERIAL PRIMARY KEY,
@@ -1052,7 +1555,7 @@ def init_db() -> None:
         )
 
         # Legacy operational tables (used by main app)
-        conn.execute(
+        ddl.append(
             """
             CREATE TABLE IF NOT EXISTS institutions (
                 id SERIAL PRIMARY KEY,
@@ -1065,7 +1568,7 @@ def init_db() -> None:
             """
         )
 
-        conn.execute(
+        ddl.append(
             """
             CREATE TABLE IF NOT EXISTS cases (
                 id TEXT PRIMARY KEY,
@@ -1093,7 +1596,7 @@ def init_db() -> None:
             """
         )
 
-        conn.execute(
+        ddl.append(
             """
             CREATE TABLE IF NOT EXISTS protocols (
                 id SERIAL PRIMARY KEY,
@@ -1109,7 +1612,7 @@ def init_db() -> None:
             """
         )
 
-        conn.execute(
+        ddl.append(
             """
             CREATE TABLE IF NOT EXISTS radiologists (
                 name TEXT PRIMARY KEY,
@@ -1122,7 +1625,7 @@ def init_db() -> None:
             """
         )
 
-        conn.execute(
+        ddl.append(
             """
             CREATE TABLE IF NOT EXISTS config (
                 key TEXT PRIMARY KEY,
@@ -1131,7 +1634,7 @@ def init_db() -> None:
             """
         )
 
-        conn.execute(
+        ddl.append(
             """
             CREATE TABLE IF NOT EXISTS study_description_presets (
                 id SERIAL PRIMARY KEY,
@@ -1147,21 +1650,23 @@ def init_db() -> None:
             """
         )
 
-        conn.execute(
+        ddl.append(
             """
             CREATE INDEX IF NOT EXISTS idx_presets_org_modality
             ON study_description_presets(organization_id, modality)
             """
         )
 
+        execute_ddl_script(conn, ddl)
         conn.commit()
         conn.close()
         return
 
     conn = get_db()
+    ddl: list[str] = []
 
     # Institutions table
-    conn.execute(
+    ddl.append(
         """
         CREATE TABLE IF NOT EXISTS institutions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -1173,7 +1678,7 @@ def init_db() -> None:
     )
 
     # Cases table
-    conn.execute(
+    ddl.append(
         """
         CREATE TABLE IF NOT EXISTS cases (
             id TEXT PRIMARY KEY,
@@ -1199,7 +1704,7 @@ def init_db() -> None:
     )
 
     # Config table
-    conn.execute(
+    ddl.append(
         """
         CREATE TABLE IF NOT EXISTS config (
             key TEXT PRIMARY KEY,
@@ -1209,7 +1714,7 @@ def init_db() -> None:
     )
 
     # Radiologists table
-    conn.execute(
+    ddl.append(
         """
         CREATE TABLE IF NOT EXISTS radiologists (
             name TEXT PRIMARY KEY,
@@ -1223,7 +1728,7 @@ def init_db() -> None:
     )
 
     # Users table
-    conn.execute(
+    ddl.append(
         """
         CREATE TABLE IF NOT EXISTS users (
             username TEXT PRIMARY KEY,
@@ -1239,7 +1744,7 @@ def init_db() -> None:
     )
 
     # Protocols table
-    conn.execute(
+    ddl.append(
         """
         CREATE TABLE IF NOT EXISTS protocols (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -1256,7 +1761,7 @@ def init_db() -> None:
     )
 
     # Password reset tokens
-    conn.execute(
+    ddl.append(
         """
         CREATE TABLE IF NOT EXISTS password_reset_tokens (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -1272,7 +1777,7 @@ def init_db() -> None:
     )
 
     # Case event history
-    conn.execute(
+    ddl.append(
         """
         CREATE TABLE IF NOT EXISTS case_events (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -1290,7 +1795,7 @@ def init_db() -> None:
         """
     )
 
-    conn.execute(
+    ddl.append(
         """
         CREATE TABLE IF NOT EXISTS notify_events (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -1306,7 +1811,7 @@ def init_db() -> None:
         """
     )
 
-    conn.execute(
+    ddl.append(
         """
         CREATE TABLE IF NOT EXISTS study_description_presets (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -1322,86 +1827,89 @@ def init_db() -> None:
         """
     )
 
-    conn.execute(
+    ddl.append(
         """
         CREATE INDEX IF NOT EXISTS idx_presets_org_modality
         ON study_description_presets(organization_id, modality)
         """
     )
 
+    execute_ddl_script(conn, ddl)
     conn.commit()
     conn.close()
 
 
-def ensure_cases_schema() -> None:
+def add_missing_columns(conn, table: str, columns: list[tuple[str, str]]) -> None:
     """
-    Safe schema upgrades for older hub.db files.
+    Add whichever of the (name, type) columns the table lacks.
+
+    Postgres gets a single ALTER TABLE with IF NOT EXISTS clauses (caller commits). SQLite runs
+    DDL in autocommit, so the missing columns are added inside one explicit transaction:
+    one commit and one schema change instead of one per column.
     """
     if using_postgres():
-        conn = get_db()
-        conn.execute("ALTER TABLE cases ADD COLUMN IF NOT EXISTS status TEXT NOT NULL DEFAULT 'pending'")
-        conn.execute("ALTER TABLE cases ADD COLUMN IF NOT EXISTS vetted_at TEXT")
-        conn.execute("ALTER TABLE cases ADD COLUMN IF NOT EXISTS protocol TEXT")
-        conn.execute("ALTER TABLE cases ADD COLUMN IF NOT EXISTS decision TEXT")
-        conn.execute("ALTER TABLE cases ADD COLUMN IF NOT EXISTS decision_comment TEXT")
-        conn.execute("ALTER TABLE cases ADD COLUMN IF NOT EXISTS patient_first_name TEXT")
-        conn.execute("ALTER TABLE cases ADD COLUMN IF NOT EXISTS patient_surname TEXT")
-        conn.execute("ALTER TABLE cases ADD COLUMN IF NOT EXISTS patient_referral_id TEXT")
-        conn.execute("ALTER TABLE cases ADD COLUMN IF NOT EXISTS patient_dob TEXT")
-        conn.execute("ALTER TABLE cases ADD COLUMN IF NOT EXISTS request_date TEXT")
-        conn.execute("ALTER TABLE cases ADD COLUMN IF NOT EXISTS institution_id INTEGER")
-        conn.execute("ALTER TABLE cases ADD COLUMN IF NOT EXISTS modality TEXT")
-        conn.execute("ALTER TABLE cases ADD COLUMN IF NOT EXISTS org_id INTEGER")
-        conn.execute("ALTER TABLE cases ADD COLUMN IF NOT EXISTS contrast_required TEXT")
-        conn.execute("ALTER TABLE cases ADD COLUMN IF NOT EXISTS contrast_details TEXT")
-        conn.execute("ALTER TABLE cases ADD COLUMN IF NOT EXISTS uploaded_filename TEXT")
-        conn.execute("ALTER TABLE cases ADD COLUMN IF NOT EXISTS stored_filepath TEXT")
-        conn.execute("ALTER TABLE cases ADD COLUMN IF NOT EXISTS admin_notes TEXT")
-        conn.execute("ALTER TABLE cases ADD COLUMN IF NOT EXISTS radiologist TEXT")
-        conn.commit()
-        conn.close()
+        conn.execute(
+            f"ALTER TABLE {table} " + ", ".join(f"ADD COLUMN IF NOT EXISTS {name} {sql_type}" for name, sql_type in columns)
+        )
         return
-    conn = get_db()
-    cur = conn.cursor()
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+    missing = [(name, sql_type) for name, sql_type in columns if name not in existing]
+    if not missing:
+        return
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    try:
+        for name, sql_type in missing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {sql_type}")
+    except Exception:
+        conn.rollback()
+        raise
+    conn.commit()
+    clear_schema_cache()
 
-    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='cases'")
-    if not cur.fetchone():
+
+def _sqlite_table_missing(conn, table: str) -> bool:
+    return conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone() is None
+
+
+def ensure_cases_schema() -> None:
+    """
+    Safe schema upgrades for older hub.db files.
+    """
+    columns = [
+        ("status", "TEXT NOT NULL DEFAULT 'pending'"),
+        ("vetted_at", "TEXT"),
+        ("protocol", "TEXT"),
+        ("decision", "TEXT"),
+        ("decision_comment", "TEXT"),
+        ("patient_first_name", "TEXT"),
+        ("patient_surname", "TEXT"),
+        ("patient_referral_id", "TEXT"),
+        ("patient_dob", "TEXT"),
+        ("request_date", "TEXT"),
+        ("institution_id", "INTEGER"),
+        ("modality", "TEXT"),
+        ("org_id", "INTEGER"),
+        ("contrast_required", "TEXT"),
+        ("contrast_details", "TEXT"),
+    ]
+    conn = get_db()
+    if using_postgres():
+        columns += [
+            ("uploaded_filename", "TEXT"),
+            ("stored_filepath", "TEXT"),
+            ("admin_notes", "TEXT"),
+            ("radiologist", "TEXT"),
+        ]
+    elif _sqlite_table_missing(conn, "cases"):
         conn.close()
         return
 
-    cur.execute("PRAGMA table_info(cases)")
-    cols = {row[1] for row in cur.fetchall()}
-
-    if "status" not in cols:
-        cur.execute("ALTER TABLE cases ADD COLUMN status TEXT NOT NULL DEFAULT 'pending'")
-    if "vetted_at" not in cols:
-        cur.execute("ALTER TABLE cases ADD COLUMN vetted_at TEXT")
-    if "protocol" not in cols:
-        cur.execute("ALTER TABLE cases ADD COLUMN protocol TEXT")
-    if "decision" not in cols:
-        cur.execute("ALTER TABLE cases ADD COLUMN decision TEXT")
-    if "decision_comment" not in cols:
-        cur.execute("ALTER TABLE cases ADD COLUMN decision_comment TEXT")
-    if "patient_first_name" not in cols:
-        cur.execute("ALTER TABLE cases ADD COLUMN patient_first_name TEXT")
-    if "patient_surname" not in cols:
-        cur.execute("ALTER TABLE cases ADD COLUMN patient_surname TEXT")
-    if "patient_referral_id" not in cols:
-        cur.execute("ALTER TABLE cases ADD COLUMN patient_referral_id TEXT")
-    if "patient_dob" not in cols:
-        cur.execute("ALTER TABLE cases ADD COLUMN patient_dob TEXT")
-    if "request_date" not in cols:
-        cur.execute("ALTER TABLE cases ADD COLUMN request_date TEXT")
-    if "institution_id" not in cols:
-        cur.execute("ALTER TABLE cases ADD COLUMN institution_id INTEGER")
-    if "modality" not in cols:
-        cur.execute("ALTER TABLE cases ADD COLUMN modality TEXT")
-    if "org_id" not in cols:
-        cur.execute("ALTER TABLE cases ADD COLUMN org_id INTEGER")
-    if "contrast_required" not in cols:
-        cur.execute("ALTER TABLE cases ADD COLUMN contrast_required TEXT")
-    if "contrast_details" not in cols:
-        cur.execute("ALTER TABLE cases ADD COLUMN contrast_details TEXT")
+    add_missing_columns(conn, "cases", columns)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cases_org_created ON cases(org_id, created_at)")
+    # Worklists filter on status (and org) and sort by created_at.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cases_status_created ON cases(status, created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_cases_org_status ON cases(org_id, status, created_at)")
 
     conn.commit()
     conn.close()
@@ -1411,27 +1919,15 @@ def ensure_institutions_schema() -> None:
     """
     Safe schema upgrades for the institutions table (Bug 2: Add modified_at column).
     """
-    if using_postgres():
-        conn = get_db()
-        conn.execute("ALTER TABLE institutions ADD COLUMN IF NOT EXISTS modified_at TEXT")
-        conn.execute("ALTER TABLE institutions ADD COLUMN IF NOT EXISTS org_id INTEGER")
-        conn.commit()
-        conn.close()
-        return
+    columns = [("modified_at", "TEXT")]
     conn = get_db()
-    cur = conn.cursor()
-
-    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='institutions'")
-    if not cur.fetchone():
+    if using_postgres():
+        columns.append(("org_id", "INTEGER"))
+    elif _sqlite_table_missing(conn, "institutions"):
         conn.close()
         return
 
-    cur.execute("PRAGMA table_info(institutions)")
-    cols = {row[1] for row in cur.fetchall()}
-
-    if "modified_at" not in cols:
-        cur.execute("ALTER TABLE institutions ADD COLUMN modified_at TEXT")
-
+    add_missing_columns(conn, "institutions", columns)
     conn.commit()
     conn.close()
 
@@ -1440,36 +1936,20 @@ def ensure_radiologists_schema() -> None:
     """
     Safe schema upgrades for the radiologists table.
     """
-    if using_postgres():
-        conn = get_db()
-        conn.execute("ALTER TABLE radiologists ADD COLUMN IF NOT EXISTS first_name TEXT")
-        conn.execute("ALTER TABLE radiologists ADD COLUMN IF NOT EXISTS email TEXT")
-        conn.execute("ALTER TABLE radiologists ADD COLUMN IF NOT EXISTS surname TEXT")
-        conn.execute("ALTER TABLE radiologists ADD COLUMN IF NOT EXISTS gmc TEXT")
-        conn.execute("ALTER TABLE radiologists ADD COLUMN IF NOT EXISTS speciality TEXT")
-        conn.commit()
-        conn.close()
-        return
+    columns = [
+        ("first_name", "TEXT"),
+        ("surname", "TEXT"),
+        ("gmc", "TEXT"),
+        ("speciality", "TEXT"),
+    ]
     conn = get_db()
-    cur = conn.cursor()
-
-    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='radiologists'")
-    if not cur.fetchone():
+    if using_postgres():
+        columns.append(("email", "TEXT"))
+    elif _sqlite_table_missing(conn, "radiologists"):
         conn.close()
         return
 
-    cur.execute("PRAGMA table_info(radiologists)")
-    cols = {row[1] for row in cur.fetchall()}
-
-    if "first_name" not in cols:
-        cur.execute("ALTER TABLE radiologists ADD COLUMN first_name TEXT")
-    if "surname" not in cols:
-        cur.execute("ALTER TABLE radiologists ADD COLUMN surname TEXT")
-    if "gmc" not in cols:
-        cur.execute("ALTER TABLE radiologists ADD COLUMN gmc TEXT")
-    if "speciality" not in cols:
-        cur.execute("ALTER TABLE radiologists ADD COLUMN speciality TEXT")
-
+    add_missing_columns(conn, "radiologists", columns)
     conn.commit()
     conn.close()
 
@@ -1478,50 +1958,26 @@ def ensure_users_schema() -> None:
     """
     Safe schema upgrades for the users table.
     """
-    if using_postgres():
-        conn = get_db()
-        conn.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS first_name TEXT")
-        conn.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS surname TEXT")
-        conn.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS email TEXT")
-        conn.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS role TEXT")
-        conn.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS radiologist_name TEXT")
-        conn.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS mfa_enabled INTEGER NOT NULL DEFAULT 0")
-        conn.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS mfa_required INTEGER NOT NULL DEFAULT 0")
-        conn.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS mfa_secret TEXT")
-        conn.execute("ALTER TABLE users ADD COLUMN IF NOT EXISTS mfa_pending_secret TEXT")
-        conn.commit()
-        conn.close()
-        return
     conn = get_db()
-    cur = conn.cursor()
-
-    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='users'")
-    if not cur.fetchone():
+    if not using_postgres() and _sqlite_table_missing(conn, "users"):
         conn.close()
         return
 
-    cur.execute("PRAGMA table_info(users)")
-    cols = {row[1] for row in cur.fetchall()}
-
-    if "first_name" not in cols:
-        cur.execute("ALTER TABLE users ADD COLUMN first_name TEXT")
-    if "surname" not in cols:
-        cur.execute("ALTER TABLE users ADD COLUMN surname TEXT")
-    if "email" not in cols:
-        cur.execute("ALTER TABLE users ADD COLUMN email TEXT")
-    if "role" not in cols:
-        cur.execute("ALTER TABLE users ADD COLUMN role TEXT")
-    if "radiologist_name" not in cols:
-        cur.execute("ALTER TABLE users ADD COLUMN radiologist_name TEXT")
-    if "mfa_enabled" not in cols:
-        cur.execute("ALTER TABLE users ADD COLUMN mfa_enabled INTEGER NOT NULL DEFAULT 0")
-    if "mfa_required" not in cols:
-        cur.execute("ALTER TABLE users ADD COLUMN mfa_required INTEGER NOT NULL DEFAULT 0")
-    if "mfa_secret" not in cols:
-        cur.execute("ALTER TABLE users ADD COLUMN mfa_secret TEXT")
-    if "mfa_pending_secret" not in cols:
-        cur.execute("ALTER TABLE users ADD COLUMN mfa_pending_secret TEXT")
-
+    add_missing_columns(
+        conn,
+        "users",
+        [
+            ("first_name", "TEXT"),
+            ("surname", "TEXT"),
+            ("email", "TEXT"),
+            ("role", "TEXT"),
+            ("radiologist_name", "TEXT"),
+            ("mfa_enabled", "INTEGER NOT NULL DEFAULT 0"),
+            ("mfa_required", "INTEGER NOT NULL DEFAULT 0"),
+            ("mfa_secret", "TEXT"),
+            ("mfa_pending_secret", "TEXT"),
+        ],
+    )
     conn.commit()
     conn.close()
 
@@ -1530,35 +1986,23 @@ def ensure_protocols_schema() -> None:
     """
     Safe schema upgrades for the protocols table.
     """
-    if using_postgres():
-        conn = get_db()
-        conn.execute("ALTER TABLE protocols ADD COLUMN IF NOT EXISTS institution_id INTEGER")
-        conn.execute("ALTER TABLE protocols ADD COLUMN IF NOT EXISTS study_description_preset_id INTEGER")
-        conn.execute("ALTER TABLE protocols ADD COLUMN IF NOT EXISTS instructions TEXT")
-        conn.execute("ALTER TABLE protocols ADD COLUMN IF NOT EXISTS last_modified TEXT")
-        conn.execute("ALTER TABLE protocols ADD COLUMN IF NOT EXISTS is_active INTEGER NOT NULL DEFAULT 1")
-        conn.execute("ALTER TABLE protocols ADD COLUMN IF NOT EXISTS org_id INTEGER")
-        conn.commit()
-        conn.close()
-        return
+    columns = [
+        ("institution_id", "INTEGER"),
+        ("org_id", "INTEGER"),
+        ("study_description_preset_id", "INTEGER"),
+    ]
     conn = get_db()
-    cur = conn.cursor()
-
-    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='protocols'")
-    if not cur.fetchone():
+    if using_postgres():
+        columns += [
+            ("instructions", "TEXT"),
+            ("last_modified", "TEXT"),
+            ("is_active", "INTEGER NOT NULL DEFAULT 1"),
+        ]
+    elif _sqlite_table_missing(conn, "protocols"):
         conn.close()
         return
 
-    cur.execute("PRAGMA table_info(protocols)")
-    cols = {row[1] for row in cur.fetchall()}
-
-    if "institution_id" not in cols:
-        cur.execute("ALTER TABLE protocols ADD COLUMN institution_id INTEGER")
-    if "org_id" not in cols:
-        cur.execute("ALTER TABLE protocols ADD COLUMN org_id INTEGER")
-    if "study_description_preset_id" not in cols:
-        cur.execute("ALTER TABLE protocols ADD COLUMN study_description_preset_id INTEGER")
-
+    add_missing_columns(conn, "protocols", columns)
     conn.commit()
     conn.close()
 
@@ -1579,7 +2023,6 @@ def ensure_study_description_presets_schema() -> None:
     cols = {row[1] for row in cur.fetchall()}
     if "is_active" not in cols:
         cur.execute("ALTER TABLE study_description_presets ADD COLUMN is_active INTEGER NOT NULL DEFAULT 1")
-        cur.execute("UPDATE study_description_presets SET is_active = 1 WHERE is_active IS NULL")
     if "study_code" not in cols:
         cur.execute("ALTER TABLE study_description_presets ADD COLUMN study_code TEXT")
     conn.commit()
@@ -1721,6 +2164,7 @@ def ensure_notify_events_schema() -> None:
         conn.execute("ALTER TABLE notify_events ADD COLUMN IF NOT EXISTS message TEXT")
         conn.execute("ALTER TABLE notify_events ADD COLUMN IF NOT EXISTS created_by TEXT")
         conn.execute("ALTER TABLE notify_events ADD COLUMN IF NOT EXISTS created_by_id INTEGER")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_notify_events_org_created ON notify_events(org_id, created_at)")
         conn.commit()
         conn.close()
         return
@@ -1740,6 +2184,7 @@ def ensure_notify_events_schema() -> None:
         )
         """
     )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_notify_events_org_created ON notify_events(org_id, created_at)")
     conn.commit()
     conn.close()
 
@@ -1754,6 +2199,7 @@ def ensure_case_events_schema() -> None:
         conn.execute("ALTER TABLE case_events ADD COLUMN IF NOT EXISTS decision TEXT")
         conn.execute("ALTER TABLE case_events ADD COLUMN IF NOT EXISTS protocol TEXT")
         conn.execute("ALTER TABLE case_events ADD COLUMN IF NOT EXISTS comment TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_case_events_case_created ON case_events(case_id, created_at)")
         conn.commit()
         conn.close()
         return
@@ -1779,10 +2225,27 @@ def ensure_case_events_schema() -> None:
         cur.execute("ALTER TABLE case_events ADD COLUMN protocol TEXT")
     if "comment" not in cols:
         cur.execute("ALTER TABLE case_events ADD COLUMN comment TEXT")
+    # Case timelines load one case's events in created_at order.
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_case_events_case_created ON case_events(case_id, created_at)")
     conn.commit()
     conn.close()
 
 
+CLEANUP_UNLINK_WORKERS = 8
+
+
+def _unlink_expired_file(filepath: str) -> bool:
+    # unlink and treat "already gone" as fine: one syscall instead of stat + unlink.
+    try:
+        os.unlink(filepath)
+        return True
+    except FileNotFoundError:
+        return False
+    except Exception as e:
+        print(f"[TTL] Could not delete file {filepath}: {e}")
+        return False
+
+
 def cleanup_old_files() -> None:
     """
     Storage TTL enforcement:
@@ -1804,23 +2267,21 @@ def cleanup_old_files() -> None:
             (cutoff_referral,)
         ).fetchall()
 
+        # Unlinks are independent and mostly wait on storage (a network share on App Service),
+        # so overlap them instead of removing one file at a time.
+        filepaths = [row["stored_filepath"] for row in rows]
         deleted_count = 0
-        for row in rows:
-            filepath = row["stored_filepath"]
-            try:
-                p = Path(filepath)
-                if p.exists():
-                    p.unlink()
-                    deleted_count += 1
-            except Exception as e:
-                print(f"[TTL] Could not delete file {filepath}: {e}")
-            # Null out the stored path so UI shows 'unavailable' gracefully
-            conn.execute(
-                "UPDATE cases SET stored_filepath = NULL WHERE id = ?",
-                (row["id"],)
-            )
+        if filepaths:
+            with ThreadPoolExecutor(max_workers=min(CLEANUP_UNLINK_WORKERS, len(filepaths))) as pool:
+                deleted_count = sum(pool.map(_unlink_expired_file, filepaths))
 
         if rows:
+            # Null out the stored paths so UI shows 'unavailable' gracefully; same filter as the
+            # SELECT, so every row visited above is cleared in one statement.
+            conn.execute(
+                "UPDATE cases SET stored_filepath = NULL WHERE created_at < ? AND stored_filepath IS NOT NULL AND stored_filepath != ''",
+                (cutoff_referral,)
+            )
             conn.commit()
             print(f"[TTL] Referral file cleanup: deleted {deleted_count}/{len(rows)} files older than {REFERRAL_FILE_TTL_DAYS} days.")
         conn.close()
@@ -1854,7 +2315,8 @@ def list_radiologists(org_id: int | None = None) -> list[dict]:
         conn = get_db()
         rows = conn.execute(
             """
-            SELECT u.username as name, u.email, u.surname, rp.gmc, rp.specialty as speciality, rp.display_name
+            SELECT COALESCE(NULLIF(rp.display_name, ''), u.username) as name, u.email, u.surname,
+                   rp.gmc, rp.specialty as speciality, rp.display_name
             FROM memberships m
             JOIN users u ON m.user_id = u.id
             LEFT JOIN radiologist_profiles rp ON rp.user_id = u.id
@@ -1864,13 +2326,7 @@ def list_radiologists(org_id: int | None = None) -> list[dict]:
             (org_id,),
         ).fetchall()
         conn.close()
-        result = []
-        for r in rows:
-            d = dict(r)
-            if d.get("display_name"):
-                d["name"] = d["display_name"]
-            result.append(d)
-        return result
+        return [dict(r) for r in rows]
 
     if table_exists("users"):
         conn = get_db()
@@ -1956,25 +2412,35 @@ def ensure_default_protocols() -> None:
     conn = get_db()
     row = conn.execute("SELECT COUNT(*) AS c FROM protocols").fetchone()
     if row and row["c"] == 0:
-        for p in DEFAULT_PROTOCOLS:
-            conn.execute("INSERT OR IGNORE INTO protocols(name, is_active) VALUES(?, 1)", (p,))
+        conn.executemany(
+            "INSERT OR IGNORE INTO protocols(name, is_active) VALUES(?, 1)",
+            [(p,) for p in DEFAULT_PROTOCOLS],
+        )
         conn.commit()
     conn.close()
 
 
-def _load_study_presets_from_migration() -> list[tuple[str, str, str]]:
+_PRESET_CSV_HEADER_RE = re.compile(r"[^a-z0-9]+")
+_PRESET_SQL_VALUES_RE = re.compile(r"\(\s*1\s*,\s*'([^']+)'\s*,\s*'((?:''|[^'])+)'\s*,")
+
+
+# The migration files ship with the code, so they are parsed once per process; the exam
+# catalogue is re-seeded from here whenever an organisation is set up.
+@functools.lru_cache(maxsize=1)
+def _load_study_presets_from_migration() -> tuple[tuple[str, str, str], ...]:
     full_csv_path = BASE_DIR / "database" / "migrations" / "004_study_description_presets_full.csv"
     if full_csv_path.exists():
         presets: list[tuple[str, str, str]] = []
         seen: set[tuple[str, str, str]] = set()
         try:
             with full_csv_path.open("r", encoding="utf-8", errors="ignore", newline="") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    normalized_row = {
-                        re.sub(r"[^a-z0-9]+", "_", str(key or "").strip().lower()).strip("_"): value
-                        for key, value in row.items()
-                    }
+                reader = csv.reader(f)
+                header = [
+                    _PRESET_CSV_HEADER_RE.sub("_", str(key or "").strip().lower()).strip("_")
+                    for key in next(reader, [])
+                ]
+                for values in reader:
+                    normalized_row = dict(zip(header, values))
                     modality_clean = (normalized_row.get("modality") or "").strip().upper()
                     description_clean = (
                         normalized_row.get("description")
@@ -1994,24 +2460,23 @@ def _load_study_presets_from_migration() -> list[tuple[str, str, str]]:
                     seen.add(key)
                     presets.append(key)
             if presets:
-                return presets
+                return tuple(presets)
         except Exception:
             pass
 
     migration_path = BASE_DIR / "database" / "migrations" / "003_study_description_presets.sql"
     if not migration_path.exists():
-        return []
+        return ()
 
     try:
         sql_text = migration_path.read_text(encoding="utf-8", errors="ignore")
     except Exception:
-        return []
+        return ()
 
-    pattern = re.compile(r"\(\s*1\s*,\s*'([^']+)'\s*,\s*'((?:''|[^'])+)'\s*,")
     presets: list[tuple[str, str, str]] = []
     seen: set[tuple[str, str, str]] = set()
 
-    for modality, description in pattern.findall(sql_text):
+    for modality, description in _PRESET_SQL_VALUES_RE.findall(sql_text):
         modality_clean = modality.strip().upper()
         description_clean = description.replace("''", "'").strip()
         if not modality_clean or not description_clean:
@@ -2022,7 +2487,7 @@ def _load_study_presets_from_migration() -> list[tuple[str, str, str]]:
         seen.add(key)
         presets.append(key)
 
-    return presets
+    return tuple(presets)
 
 
 def assign_exam_catalogue_to_org(org_id: int, assigned_by: int | None = None, preset_ids: list[int] | None = None) -> None:
@@ -2138,37 +2603,22 @@ def ensure_default_study_description_presets() -> None:
         ]
 
     now = utc_now_iso()
-    for modality, description, study_code in presets:
-        if using_postgres():
-            conn.execute(
-                """
-                INSERT INTO study_description_presets (organization_id, modality, description, study_code, created_at, updated_at, created_by, is_active)
-                VALUES (0, ?, ?, ?, ?, ?, ?, 1)
-                ON CONFLICT (organization_id, modality, description) DO UPDATE SET
-                    study_code = CASE
-                        WHEN COALESCE(study_description_presets.study_code, '') = '' AND COALESCE(EXCLUDED.study_code, '') <> '' THEN EXCLUDED.study_code
-                        ELSE study_description_presets.study_code
-                    END,
-                    is_active = 1,
-                    updated_at = EXCLUDED.updated_at
-                """,
-                (modality, description, study_code or None, now, now, 1),
-            )
-        else:
-            conn.execute(
-                """
-                INSERT INTO study_description_presets (organization_id, modality, description, study_code, created_at, updated_at, created_by, is_active)
-                VALUES (0, ?, ?, ?, ?, ?, ?, 1)
-                ON CONFLICT (organization_id, modality, description) DO UPDATE SET
-                    study_code = CASE
-                        WHEN COALESCE(study_description_presets.study_code, '') = '' AND COALESCE(excluded.study_code, '') <> '' THEN excluded.study_code
-                        ELSE study_description_presets.study_code
-                    END,
-                    is_active = 1,
-                    updated_at = excluded.updated_at
-                """,
-                (modality, description, study_code or None, now, now, 1),
-            )
+    # One statement for every preset: sqlite3 reuses the prepared statement per row, and
+    # SQLAlchemy sends the list as a batched executemany on Postgres.
+    conn.executemany(
+        """
+        INSERT INTO study_description_presets (organization_id, modality, description, study_code, created_at, updated_at, created_by, is_active)
+        VALUES (0, ?, ?, ?, ?, ?, ?, 1)
+        ON CONFLICT (organization_id, modality, description) DO UPDATE SET
+            study_code = CASE
+                WHEN COALESCE(study_description_presets.study_code, '') = '' AND COALESCE(excluded.study_code, '') <> '' THEN excluded.study_code
+                ELSE study_description_presets.study_code
+            END,
+            is_active = 1,
+            updated_at = excluded.updated_at
+        """,
+        [(modality, description, study_code or None, now, now, 1) for modality, description, study_code in presets],
+    )
 
     organisations = conn.execute("SELECT id FROM organisations ORDER BY id").fetchall()
     conn.commit()
@@ -2619,7 +3069,7 @@ def resolve_case_exam_selection(
     cleaned_study_description = (study_description or "").strip()
     cleaned_study_code = (study_code or "").strip() or None
     cleaned_modality = (modality or "").strip().upper() or None
-    exception_requested = str(uncatalogued_exam_requested or "").strip().lower() in {"1", "true", "on", "yes"}
+    exception_requested = form_flag(uncatalogued_exam_requested)
     exception_reason = (uncatalogued_exam_reason or "").strip()
 
     existing_description = (str(existing_case.get("study_description") or "").strip() if existing_case else "")
@@ -2686,35 +3136,54 @@ def resolve_case_exam_selection(
     raise HTTPException(status_code=400, detail="Please select an exam from the master exam catalogue")
 
 
-def upsert_protocol(name: str) -> None:
-    name = name.strip()
-    if not name:
-        return
-    conn = get_db()
-    if using_postgres():
-        conn.execute("INSERT INTO protocols(name, is_active) VALUES(?, 1)", (name,))
-    else:
-        conn.execute("INSERT OR IGNORE INTO protocols(name, is_active) VALUES(?, 1)", (name,))
-    conn.execute("UPDATE protocols SET is_active = 1 WHERE name = ?", (name,))
-    conn.commit()
-    conn.close()
-
-
 def deactivate_protocol(name: str, org_id: int | None = None) -> None:
     conn = get_db()
     if org_id and table_has_column("protocols", "org_id"):
-        conn.execute("UPDATE protocols SET is_active = 0 WHERE name = ? AND org_id = ?", (name.strip(), org_id))
+        cur = conn.execute(
+            "UPDATE protocols SET is_active = 0 WHERE name = ? AND org_id = ? AND is_active = 1",
+            (name.strip(), org_id),
+        )
     else:
-        conn.execute("UPDATE protocols SET is_active = 0 WHERE name = ?", (name.strip(),))
-    conn.commit()
+        cur = conn.execute("UPDATE protocols SET is_active = 0 WHERE name = ? AND is_active = 1", (name.strip(),))
+    # Nothing matched (unknown or already inactive): skip the commit round-trip.
+    if cur.rowcount:
+        conn.commit()
     conn.close()
 
 
 # -------------------------
 # Users (PBKDF2)
 # -------------------------
+# Stored hashes depend on this, so changing it invalidates every existing password.
+# hashlib hands PBKDF2 to OpenSSL (SHA-NI accelerated where the CPU has it) and releases the
+# GIL while it runs; the sync login/password handlers run in the threadpool, so a hash never
+# stalls the event loop or other requests.
+PASSWORD_HASH_ITERATIONS = 200_000
+
+
 def hash_password(password: str, salt: bytes) -> bytes:
-    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, 200_000)
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, PASSWORD_HASH_ITERATIONS)
+
+
+PASSWORD_SALT_BYTES = 16
+_salt_entropy = bytearray()
+_salt_entropy_pid = os.getpid()
+_salt_entropy_lock = threading.Lock()
+
+
+def new_password_salt() -> bytes:
+    # Slice salts from one larger os.urandom read; bulk user imports otherwise pay a syscall per salt.
+    global _salt_entropy_pid
+    with _salt_entropy_lock:
+        if _salt_entropy_pid != os.getpid():
+            # Never hand a forked worker the same buffered bytes as its parent.
+            _salt_entropy.clear()
+            _salt_entropy_pid = os.getpid()
+        if len(_salt_entropy) < PASSWORD_SALT_BYTES:
+            _salt_entropy.extend(os.urandom(4096))
+        salt = bytes(_salt_entropy[:PASSWORD_SALT_BYTES])
+        del _salt_entropy[:PASSWORD_SALT_BYTES]
+    return salt
 
 
 def generate_totp_secret(length: int = 20) -> str:
@@ -2776,6 +3245,29 @@ def build_totp_qr_data_uri(uri: str) -> str:
     return f"data:image/png;base64,{encoded}"
 
 
+# The account page re-renders the same pending setup QR on every reload until MFA is confirmed;
+# rendering the PNG is far costlier than the page itself. The otpauth URI embeds the TOTP secret,
+# so an image is only kept per user for the setup window and dropped once setup ends.
+TOTP_QR_CACHE_SECONDS = 600
+_totp_qr_cache: dict[str, tuple[str, str, float]] = {}
+
+
+def discard_pending_totp_qr(username: str) -> None:
+    _totp_qr_cache.pop(username, None)
+
+
+def get_pending_totp_qr_data_uri(username: str, uri: str) -> str:
+    now = time.monotonic()
+    for key in [k for k, entry in _totp_qr_cache.items() if entry[2] <= now]:
+        _totp_qr_cache.pop(key, None)
+    cached = _totp_qr_cache.get(username)
+    if cached and cached[0] == uri:
+        return cached[1]
+    data_uri = build_totp_qr_data_uri(uri)
+    _totp_qr_cache[username] = (uri, data_uri, now + TOTP_QR_CACHE_SECONDS)
+    return data_uri
+
+
 def verify_current_password(username: str, password: str) -> bool:
     if not username or not password:
         return False
@@ -2847,6 +3339,7 @@ def complete_login(request: Request, user: dict) -> RedirectResponse:
                     (user.get("id"), session_id)
                 )
                 conn.commit()
+                _active_session_cache[user.get("id")] = (session_id, time.monotonic())
             except Exception:
                 pass
             conn.close()
@@ -2864,7 +3357,7 @@ def create_user(username: str, password: str, role: str, radiologist_name: str |
     if role == "radiologist" and not radiologist_name:
         raise ValueError("Radiologist name is required")
 
-    salt = secrets.token_bytes(16)
+    salt = new_password_salt()
     pw_hash = hash_password(password, salt)
 
     conn = get_db()
@@ -2891,23 +3384,31 @@ def verify_user(username: str, password: str) -> dict | None:
     normalized_username = username.strip()
 
     conn = get_db()
-    row = conn.execute("SELECT * FROM users WHERE username = ?", (normalized_username,)).fetchone()
+    if table_exists("memberships"):
+        # The first active membership decides the role; fetch it with the user row.
+        row = conn.execute(
+            "SELECT u.*, m.org_role AS membership_org_role FROM users u "
+            "LEFT JOIN memberships m ON m.user_id = u.id AND m.is_active = 1 "
+            "WHERE u.username = ? ORDER BY m.id LIMIT 1",
+            (normalized_username,),
+        ).fetchone()
+    else:
+        row = conn.execute("SELECT * FROM users WHERE username = ?", (normalized_username,)).fetchone()
     conn.close()
     if not row:
         return None
 
-    salt = bytes.fromhex(row["salt_hex"])
-    
+    # One dict up front: column checks below are then plain key lookups on either backend.
+    user_dict = dict(row)
+    membership_org_role = user_dict.pop("membership_org_role", None)
+    salt = bytes.fromhex(user_dict["salt_hex"])
+
     # Support both old (pw_hash_hex) and new (password_hash) column names
-    # Check which column exists in the row
-    try:
-        pw_hash_hex = row["password_hash"]
-    except (KeyError, IndexError):
-        try:
-            pw_hash_hex = row["pw_hash_hex"]
-        except (KeyError, IndexError):
-            return None
-    
+    if "password_hash" in user_dict:
+        pw_hash_hex = user_dict["password_hash"]
+    else:
+        pw_hash_hex = user_dict.get("pw_hash_hex")
+
     if not pw_hash_hex:
         return None
         
@@ -2915,9 +3416,7 @@ def verify_user(username: str, password: str) -> dict | None:
     provided = hash_password(password, salt)
     
     if secrets.compare_digest(provided, expected):
-        user_dict = dict(row)
         # Map new structure to old for backward compatibility
-        row_keys = row.keys()
         stored_radiologist_name = (
             user_dict.get("radiologist_name")
             or " ".join(
@@ -2930,30 +3429,23 @@ def verify_user(username: str, password: str) -> dict | None:
             )
             or str(user_dict.get("username") or "").strip()
         )
-        if "is_superuser" in row_keys:
-            user_dict["is_superuser"] = bool(row["is_superuser"])
+        if "is_superuser" in user_dict:
+            user_dict["is_superuser"] = bool(user_dict["is_superuser"])
 
             if user_dict["is_superuser"]:
                 user_dict["role"] = "admin"
             else:
                 # Map role from active membership (only if user has id column)
-                if "id" in row_keys:
-                    conn = get_db()
-                    membership = conn.execute(
-                        "SELECT org_role FROM memberships WHERE user_id = ? AND is_active = 1 ORDER BY id LIMIT 1",
-                        (row["id"],),
-                    ).fetchone()
-                    conn.close()
-
-                    if membership and membership["org_role"] == "org_admin":
+                if "id" in user_dict:
+                    if membership_org_role == "org_admin":
                         user_dict["role"] = "admin"
-                    elif membership and membership["org_role"] == "radiologist":
+                    elif membership_org_role == "radiologist":
                         user_dict["role"] = "radiologist"
                     else:
                         user_dict["role"] = "user"
                 else:
                     # Fall back to role column for old schema
-                    user_dict["role"] = row.get("role", "user")
+                    user_dict["role"] = user_dict.get("role", "user")
 
             if table_exists("memberships"):
                 user_dict["radiologist_name"] = None  # Will be looked up separately if needed
@@ -2976,6 +3468,12 @@ def list_users(org_id: int | None = None) -> list[dict]:
                     u.is_active, u.first_name, u.surname, COALESCE(u.mfa_enabled, 0) AS mfa_enabled,
                     COALESCE(u.mfa_required, 0) AS mfa_required,
                     m.org_role as org_role,
+                    CASE
+                        WHEN COALESCE(m.org_role, '') = '' THEN NULL
+                        WHEN m.org_role = 'org_admin' THEN 'admin'
+                        WHEN m.org_role = 'radiologist' THEN 'radiologist'
+                        ELSE 'user'
+                    END as role,
                     NULL as radiologist_name
                 FROM users u
                 INNER JOIN memberships m ON m.user_id = u.id AND m.org_id = ? AND m.is_active = 1
@@ -3008,18 +3506,7 @@ def list_users(org_id: int | None = None) -> list[dict]:
         """).fetchall()
     
     conn.close()
-    result = []
-    for r in rows:
-        d = dict(r)
-        if "org_role" in d and d.get("org_role"):
-            if d["org_role"] == "org_admin":
-                d["role"] = "admin"
-            elif d["org_role"] == "radiologist":
-                d["role"] = "radiologist"
-            else:
-                d["role"] = "user"
-        result.append(d)
-    return result
+    return [dict(r) for r in rows]
 
 
 def delete_user(username: str) -> None:
@@ -3035,8 +3522,14 @@ def delete_user(username: str) -> None:
 def ensure_seed_data() -> None:
     if using_postgres():
         return
-    if not get_setting("system_initialized", ""):
-        set_setting("system_initialized", "true")
+    # One conditional upsert on one connection instead of a get_setting/set_setting round trip.
+    conn = get_db()
+    conn.execute(
+        "INSERT INTO config(key, value) VALUES('system_initialized', 'true') "
+        "ON CONFLICT(key) DO UPDATE SET value=excluded.value WHERE config.value = ''"
+    )
+    conn.commit()
+    conn.close()
 
 
 def ensure_owner_account(
@@ -3047,6 +3540,7 @@ def ensure_owner_account(
     first_name: str = "P",
     surname: str = "Mendyk",
     demote_other_superusers: bool = False,
+    skip_if_current: bool = False,
 ) -> str:
     if not table_has_column("users", "is_superuser"):
         raise RuntimeError("Users table does not support superuser accounts in this schema.")
@@ -3061,20 +3555,51 @@ def ensure_owner_account(
     if not owner_password:
         raise ValueError("Owner password is required.")
 
-    now = utc_now_iso()
-    salt = secrets.token_bytes(16)
-    pw_hash = hash_password(owner_password, salt)
     has_role_column = table_has_column("users", "role")
     has_radiologist_name_column = table_has_column("users", "radiologist_name")
 
     conn = get_db()
+    if skip_if_current:
+        # Startup bootstrap: leave the row (and its salt) alone when it already matches, so a
+        # restart costs one hash check instead of a new salt, a rehash and a write.
+        current = conn.execute("SELECT * FROM users WHERE username = ?", (owner_username,)).fetchone()
+        current = dict(current) if current else None
+        if (
+            current
+            and current.get("is_superuser") == 1
+            and current.get("is_active") == 1
+            and current.get("email") == owner_email
+            and current.get("first_name") == owner_first_name
+            and current.get("surname") == owner_surname
+            and (not has_role_column or current.get("role") is not None)
+            and (not has_radiologist_name_column or current.get("radiologist_name") is None)
+            and current.get("salt_hex")
+            and current.get("password_hash")
+            and secrets.compare_digest(
+                hash_password(owner_password, bytes.fromhex(current["salt_hex"])).hex(),
+                str(current["password_hash"]),
+            )
+            and not (
+                demote_other_superusers
+                and conn.execute(
+                    "SELECT 1 FROM users WHERE is_superuser = 1 AND COALESCE(username, '') != ? LIMIT 1",
+                    (owner_username,),
+                ).fetchone()
+            )
+        ):
+            conn.close()
+            return "unchanged"
+
+    now = utc_now_iso()
+    salt = new_password_salt()
+    pw_hash = hash_password(owner_password, salt)
     if demote_other_superusers:
         conn.execute(
             """
             UPDATE users
             SET is_superuser = 0,
                 modified_at = ?
-            WHERE COALESCE(username, '') != ?
+            WHERE is_superuser = 1 AND COALESCE(username, '') != ?
             """,
             (now, owner_username),
         )
@@ -3153,7 +3678,7 @@ def ensure_local_owner_account() -> None:
     if not table_has_column("users", "is_superuser"):
         return
 
-    owner_username = os.environ.get("OWNER_ADMIN_USERNAME", "P.Mendyk").strip() or "P.Mendyk"
+    owner_username = OWNER_ADMIN_USERNAME
     owner_password = (os.environ.get("OWNER_ADMIN_PASSWORD") or "").strip()
     owner_email = os.environ.get("OWNER_ADMIN_EMAIL", "").strip() or None
     if not owner_password:
@@ -3165,6 +3690,7 @@ def ensure_local_owner_account() -> None:
         owner_password,
         owner_email,
         demote_other_superusers=True,
+        skip_if_current=True,
     )
 def list_institutions(org_id: int | None = None) -> list[dict]:
     conn = get_db()
@@ -3215,13 +3741,12 @@ def ensure_default_institution(org_id: int | None) -> dict | None:
     if institutions:
         return institutions[0]
 
-    conn = get_db()
-    org_row = conn.execute("SELECT name FROM organisations WHERE id = ?", (org_id,)).fetchone()
-    if not org_row:
-        conn.close()
+    org_name = get_org_name(org_id)
+    if org_name is None:
         return None
 
-    org_name = (org_row.get("name") if isinstance(org_row, dict) else org_row[0]) or "Default Institution"
+    org_name = org_name or "Default Institution"
+    conn = get_db()
     now = utc_now_iso()
     if table_has_column("institutions", "org_id"):
         conn.execute(
@@ -3269,10 +3794,7 @@ def get_default_institution(org_id: int | None) -> dict | None:
     if not institutions:
         return ensure_default_institution(org_id)
 
-    conn = get_db()
-    org_row = conn.execute("SELECT name FROM organisations WHERE id = ?", (org_id,)).fetchone()
-    conn.close()
-    org_name = ((org_row.get("name") if isinstance(org_row, dict) else org_row[0]) if org_row else "") or ""
+    org_name = get_org_name(org_id) or ""
     if org_name:
         for institution in institutions:
             if str(institution.get("name") or "").strip().lower() == org_name.strip().lower():
@@ -3282,26 +3804,26 @@ def get_default_institution(org_id: int | None) -> dict | None:
 
 def upsert_institution(name: str, sla_hours: int, org_id: int | None = None) -> int:
     conn = get_db()
+    # RETURNING hands back the row id from the upsert itself, without a follow-up SELECT.
     if org_id and table_has_column("institutions", "org_id"):
-        conn.execute(
+        rows = conn.execute(
             "INSERT INTO institutions(name, sla_hours, created_at, modified_at, org_id) VALUES(?, ?, ?, ?, ?) "
-            "ON CONFLICT(name) DO UPDATE SET sla_hours=excluded.sla_hours, modified_at=excluded.modified_at",
+            "ON CONFLICT(name) DO UPDATE SET sla_hours=excluded.sla_hours, modified_at=excluded.modified_at "
+            "RETURNING id, org_id",
             (name.strip(), sla_hours, utc_now_iso(), utc_now_iso(), org_id),
-        )
+        ).fetchall()
+        # Names are unique across organisations; an existing row owned elsewhere is not ours.
+        rows = [row for row in rows if row["org_id"] == org_id]
     else:
-        conn.execute(
+        rows = conn.execute(
             "INSERT INTO institutions(name, sla_hours, created_at, modified_at) VALUES(?, ?, ?, ?) "
-            "ON CONFLICT(name) DO UPDATE SET sla_hours=excluded.sla_hours, modified_at=excluded.modified_at",
+            "ON CONFLICT(name) DO UPDATE SET sla_hours=excluded.sla_hours, modified_at=excluded.modified_at "
+            "RETURNING id",
             (name.strip(), sla_hours, utc_now_iso(), utc_now_iso()),
-        )
+        ).fetchall()
     conn.commit()
-    if org_id and table_has_column("institutions", "org_id"):
-        row = conn.execute("SELECT id FROM institutions WHERE name = ? AND org_id = ?", (name.strip(), org_id)).fetchone()
-    else:
-        row = conn.execute("SELECT id FROM institutions WHERE name = ?", (name.strip(),)).fetchone()
-    inst_id = row["id"] if row else None
     conn.close()
-    return inst_id
+    return rows[0]["id"] if rows else None
 
 
 def delete_institution(inst_id: int, org_id: int | None = None) -> None:
@@ -3317,11 +3839,37 @@ def delete_institution(inst_id: int, org_id: int | None = None) -> None:
 # -------------------------
 # Auth helpers
 # -------------------------
+# The multi-window check compares the cookie's session_id with user_sessions on every
+# authenticated request. That row only changes on login, so keep it briefly per user; a login
+# handled by this process updates the entry at once, other workers see it within the TTL.
+ACTIVE_SESSION_CACHE_TTL_SECONDS = 30
+_active_session_cache: dict[int, tuple[str | None, float]] = {}
+
+
+def get_active_session_id(user_id: int) -> str | None:
+    cached = _active_session_cache.get(user_id)
+    if cached and time.monotonic() - cached[1] < ACTIVE_SESSION_CACHE_TTL_SECONDS:
+        return cached[0]
+    conn = get_db()
+    try:
+        stored_session_id = conn.execute_scalar(
+            "SELECT session_id FROM user_sessions WHERE user_id = ? LIMIT 1", (user_id,)
+        )
+    finally:
+        conn.close()
+    _active_session_cache[user_id] = (stored_session_id, time.monotonic())
+    return stored_session_id
+
+
 def get_session_user(request: Request) -> dict | None:
     """Get current user from session with expiration check and multi-window detection"""
     user = request.session.get("user")
     if not user:
         return None
+
+    # require_* helpers call this several times per request; validate the session once.
+    if getattr(request.state, "session_user", None) is user:
+        return user
     
     # Check if session has login timestamp and if it's expired
     login_time = request.session.get("login_time")
@@ -3339,25 +3887,22 @@ def get_session_user(request: Request) -> dict | None:
             # Validate session_id for multi-window logout (detect new login from another window)
             if session_id and user.get("id"):
                 try:
-                    conn = get_db()
-                    cur = conn.cursor()
-                    cur.execute("SELECT session_id FROM user_sessions WHERE user_id = ? LIMIT 1", (user.get("id"),))
-                    row = cur.fetchone()
-                    conn.close()
-                    if row:
-                        stored_session_id = row[0] if isinstance(row, tuple) else row.get("session_id")
-                        if stored_session_id and stored_session_id != session_id:
-                            # User logged in from another window/browser - invalidate this session
-                            request.session.clear()
-                            return None
+                    stored_session_id = get_active_session_id(user.get("id"))
+                    if stored_session_id and stored_session_id != session_id:
+                        # User logged in from another window/browser - invalidate this session
+                        request.session.clear()
+                        return None
                 except Exception:
                     pass  # Table might not exist for old schema, continue
             
-            # Update login_time on each request (sliding window)
-            request.session["login_time"] = current_time
+            # Slide the inactivity window; skipping sub-minute refreshes leaves the session unchanged,
+            # so SlidingSessionMiddleware doesn't re-sign and resend the cookie on every request
+            if current_time - login_time >= SESSION_REFRESH_SECONDS:
+                request.session["login_time"] = current_time
         except Exception:
             return None
     
+    request.state.session_user = user
     return user
 
 
@@ -3391,9 +3936,10 @@ def get_current_org_context(request: Request) -> tuple[int | None, bool, int | N
 
 def require_admin(request: Request) -> dict:
     user = require_login(request)
-    _user_id, is_superuser, _org_id, org_role = get_current_org_context(request)
-    if is_superuser and is_owner_portal_user(user):
+    # The owner flag is in the session already; skip the membership lookup for it.
+    if is_owner_portal_user(user):
         return user
+    _user_id, _is_superuser, _org_id, org_role = get_current_org_context(request)
     if table_exists("memberships"):
         if org_role in ("org_admin", "radiology_admin"):
             if int(user.get("mfa_required") or 0) and not int(user.get("mfa_enabled") or 0):
@@ -3407,7 +3953,8 @@ def require_admin(request: Request) -> dict:
 
 
 def require_superuser(request: Request) -> dict:
-    user = require_admin(request)
+    # The owner flag already lives in the session; skip require_admin's membership lookups.
+    user = require_login(request)
     if not is_owner_portal_user(user):
         raise HTTPException(status_code=403, detail="Owner account only")
     return user
@@ -3477,18 +4024,98 @@ def require_radiologist(request: Request) -> dict:
             conn.close()
         except Exception:
             pass
-    
-    return user
+    
+    return user
+
+
+def generate_token() -> str:
+    return secrets.token_urlsafe(32)
+
+
+def hash_token(token: str) -> str:
+    import hmac
+    digest = hmac.new(APP_SECRET.encode("utf-8"), token.encode("utf-8"), hashlib.sha256)
+    return digest.hexdigest()
+
+
+# Reset-link bursts and radiologist notifications send several messages in a row; reuse an
+# authenticated SMTP session instead of paying TCP + STARTTLS + AUTH for every one. Sessions
+# are recycled after SMTP_MAX_MESSAGES_PER_CONNECTION sends to stay under provider limits.
+SMTP_POOL_SIZE = 4
+SMTP_MAX_MESSAGES_PER_CONNECTION = 100
+SMTP_IDLE_SECONDS = 60
+_smtp_pool: "queue.LifoQueue[tuple[object, int, float]]" = queue.LifoQueue(maxsize=SMTP_POOL_SIZE)
+
+
+def _open_smtp_connection():
+    import smtplib
+    import ssl
+
+    server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=10)
+    try:
+        server.starttls(context=ssl.create_default_context())
+        if SMTP_USER and SMTP_PASSWORD:
+            server.login(SMTP_USER, SMTP_PASSWORD)
+    except Exception:
+        _close_smtp_connection(server)
+        raise
+    return server
+
+
+def _close_smtp_connection(server) -> None:
+    try:
+        server.quit()
+    except Exception:
+        try:
+            server.close()
+        except Exception:
+            pass
 
 
-def generate_token() -> str:
-    return secrets.token_urlsafe(32)
+def _acquire_smtp_connection() -> tuple[object, int]:
+    while True:
+        try:
+            server, sent, idle_since = _smtp_pool.get_nowait()
+        except queue.Empty:
+            return _open_smtp_connection(), 0
+        # Servers drop idle sessions; NOOP confirms a reused one is still usable.
+        if time.monotonic() - idle_since < SMTP_IDLE_SECONDS:
+            try:
+                if server.noop()[0] == 250:
+                    return server, sent
+            except Exception:
+                pass
+        _close_smtp_connection(server)
 
 
-def hash_token(token: str) -> str:
-    import hmac
-    digest = hmac.new(APP_SECRET.encode("utf-8"), token.encode("utf-8"), hashlib.sha256)
-    return digest.hexdigest()
+def smtp_send(msg) -> None:
+    """Send an email.message object over a pooled SMTP session."""
+    server, sent = _acquire_smtp_connection()
+    try:
+        server.send_message(msg)
+    except Exception:
+        _close_smtp_connection(server)
+        raise
+    sent += 1
+    if sent >= SMTP_MAX_MESSAGES_PER_CONNECTION:
+        _close_smtp_connection(server)
+        return
+    try:
+        _smtp_pool.put_nowait((server, sent, time.monotonic()))
+    except queue.Full:
+        _close_smtp_connection(server)
+
+
+def close_smtp_pool() -> None:
+    while True:
+        try:
+            server, _sent, _idle_since = _smtp_pool.get_nowait()
+        except queue.Empty:
+            return
+        _close_smtp_connection(server)
+
+
+atexit.register(close_smtp_pool)
 
 
 def send_email(to_address: str, subject: str, body: str) -> bool:
@@ -3496,8 +4123,6 @@ def send_email(to_address: str, subject: str, body: str) -> bool:
         print("[email] SMTP not configured. Message suppressed to avoid leaking email content into logs.")
         return False
 
-    import smtplib
-    import ssl
     from email.message import EmailMessage
 
     msg = EmailMessage()
@@ -3506,18 +4131,8 @@ def send_email(to_address: str, subject: str, body: str) -> bool:
     msg["Subject"] = subject
     msg.set_content(body)
 
-    server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=10)
-    try:
-        server.starttls(context=ssl.create_default_context())
-        if SMTP_USER and SMTP_PASSWORD:
-            server.login(SMTP_USER, SMTP_PASSWORD)
-        server.send_message(msg)
-        return True
-    finally:
-        try:
-            server.quit()
-        except Exception:
-            pass
+    smtp_send(msg)
+    return True
 
 
 def get_user_by_email(email: str) -> dict | None:
@@ -3538,25 +4153,61 @@ def get_user_by_email(email: str) -> dict | None:
     return dict(row) if row else None
 
 
+# require_admin and friends probe the schema on every request. Migrations only ever add
+# tables/columns, so a positive answer is remembered. Misses are re-checked while the startup
+# migrations run; once mark_schema_settled() says the schema is final they are remembered for
+# SCHEMA_MISS_CACHE_SECONDS, so a migration run from a script is still picked up.
+SCHEMA_MISS_CACHE_SECONDS = 60
+_known_tables: set[str] = set()
+_known_columns: set[tuple[str, str]] = set()
+_missing_tables: dict[str, float] = {}
+_missing_columns: dict[tuple[str, str], float] = {}
+_schema_settled = False
+
+
+def clear_schema_cache() -> None:
+    _known_tables.clear()
+    _known_columns.clear()
+    _missing_tables.clear()
+    _missing_columns.clear()
+
+
+def mark_schema_settled() -> None:
+    global _schema_settled
+    clear_schema_cache()
+    _schema_settled = True
+
+
 def table_exists(table_name: str) -> bool:
+    if table_name in _known_tables:
+        return True
+    if _missing_tables.get(table_name, 0.0) > time.monotonic():
+        return False
     conn = get_db()
     if using_postgres():
         row = conn.execute(
             "SELECT 1 FROM information_schema.tables WHERE table_schema = 'public' AND table_name = ?",
             (table_name,),
         ).fetchone()
-        conn.close()
-        return bool(row)
-
-    row = conn.execute(
-        "SELECT name FROM sqlite_master WHERE type='table' AND name = ?",
-        (table_name,),
-    ).fetchone()
+    else:
+        row = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name = ?",
+            (table_name,),
+        ).fetchone()
     conn.close()
+    if row:
+        _known_tables.add(table_name)
+    elif _schema_settled:
+        _missing_tables[table_name] = time.monotonic() + SCHEMA_MISS_CACHE_SECONDS
     return bool(row)
 
 
 def table_has_column(table_name: str, column_name: str) -> bool:
+    key = (table_name, column_name)
+    if key in _known_columns:
+        return True
+    if _missing_columns.get(key, 0.0) > time.monotonic():
+        return False
     conn = get_db()
     if using_postgres():
         row = conn.execute(
@@ -3564,16 +4215,38 @@ def table_has_column(table_name: str, column_name: str) -> bool:
             (table_name, column_name),
         ).fetchone()
         conn.close()
-        return bool(row)
+        found = bool(row)
+    else:
+        cur = conn.cursor()
+        cur.execute(f"PRAGMA table_info({table_name})")
+        cols = {row[1] for row in cur.fetchall()}
+        conn.close()
+        _known_columns.update((table_name, col) for col in cols)
+        found = column_name in cols
+    if found:
+        _known_columns.add(key)
+    elif _schema_settled:
+        _missing_columns[key] = time.monotonic() + SCHEMA_MISS_CACHE_SECONDS
+    return found
 
-    cur = conn.cursor()
-    cur.execute(f"PRAGMA table_info({table_name})")
-    cols = {row[1] for row in cur.fetchall()}
-    conn.close()
-    return column_name in cols
+
+# The primary membership is resolved on every authenticated request; keep it briefly
+# per user and drop it whenever a membership is edited or removed.
+MEMBERSHIP_CACHE_TTL_SECONDS = 30
+_membership_cache: dict[int, tuple[dict | None, float]] = {}
+
+
+def invalidate_membership_cache(user_id: int | None = None) -> None:
+    if user_id is None:
+        _membership_cache.clear()
+    else:
+        _membership_cache.pop(int(user_id), None)
 
 
 def get_user_primary_membership(user_id: int) -> dict | None:
+    cached = _membership_cache.get(user_id)
+    if cached and time.monotonic() - cached[1] < MEMBERSHIP_CACHE_TTL_SECONDS:
+        return dict(cached[0]) if cached[0] else None
     if not table_exists("memberships"):
         return None
     conn = get_db()
@@ -3582,7 +4255,49 @@ def get_user_primary_membership(user_id: int) -> dict | None:
         (user_id,),
     ).fetchone()
     conn.close()
-    return dict(row) if row else None
+    membership = dict(row) if row else None
+    _membership_cache[user_id] = (membership, time.monotonic())
+    return dict(membership) if membership else None
+
+
+# Organisation names are looked up by the admin pages and exports on every request but only
+# change through the owner screens; keep one id -> name map per process, rebuilt after a
+# local write or once the TTL lapses so edits made by other workers still show up.
+ORG_NAME_CACHE_TTL_SECONDS = 60
+_org_names_cache: tuple[dict[int, str], float] | None = None
+
+
+def invalidate_org_name_cache() -> None:
+    global _org_names_cache
+    _org_names_cache = None
+
+
+def get_org_names() -> dict[int, str]:
+    global _org_names_cache
+    cached = _org_names_cache
+    if cached and time.monotonic() - cached[1] < ORG_NAME_CACHE_TTL_SECONDS:
+        return cached[0]
+    if not table_exists("organisations"):
+        return {}
+    conn = get_db()
+    try:
+        names = {r["id"]: r["name"] for r in conn.execute("SELECT id, name FROM organisations")}
+    finally:
+        conn.close()
+    _org_names_cache = (names, time.monotonic())
+    return names
+
+
+def get_org_name(org_id: int | None) -> str | None:
+    if not org_id:
+        return None
+    org_id = int(org_id)
+    names = get_org_names()
+    if org_id not in names and _org_names_cache is not None:
+        # An organisation created by another worker; reload rather than wait out the TTL.
+        invalidate_org_name_cache()
+        names = get_org_names()
+    return names.get(org_id)
 
 
 def get_request_org_id(request: Request) -> int | None:
@@ -3594,8 +4309,28 @@ def redirect_to_login(role: str, next_path: str):
     return RedirectResponse(url=f"/login?role={role}&next={next_path}", status_code=303)
 
 
+_FORM_TRUE_VALUES = frozenset({"1", "true", "on", "yes"})
+# Legacy users.role <-> memberships.org_role.
+_ROLE_TO_ORG_ROLE = {"admin": "org_admin", "radiologist": "radiologist"}
+_ORG_ROLE_TO_ROLE = {"org_admin": "admin", "radiologist": "radiologist"}
+
+
+def form_flag(value) -> bool:
+    """Interpret a checkbox/toggle form value."""
+    if value is None:
+        return False
+    text = str(value)
+    # Browsers submit the literal checkbox value, so normalising is rarely needed.
+    if text in _FORM_TRUE_VALUES:
+        return True
+    return text.strip().lower() in _FORM_TRUE_VALUES
+
+
+_SLUG_INVALID_CHARS_RE = re.compile(r"[^a-z0-9]+")
+
+
 def slugify_org_name(name: str) -> str:
-    base = re.sub(r"[^a-z0-9]+", "-", str(name or "").strip().lower()).strip("-")
+    base = _SLUG_INVALID_CHARS_RE.sub("-", str(name or "").strip().lower()).strip("-")
     return base or "organisation"
 
 
@@ -3633,6 +4368,10 @@ def ensure_extended_identity_schema() -> None:
         )
         """
     )
+    # UNIQUE(org_id, user_id) already serves org-first lookups; this covers per-user ones.
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_memberships_user ON memberships(user_id, is_active)")
+    # Covers the per-org role counts on the owner pages without touching table rows.
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_memberships_org_role ON memberships(org_id, is_active, org_role)")
     cur.execute(
         """
         CREATE TABLE IF NOT EXISTS user_sessions (
@@ -3718,6 +4457,8 @@ def ensure_extended_identity_schema() -> None:
             )
         cur.execute("ALTER TABLE users RENAME TO users_legacy_backup")
         cur.execute("ALTER TABLE users_extended_new RENAME TO users")
+        # The legacy users columns are gone now.
+        clear_schema_cache()
 
     cur.execute("PRAGMA table_info(institutions)")
     institution_cols = {row[1] for row in cur.fetchall()}
@@ -3734,6 +4475,9 @@ def ensure_extended_identity_schema() -> None:
     if "org_id" not in protocol_cols:
         cur.execute("ALTER TABLE protocols ADD COLUMN org_id INTEGER")
 
+    # Superusers are a handful of rows; a partial index finds them without scanning users.
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_users_superuser ON users(username) WHERE is_superuser = 1")
+
     conn.commit()
 
     org_row = cur.execute("SELECT id FROM organisations ORDER BY id LIMIT 1").fetchone()
@@ -3784,7 +4528,7 @@ def ensure_extended_identity_schema() -> None:
         user_id = user_row[0]
         username = user_row[1]
         role = str(user_row[2] or "user").strip().lower()
-        org_role = "org_admin" if role == "admin" else "radiologist" if role == "radiologist" else "org_user"
+        org_role = _ROLE_TO_ORG_ROLE.get(role, "org_user")
         if not cur.execute("SELECT 1 FROM memberships WHERE org_id = ? AND user_id = ?", (default_org_id, user_id)).fetchone():
             cur.execute(
                 "INSERT INTO memberships(org_id, user_id, org_role, is_active, created_at, modified_at) VALUES (?, ?, ?, 1, ?, ?)",
@@ -4056,27 +4800,109 @@ def save_case_attachments(
 # -------------------------
 # Init DB on startup
 # -------------------------
+# Schema DDL and seeding run at import in every worker process (scripts rely on that too).
+# The lock makes workers take turns, so later ones only meet IF NOT EXISTS / already-seeded
+# no-ops instead of racing the first worker's DDL on the same database.
+SCHEMA_INIT_LOCK_KEY = 727_001
+
+
+@contextlib.contextmanager
+def schema_init_lock():
+    if using_postgres():
+        engine = _get_sa_engine(DATABASE_URL)
+        with engine.connect() as lock_conn:
+            lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": SCHEMA_INIT_LOCK_KEY})
+            try:
+                yield
+            finally:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SCHEMA_INIT_LOCK_KEY})
+                lock_conn.commit()
+        return
+    try:
+        import fcntl
+    except ImportError:  # Windows dev machines: single process, nothing to coordinate
+        yield
+        return
+    with open(f"{DB_PATH}.initlock", "a+") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# Schema steps skipped (with init_db) once a database is stamped with the current SCHEMA_VERSION.
+# The version is derived from their source, so editing any of them (a new column, index or table)
+# re-runs the upgrades on existing databases without anyone having to remember a manual bump.
+SCHEMA_UPGRADES = (
+    ensure_cases_schema,
+    ensure_institutions_schema,
+    ensure_radiologists_schema,
+    ensure_users_schema,
+    ensure_protocols_schema,
+    ensure_study_description_presets_schema,
+    ensure_exam_catalogue_assignment_schema,
+    ensure_notify_events_schema,
+    ensure_case_events_schema,
+    ensure_case_attachments_schema,
+    ensure_report_sent_schema,
+)
+
+
+def compute_schema_version(upgrades=(init_db, *SCHEMA_UPGRADES)) -> str:
+    digest = hashlib.sha256()
+    for upgrade in upgrades:
+        try:
+            digest.update(inspect.getsource(upgrade).encode("utf-8"))
+        except (OSError, TypeError):
+            # Source unavailable (e.g. bytecode-only deploy): never treat the schema as current.
+            return ""
+    return digest.hexdigest()[:16]
+
+
+SCHEMA_VERSION = compute_schema_version()
+
+
+def schema_is_current() -> bool:
+    if not SCHEMA_VERSION:
+        return False
+    return table_exists("config") and get_setting("schema_version", "") == SCHEMA_VERSION
+
+
+def apply_data_backfills() -> None:
+    """Idempotent data fixes; cheap enough to run on every start, so they sit outside the version gate."""
+    conn = get_db()
+    if table_exists("study_description_presets") and table_has_column("study_description_presets", "is_active"):
+        conn.execute("UPDATE study_description_presets SET is_active = 1 WHERE is_active IS NULL")
+    conn.commit()
+    conn.close()
+
+
 try:
-    print("[startup] Initializing database...")
-    init_db()
-    ensure_extended_identity_schema()
-    ensure_cases_schema()
-    ensure_institutions_schema()
-    ensure_radiologists_schema()
-    ensure_users_schema()
-    ensure_protocols_schema()
-    ensure_study_description_presets_schema()
-    ensure_exam_catalogue_assignment_schema()
-    ensure_notify_events_schema()
-    ensure_case_events_schema()
-    ensure_case_attachments_schema()
-    ensure_report_sent_schema()
-    ensure_seed_data()
-    ensure_local_owner_account()
-    ensure_default_protocols()
-    ensure_default_study_description_presets()
-    cleanup_old_files()
-    print("[startup] Database initialization complete")
+    with schema_init_lock():
+        print("[startup] Initializing database...")
+        schema_current = schema_is_current()
+        if not schema_current:
+            init_db()
+        # Always runs: besides DDL it backfills org ids and memberships for rows added
+        # outside the app (e.g. by the setup scripts).
+        ensure_extended_identity_schema()
+        if schema_current:
+            print(f"[startup] Schema is at version {SCHEMA_VERSION}; skipping upgrades")
+        else:
+            for upgrade in SCHEMA_UPGRADES:
+                upgrade()
+            if SCHEMA_VERSION:
+                set_setting("schema_version", SCHEMA_VERSION)
+        apply_data_backfills()
+        ensure_seed_data()
+        ensure_local_owner_account()
+        ensure_default_protocols()
+        ensure_default_study_description_presets()
+        cleanup_old_files()
+        print("[startup] Database initialization complete")
+    # Nothing adds tables or columns after this point, so schema misses can be cached too.
+    mark_schema_settled()
 except Exception as e:
     print(f"[ERROR] Database initialization failed: {e}")
     import traceback
@@ -4297,11 +5123,14 @@ def reset_password_page(request: Request, token: str = ""):
 
     token_hash = hash_token(token)
     conn = get_db()
-    row = conn.execute(
-        "SELECT * FROM password_reset_tokens WHERE token_hash = ?",
-        (token_hash,),
-    ).fetchone()
-    conn.close()
+    try:
+        row = conn.execute(
+            "SELECT * FROM password_reset_tokens WHERE token_hash = ?",
+            (token_hash,),
+        ).fetchone()
+    finally:
+        conn.close()
+    row = dict(row) if row else None
 
     if not row:
         return templates.TemplateResponse(
@@ -4362,22 +5191,31 @@ def reset_password_submit(
 
     token_hash = hash_token(token)
     conn = get_db()
-    row = conn.execute(
-        "SELECT * FROM password_reset_tokens WHERE token_hash = ?",
-        (token_hash,),
-    ).fetchone()
-
-    if not row or row.get("used_at"):
+    try:
+        row = conn.execute(
+            "SELECT * FROM password_reset_tokens WHERE token_hash = ?",
+            (token_hash,),
+        ).fetchone()
+    finally:
         conn.close()
+    row = dict(row) if row else None
+
+    if not row:
         return templates.TemplateResponse(
             "reset_password.html",
             {"request": request, "token": "", "error": "Invalid or expired reset link."},
             status_code=400,
         )
 
+    if row.get("used_at"):
+        return templates.TemplateResponse(
+            "reset_password.html",
+            {"request": request, "token": "", "error": "Reset link already used."},
+            status_code=400,
+        )
+
     expires_at = parse_iso_dt(row.get("expires_at"))
     if not expires_at or expires_at < datetime.now(timezone.utc):
-        conn.close()
         return templates.TemplateResponse(
             "reset_password.html",
             {"request": request, "token": "", "error": "Reset link expired."},
@@ -4386,36 +5224,45 @@ def reset_password_submit(
 
     user_id = row.get("user_id")
     if not user_id:
-        conn.close()
         return templates.TemplateResponse(
             "reset_password.html",
             {"request": request, "token": "", "error": "Invalid or expired reset link."},
             status_code=400,
         )
 
-    salt = secrets.token_bytes(16)
+    if not table_has_column("users", "password_hash"):
+        return templates.TemplateResponse(
+            "reset_password.html",
+            {"request": request, "token": "", "error": "Password reset not supported for this user schema."},
+            status_code=400,
+        )
+
+    # Hash without a pooled connection checked out; PBKDF2 is the slow part of this request.
+    salt = new_password_salt()
     pw_hash = hash_password(password, salt)
     now = utc_now_iso()
 
-    if table_has_column("users", "password_hash"):
+    conn = get_db()
+    try:
+        # Claim the token first so two concurrent submits cannot both use it.
+        claimed = conn.execute(
+            "UPDATE password_reset_tokens SET used_at = ? WHERE id = ? AND used_at IS NULL",
+            (now, row.get("id")),
+        ).rowcount
+        if not claimed:
+            conn.rollback()
+            return templates.TemplateResponse(
+                "reset_password.html",
+                {"request": request, "token": "", "error": "Reset link already used."},
+                status_code=400,
+            )
         conn.execute(
             "UPDATE users SET password_hash = ?, salt_hex = ?, modified_at = ? WHERE id = ?",
             (pw_hash.hex(), salt.hex(), now, user_id),
         )
-    else:
+        conn.commit()
+    finally:
         conn.close()
-        return templates.TemplateResponse(
-            "reset_password.html",
-            {"request": request, "token": "", "error": "Password reset not supported for this user schema."},
-            status_code=400,
-        )
-
-    conn.execute(
-        "UPDATE password_reset_tokens SET used_at = ? WHERE id = ?",
-        (now, row.get("id")),
-    )
-    conn.commit()
-    conn.close()
 
     return RedirectResponse(url="/?reset=success", status_code=303)
 
@@ -4695,8 +5542,8 @@ def owner_create_organisation(
     admin_email = admin_email.strip()
     admin_username = admin_username.strip()
     admin_password = admin_password.strip()
-    admin_mfa_required_value = 1 if str(admin_mfa_required).strip().lower() in {"1", "true", "on", "yes"} else 0
-    assign_full_catalogue_value = 1 if str(assign_full_catalogue).strip().lower() in {"1", "true", "on", "yes"} else 0
+    admin_mfa_required_value = 1 if form_flag(admin_mfa_required) else 0
+    assign_full_catalogue_value = 1 if form_flag(assign_full_catalogue) else 0
 
     form_data = {
         "org_name": org_name,
@@ -4725,7 +5572,7 @@ def owner_create_organisation(
 
     slug = slugify_org_name(requested_slug or org_name)
     now = utc_now_iso()
-    salt = secrets.token_bytes(16)
+    salt = new_password_salt()
     pw_hash = hash_password(admin_password, salt)
 
     conn = get_db()
@@ -4776,15 +5623,15 @@ def owner_create_organisation(
                     status_code=400,
                 )
 
-        conn.execute(
+        org_id = insert_returning_id(
+            conn,
             "INSERT INTO organisations(name, slug, is_active, created_at, modified_at) VALUES (?, ?, 1, ?, ?)",
             (org_name, slug, now, now),
         )
-        org_row = conn.execute("SELECT id FROM organisations WHERE slug = ?", (slug,)).fetchone()
-        org_id = org_row["id"] if isinstance(org_row, dict) else org_row[0]
 
         if table_has_column("users", "role"):
-            conn.execute(
+            user_id = insert_returning_id(
+                conn,
                 """
                 INSERT INTO users(username, email, password_hash, salt_hex, is_superuser, is_active, created_at, modified_at, first_name, surname, role, radiologist_name)
                 VALUES (?, ?, ?, ?, 0, 1, ?, ?, ?, ?, ?, NULL)
@@ -4802,7 +5649,8 @@ def owner_create_organisation(
                 ),
             )
         else:
-            conn.execute(
+            user_id = insert_returning_id(
+                conn,
                 """
                 INSERT INTO users(username, email, password_hash, salt_hex, is_superuser, is_active, created_at, modified_at, first_name, surname)
                 VALUES (?, ?, ?, ?, 0, 1, ?, ?, ?, ?)
@@ -4819,11 +5667,9 @@ def owner_create_organisation(
                 ),
             )
         conn.execute(
-            "UPDATE users SET mfa_required = ? WHERE username = ?",
-            (admin_mfa_required_value, admin_username),
+            "UPDATE users SET mfa_required = ? WHERE id = ?",
+            (admin_mfa_required_value, user_id),
         )
-        user_row = conn.execute("SELECT id FROM users WHERE username = ?", (admin_username,)).fetchone()
-        user_id = user_row["id"] if isinstance(user_row, dict) else user_row[0]
 
         conn.execute(
             """
@@ -4834,6 +5680,7 @@ def owner_create_organisation(
         )
 
         conn.commit()
+        invalidate_org_name_cache()
     except Exception as exc:
         conn.rollback()
         return templates.TemplateResponse(
@@ -4864,9 +5711,9 @@ def owner_edit_organisation_page(request: Request, org_id: int, saved: str = "",
     if not organisation:
         raise HTTPException(status_code=404, detail="Organisation not found")
     return templates.TemplateResponse(
+        request,
         "owner_organisation_edit.html",
         {
-            "request": request,
             "user": user,
             "organisation": organisation,
             "org_users": list_organisation_users(org_id),
@@ -4965,6 +5812,7 @@ def owner_edit_organisation_submit(
             (clean_name, clean_slug, active_value, utc_now_iso(), org_id),
         )
         conn.commit()
+        invalidate_org_name_cache()
     finally:
         conn.close()
 
@@ -4998,7 +5846,7 @@ def owner_add_organisation_user(
     email = email.strip()
     gmc = gmc.strip()
     speciality = speciality.strip()
-    mfa_required_value = 1 if str(mfa_required).strip().lower() in {"1", "true", "on", "yes"} else 0
+    mfa_required_value = 1 if form_flag(mfa_required) else 0
 
     if not username or not password or role not in {"admin", "radiologist", "user"}:
         return templates.TemplateResponse(
@@ -5034,16 +5882,17 @@ def owner_add_organisation_user(
             status_code=400,
         )
 
-    salt = secrets.token_bytes(16)
+    salt = new_password_salt()
     pw_hash = hash_password(password, salt)
     now = utc_now_iso()
     email_val = email or None
-    org_role = "org_admin" if role == "admin" else "radiologist" if role == "radiologist" else "org_user"
+    org_role = _ROLE_TO_ORG_ROLE.get(role, "org_user")
     has_role_column = table_has_column("users", "role")
     has_radiologist_name_column = table_has_column("users", "radiologist_name")
 
     conn = get_db()
     try:
+        begin_write_transaction(conn)
         if conn.execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone():
             raise HTTPException(status_code=400, detail="That username is already in use.")
         if email_val and conn.execute("SELECT 1 FROM users WHERE email = ?", (email_val,)).fetchone():
@@ -5081,16 +5930,15 @@ def owner_add_organisation_user(
             user_values.append("?")
             user_params.append(None if role != "radiologist" else (f"{first_name} {surname}".strip() or username))
 
-        conn.execute(
+        user_id = insert_returning_id(
+            conn,
             f"INSERT INTO users({', '.join(user_columns)}) VALUES ({', '.join(user_values)})",
             tuple(user_params),
         )
         conn.execute(
-            "UPDATE users SET mfa_required = ? WHERE username = ?",
-            (mfa_required_value, username),
+            "UPDATE users SET mfa_required = ? WHERE id = ?",
+            (mfa_required_value, user_id),
         )
-        user_row = conn.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
-        user_id = user_row["id"] if isinstance(user_row, dict) else user_row[0]
         conn.execute(
             """
             INSERT INTO memberships(org_id, user_id, org_role, is_active, created_at, modified_at)
@@ -5186,6 +6034,7 @@ def owner_edit_organisation_user(
         raise HTTPException(status_code=400, detail="Invalid role")
 
     conn = get_db()
+    begin_write_transaction(conn)
     row = conn.execute(
         """
         SELECT u.id, u.username, u.email
@@ -5209,8 +6058,8 @@ def owner_edit_organisation_user(
 
     now = utc_now_iso()
     active_value = 1 if str(is_active).strip() == "1" else 0
-    mfa_required_value = 1 if str(mfa_required).strip().lower() in {"1", "true", "on", "yes"} else 0
-    org_role = "org_admin" if role == "admin" else "radiologist" if role == "radiologist" else "org_user"
+    mfa_required_value = 1 if form_flag(mfa_required) else 0
+    org_role = _ROLE_TO_ORG_ROLE.get(role, "org_user")
     display_name = f"{first_name.strip()} {surname.strip()}".strip() or (row["username"] if isinstance(row, dict) else row[1])
 
     has_role_column = table_has_column("users", "role")
@@ -5283,6 +6132,7 @@ def owner_edit_organisation_user(
 
     conn.commit()
     conn.close()
+    invalidate_membership_cache(user_id)
     return RedirectResponse(url=f"/owner/organisations/{org_id}?notice=user_updated", status_code=303)
 
 
@@ -5298,6 +6148,10 @@ def owner_reset_organisation_user_password(
     if not password:
         raise HTTPException(status_code=400, detail="Password is required")
 
+    # Derive the hash before taking a connection so the KDF never runs while one is held.
+    salt = new_password_salt()
+    pw_hash = hash_password(password, salt)
+
     conn = get_db()
     membership = conn.execute(
         "SELECT 1 FROM memberships WHERE org_id = ? AND user_id = ? AND is_active = 1",
@@ -5307,8 +6161,6 @@ def owner_reset_organisation_user_password(
         conn.close()
         raise HTTPException(status_code=404, detail="User not found in that organisation")
 
-    salt = secrets.token_bytes(16)
-    pw_hash = hash_password(password, salt)
     conn.execute(
         "UPDATE users SET password_hash = ?, salt_hex = ?, modified_at = ? WHERE id = ?",
         (pw_hash.hex(), salt.hex(), utc_now_iso(), user_id),
@@ -5352,6 +6204,7 @@ def owner_delete_organisation_user(request: Request, org_id: int, user_id: int):
         conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
     conn.commit()
     conn.close()
+    invalidate_membership_cache(user_id)
     return RedirectResponse(url=f"/owner/organisations/{org_id}?notice=user_deleted", status_code=303)
 
 
@@ -5425,6 +6278,8 @@ def owner_delete_organisation(request: Request, org_id: int):
     conn.execute("DELETE FROM organisations WHERE id = ?", (org_id,))
     conn.commit()
     conn.close()
+    invalidate_membership_cache()
+    invalidate_org_name_cache()
     return RedirectResponse(url="/owner?created=deleted", status_code=303)
 
 
@@ -5497,14 +6352,7 @@ def build_admin_case_filters(
 
 
 def get_admin_org_name(org_id):
-    org_name = "Organisation Name"
-    if org_id:
-        conn = get_db()
-        org_row = conn.execute("SELECT name FROM organisations WHERE id = ?", (org_id,)).fetchone()
-        if org_row:
-            org_name = org_row["name"]
-        conn.close()
-    return org_name
+    return get_org_name(org_id) or "Organisation Name"
 
 
 def build_dashboard_filter_summary(
@@ -5569,6 +6417,7 @@ def build_dashboard_series(rows: list[dict]):
     completed_tat_values: list[int] = []
     unassigned_cases = 0
     sla_breaches = 0
+    now = datetime.now(timezone.utc)
 
     for row in rows:
         status_key = str(row.get("status") or "").strip().lower()
@@ -5591,7 +6440,7 @@ def build_dashboard_series(rows: list[dict]):
         if not str(row.get("radiologist") or "").strip():
             unassigned_cases += 1
 
-        tat_value = tat_seconds(row.get("created_at"), row.get("vetted_at"))
+        tat_value = tat_seconds(created_dt, row.get("vetted_at"), now)
         avg_tat_values.append(tat_value)
         if status_key == "vetted":
             completed_tat_values.append(tat_value)
@@ -5780,7 +6629,7 @@ def admin_dashboard(
     )
 
     sql = (
-        "SELECT c.*, i.name as institution_name "
+        "SELECT c.*, i.name as institution_name, i.sla_hours as institution_sla_hours "
         "FROM cases c LEFT JOIN institutions i ON c.institution_id = i.id "
         f"WHERE {' AND '.join(row_clauses)}"
     )
@@ -5791,7 +6640,40 @@ def admin_dashboard(
         sql += f" ORDER BY {sort_col} {sort_dir.upper()}"
 
     conn = get_db()
-    rows = conn.execute(sql, row_params).fetchall()
+    # Rows are shaped for the template straight off the cursor; no intermediate Row list.
+    cases: list[dict] = []
+    now = datetime.now(timezone.utc)
+    for r in conn.execute(sql, row_params):
+        d = dict(r)
+        # Parse created_at once per row and share it between the display column and the TAT.
+        created_dt = parse_iso_dt(d.get("created_at"))
+        if created_dt:
+            d["created_display"] = created_dt.strftime(_DISPLAY_DATETIME_FORMAT)
+        else:
+            d["created_display"] = format_display_datetime(d.get("created_at"), "")
+        d["request_date_display"] = format_display_date(d.get("request_date"), "")
+        secs = tat_seconds(created_dt, d.get("vetted_at"), now)
+        d["tat_display"] = format_tat(secs)
+        d["tat_seconds"] = secs
+        # SLA comes from the institutions join above rather than a lookup per row.
+        sla_hours = d.get("institution_sla_hours")
+        if sla_hours is None:
+            sla_hours = 48
+        sla_seconds = sla_hours * 3600
+        tat_ratio = (secs / sla_seconds) if sla_seconds else 0
+        if tat_ratio >= 1:
+            d["tat_tone"] = "danger"
+        elif tat_ratio >= 0.5:
+            d["tat_tone"] = "warning"
+        else:
+            d["tat_tone"] = "good"
+        d["sla_breached"] = (d.get("status") == "pending") and (secs > sla_seconds)
+        d["display_case_id"] = d.get("id") or "-"
+        d["status_display"] = display_case_status(d.get("status"))
+        d["report_sent"], d["report_sent_display"] = get_report_sent_summary(d)
+        d["justification_not_required"] = bool(str(d.get("justification_not_required_at") or "").strip())
+        d["catalogue_review_required"], d["catalogue_review_display"] = get_exam_catalogue_review_summary(d)
+        cases.append(d)
 
     counts_sql = (
         "SELECT LOWER(c.status) AS status, COUNT(*) AS c "
@@ -5832,7 +6714,7 @@ def admin_dashboard(
         f"WHERE {' AND '.join(dashboard_clauses)} "
         "ORDER BY c.created_at DESC"
     )
-    dashboard_rows = [dict(r) for r in conn.execute(dashboard_sql, dashboard_params).fetchall()]
+    dashboard_rows = [dict(r) for r in conn.execute(dashboard_sql, dashboard_params)]
     conn.close()
 
     counts = {r["status"]: r["c"] for r in counts_rows}
@@ -5843,32 +6725,6 @@ def admin_dashboard(
     not_required_count = counts.get("not_required", 0)
     total_count = pending_count + vetted_count + rejected_count + reopened_count + not_required_count
 
-    cases: list[dict] = []
-    for r in rows:
-        d = dict(r)
-        d["created_display"] = format_display_datetime(d.get("created_at"), "")
-        d["request_date_display"] = format_display_date(d.get("request_date"), "")
-        secs = tat_seconds(d.get("created_at"), d.get("vetted_at"))
-        d["tat_display"] = format_tat(secs)
-        d["tat_seconds"] = secs
-        inst = get_institution(d.get("institution_id")) if d.get("institution_id") else None
-        sla_hours = inst["sla_hours"] if inst else 48
-        sla_seconds = sla_hours * 3600
-        tat_ratio = (secs / sla_seconds) if sla_seconds else 0
-        if tat_ratio >= 1:
-            d["tat_tone"] = "danger"
-        elif tat_ratio >= 0.5:
-            d["tat_tone"] = "warning"
-        else:
-            d["tat_tone"] = "good"
-        d["sla_breached"] = (d.get("status") == "pending") and (secs > sla_seconds)
-        d["display_case_id"] = d.get("id") or "-"
-        d["status_display"] = display_case_status(d.get("status"))
-        d["report_sent"], d["report_sent_display"] = get_report_sent_summary(d)
-        d["justification_not_required"] = bool(str(d.get("justification_not_required_at") or "").strip())
-        d["catalogue_review_required"], d["catalogue_review_display"] = get_exam_catalogue_review_summary(d)
-        cases.append(d)
-
     dashboard = build_dashboard_series(dashboard_rows)
     dashboard_filter_summary = build_dashboard_filter_summary(
         dashboard_range,
@@ -5983,30 +6839,27 @@ def admin_dashboard_csv(
         "ORDER BY c.created_at DESC"
     )
 
+    # Organisation names come from the per-process cache; the cases and their events share one connection.
+    org_names = get_org_names()
     conn = get_db()
-    rows = conn.execute(sql, params).fetchall()
-    conn.close()
-
-    case_ids = [r["id"] for r in rows]
-    events_map: dict[str, list[dict]] = {}
-    if case_ids and table_exists("case_events"):
-        placeholders = ",".join(["?"] * len(case_ids))
-        conn = get_db()
-        ev_rows = conn.execute(
-            f"SELECT * FROM case_events WHERE case_id IN ({placeholders}) ORDER BY created_at",
-            case_ids,
-        ).fetchall()
-        conn.close()
-        for e in ev_rows:
-            d = dict(e)
-            events_map.setdefault(d["case_id"], []).append(d)
-
-    org_names: dict[int, str] = {}
-    if table_exists("organisations"):
-        conn = get_db()
-        org_rows = conn.execute("SELECT id, name FROM organisations").fetchall()
+    try:
+        rows = conn.execute(sql, params).fetchall()
+
+        # Events are selected through the same filter as a subquery instead of binding every
+        # case id, which keeps the statement fixed-size and under SQLite's variable limit.
+        events_map: dict[str, list[dict]] = {}
+        if rows and table_exists("case_events"):
+            for e in conn.execute(
+                "SELECT e.* FROM case_events e WHERE e.case_id IN ("
+                "SELECT c.id FROM cases c LEFT JOIN institutions i ON c.institution_id = i.id "
+                f"WHERE {' AND '.join(clauses)}"
+                ") ORDER BY e.created_at",
+                params,
+            ):
+                d = dict(e)
+                events_map.setdefault(d["case_id"], []).append(d)
+    finally:
         conn.close()
-        org_names = {r["id"]: r["name"] for r in org_rows}
 
     def iter_csv():
         buf = io.StringIO()
@@ -6162,6 +7015,11 @@ def admin_dashboard_report_pdf(
     )
 
     buffer = io.BytesIO()
+    # reportlab (and the PIL stack under it) is only loaded by workers that actually draw a PDF.
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
     c = canvas.Canvas(buffer, pagesize=A4)
     width, height = A4
 
@@ -6290,17 +7148,27 @@ def admin_events_csv(request: Request):
     if not table_exists("case_events"):
         raise HTTPException(status_code=404, detail="case_events table not found")
 
-    conn = get_db()
+    # Columns are listed in CSV order so each row can be unpacked positionally.
+    events_sql = (
+        "SELECT case_id, org_id, event_type, created_at, user_id, username, org_role, decision, protocol, comment "
+        "FROM case_events"
+    )
     if org_id and not user.get("is_superuser"):
-        rows = conn.execute(
-            "SELECT * FROM case_events WHERE org_id = ? ORDER BY created_at",
-            (org_id,),
-        ).fetchall()
+        events_sql += " WHERE org_id = ?"
+        events_params: tuple = (org_id,)
     else:
-        rows = conn.execute("SELECT * FROM case_events ORDER BY created_at").fetchall()
-    conn.close()
+        events_params = ()
+    events_sql += " ORDER BY created_at"
 
     def iter_csv():
+        # Rows are written as the cursor yields them instead of materialising the whole event log first.
+        conn = get_db()
+        try:
+            yield from write_rows(conn.execute(events_sql, events_params))
+        finally:
+            conn.close()
+
+    def write_rows(rows):
         buf = io.StringIO()
         w = csv.writer(buf)
         w.writerow([
@@ -6320,19 +7188,8 @@ def admin_events_csv(request: Request):
         buf.truncate(0)
 
         for r in rows:
-            d = dict(r)
-            w.writerow([
-                d.get("case_id", ""),
-                d.get("org_id", ""),
-                d.get("event_type", ""),
-                format_csv_timestamp(d.get("created_at", "")),
-                d.get("user_id", ""),
-                d.get("username", ""),
-                d.get("org_role", ""),
-                d.get("decision", ""),
-                d.get("protocol", ""),
-                d.get("comment", ""),
-            ])
+            case_id, event_org_id, event_type, created_at, *rest = r.values() if isinstance(r, dict) else r
+            w.writerow([case_id, event_org_id, event_type, format_csv_timestamp(created_at), *rest])
             yield buf.getvalue()
             buf.seek(0)
             buf.truncate(0)
@@ -6504,7 +7361,6 @@ def notify_radiologist_send(
             return RedirectResponse(
                 url=f"/admin/notify-radiologist?name={radiologist_name}&error=smtp_not_configured", status_code=303
             )
-        import smtplib
         from email.mime.text import MIMEText
         from email.mime.multipart import MIMEMultipart
 
@@ -6516,7 +7372,7 @@ def notify_radiologist_send(
         html_body = f"""
         <div style="font-family:Arial,sans-serif;max-width:500px;padding:24px;background:#f9f9f9;border-radius:8px;">
           <h2 style="color:#1a1a2e;margin-top:0;">Cases Awaiting Your Review</h2>
-          <p style="color:#333;white-space:pre-wrap;">{message}</p>
+          <p style="color:#333;white-space:pre-wrap;">{html.escape(message)}</p>
           <p style="margin:20px 0 0;">
             <a href="{APP_BASE_URL}" style="display:inline-block;padding:10px 16px;background:#1f6feb;color:#ffffff;text-decoration:none;border-radius:8px;">Open RadFlow</a>
           </p>
@@ -6527,12 +7383,7 @@ def notify_radiologist_send(
         msg.attach(MIMEText(html_body, "html"))
 
         try:
-            with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=10) as smtp:
-                smtp.ehlo()
-                smtp.starttls()
-                if SMTP_USER:
-                    smtp.login(SMTP_USER, SMTP_PASS)
-                smtp.sendmail(msg["From"], [recipient.strip()], msg.as_string())
+            smtp_send(msg)
         except Exception as exc:
             print(f"[NOTIFY] Email send failed: {exc}")
             return RedirectResponse(
@@ -6864,6 +7715,9 @@ def admin_case_timeline_pdf(request: Request, case_id: str):
     conn.close()
 
     buffer = io.BytesIO()
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
     c = canvas.Canvas(buffer, pagesize=A4)
     width, height = A4
     y = height - 50
@@ -7369,15 +8223,11 @@ def admin_reopen_case_submit(
     return RedirectResponse(url=f"/admin/case/{case_id}/edit?saved=1", status_code=303)
 
 
-def slugify_org_name(name: str) -> str:
-    base = re.sub(r"[^a-z0-9]+", "-", str(name or "").strip().lower()).strip("-")
-    return base or "organisation"
-
-
 def list_organisations_summary() -> list[dict]:
     if not table_exists("organisations"):
         return []
     conn = get_db()
+    # Each count is an index-only probe on idx_memberships_org_role.
     rows = conn.execute(
         """
         SELECT
@@ -7389,33 +8239,23 @@ def list_organisations_summary() -> list[dict]:
             (
                 SELECT COUNT(*)
                 FROM memberships m
-                WHERE m.org_id = o.id AND m.org_role = 'org_admin' AND m.is_active = 1
+                WHERE m.org_id = o.id AND m.is_active = 1 AND m.org_role = 'org_admin'
             ) AS admin_count,
             (
                 SELECT COUNT(*)
                 FROM memberships m
-                WHERE m.org_id = o.id AND m.org_role = 'radiologist' AND m.is_active = 1
-            ) AS practitioner_count,
-            (
-                SELECT COUNT(*)
-                FROM memberships m
-                WHERE m.org_id = o.id AND m.org_role = 'radiologist' AND m.is_active = 1
+                WHERE m.org_id = o.id AND m.is_active = 1 AND m.org_role = 'radiologist'
             ) AS radiologist_count,
             (
                 SELECT COUNT(*)
                 FROM memberships m
-                WHERE m.org_id = o.id AND m.org_role = 'org_user' AND m.is_active = 1
+                WHERE m.org_id = o.id AND m.is_active = 1 AND m.org_role = 'org_user'
             ) AS coordinator_count,
             (
                 SELECT COUNT(*)
                 FROM memberships m
                 WHERE m.org_id = o.id AND m.is_active = 1
             ) AS member_count,
-            (
-                SELECT COUNT(*)
-                FROM memberships m
-                WHERE m.org_id = o.id AND m.is_active = 1
-            ) AS user_count,
             (
                 SELECT COUNT(*)
                 FROM institutions i
@@ -7426,13 +8266,21 @@ def list_organisations_summary() -> list[dict]:
         """
     ).fetchall()
     conn.close()
-    return [dict(row) for row in rows]
+    organisations = []
+    for row in rows:
+        org = dict(row)
+        # Aliases kept for the templates; copied here rather than counted twice in SQL.
+        org["practitioner_count"] = org["radiologist_count"]
+        org["user_count"] = org["member_count"]
+        organisations.append(org)
+    return organisations
 
 
 def get_organisation_summary(org_id: int) -> dict | None:
     if not table_exists("organisations"):
         return None
     conn = get_db()
+    # One pass over the organisation's memberships instead of a COUNT subquery per role.
     row = conn.execute(
         """
         SELECT
@@ -7441,46 +8289,33 @@ def get_organisation_summary(org_id: int) -> dict | None:
             o.slug,
             o.is_active,
             o.created_at,
-            (
-                SELECT COUNT(*)
-                FROM memberships m
-                WHERE m.org_id = o.id AND m.org_role = 'org_admin' AND m.is_active = 1
-            ) AS admin_count,
-            (
-                SELECT COUNT(*)
-                FROM memberships m
-                WHERE m.org_id = o.id AND m.org_role = 'radiologist' AND m.is_active = 1
-            ) AS practitioner_count,
-            (
-                SELECT COUNT(*)
-                FROM memberships m
-                WHERE m.org_id = o.id AND m.org_role = 'radiologist' AND m.is_active = 1
-            ) AS radiologist_count,
-            (
-                SELECT COUNT(*)
-                FROM memberships m
-                WHERE m.org_id = o.id AND m.org_role = 'org_user' AND m.is_active = 1
-            ) AS coordinator_count,
-            (
-                SELECT COUNT(*)
-                FROM memberships m
-                WHERE m.org_id = o.id AND m.is_active = 1
-            ) AS member_count,
-            (
-                SELECT COUNT(*)
-                FROM memberships m
-                WHERE m.org_id = o.id AND m.is_active = 1
-            ) AS user_count,
+            COALESCE(ms.admin_count, 0) AS admin_count,
+            COALESCE(ms.radiologist_count, 0) AS practitioner_count,
+            COALESCE(ms.radiologist_count, 0) AS radiologist_count,
+            COALESCE(ms.coordinator_count, 0) AS coordinator_count,
+            COALESCE(ms.member_count, 0) AS member_count,
+            COALESCE(ms.member_count, 0) AS user_count,
             (
                 SELECT COUNT(*)
                 FROM institutions i
                 WHERE i.org_id = o.id
             ) AS institution_count
         FROM organisations o
+        LEFT JOIN (
+            SELECT
+                m.org_id,
+                SUM(CASE WHEN m.org_role = 'org_admin' THEN 1 ELSE 0 END) AS admin_count,
+                SUM(CASE WHEN m.org_role = 'radiologist' THEN 1 ELSE 0 END) AS radiologist_count,
+                SUM(CASE WHEN m.org_role = 'org_user' THEN 1 ELSE 0 END) AS coordinator_count,
+                COUNT(*) AS member_count
+            FROM memberships m
+            WHERE m.org_id = ? AND m.is_active = 1
+            GROUP BY m.org_id
+        ) ms ON ms.org_id = o.id
         WHERE o.id = ?
         LIMIT 1
         """,
-        (org_id,),
+        (org_id, org_id),
     ).fetchone()
     conn.close()
     return dict(row) if row else None
@@ -7586,9 +8421,10 @@ def get_exam_catalogue_visibility_summary(org_id: int) -> dict:
     ).fetchone()
     summary["active_catalogue_count"] = int(active_row["c"] if active_row else 0)
     if table_exists("study_description_preset_assignments"):
+        # UNIQUE(org_id, preset_id) means each preset appears once per org; no DISTINCT needed.
         assigned_row = conn.execute(
             """
-            SELECT COUNT(DISTINCT a.preset_id) AS c
+            SELECT COUNT(*) AS c
             FROM study_description_preset_assignments a
             JOIN study_description_presets p ON p.id = a.preset_id
             WHERE a.org_id = ?
@@ -7766,12 +8602,16 @@ def radiologist_dashboard(request: Request, tab: str = "all"):
     conn.close()
 
     cases: list[dict] = []
+    now = datetime.now(timezone.utc)
     for r in rows:
         d = dict(r)
         created_dt = parse_iso_dt(d.get("created_at"))
-        d["created_display"] = format_display_datetime(d.get("created_at"), d.get("created_at") or "")
+        if created_dt:
+            d["created_display"] = created_dt.strftime(_DISPLAY_DATETIME_FORMAT)
+        else:
+            d["created_display"] = format_display_datetime(d.get("created_at"), d.get("created_at") or "")
 
-        secs = tat_seconds(d.get("created_at"), d.get("vetted_at"))
+        secs = tat_seconds(created_dt, d.get("vetted_at"), now)
         d["tat_display"] = format_tat(secs)
         
         # Use institution-specific SLA or default to 48 hours
@@ -7869,92 +8709,16 @@ def preview_report_settings(request: Request):
     header_text = get_setting(f"report_header:{org_id}", org_name or "").strip() or (org_name or "Organisation")
     footer_text = get_setting(f"report_footer:{org_id}", "Confidential workflow document").strip() or "Confidential workflow document"
     sample_now = datetime.now().strftime("%d %b %Y %H:%M")
-    body = f"""<!doctype html>
-<html>
-<head>
-  <meta charset="utf-8">
-  <meta name="viewport" content="width=device-width, initial-scale=1">
-  <title>Report Preview</title>
-  <link rel="stylesheet" href="/static/css/site.css">
-  <style>
-    body {{ margin: 0; min-height: 100vh; background: linear-gradient(180deg, #08101d 0%, #0e1a2c 100%); color: rgba(241, 245, 249, 0.92); font-family: Inter, system-ui, sans-serif; }}
-    .shell {{ max-width: 1180px; margin: 0 auto; padding: 24px; }}
-    .page {{ max-width: 960px; margin: 0 auto; background: rgba(10, 18, 34, 0.96); border: 1px solid rgba(148, 163, 184, 0.18); border-radius: 18px; box-shadow: 0 28px 60px rgba(4, 10, 22, 0.55); overflow: hidden; }}
-    .toolbar {{ display:flex; justify-content:space-between; align-items:center; gap:12px; padding: 18px 22px; border-bottom: 1px solid rgba(148, 163, 184, 0.12); background: rgba(255,255,255,0.03); }}
-    .toolbar strong {{ color: #f8fbff; }}
-    .toolbar span {{ color: rgba(203, 213, 225, 0.78) !important; }}
-    .btn {{ display:inline-flex; align-items:center; justify-content:center; padding: 10px 14px; border-radius: 10px; text-decoration:none; background:#1f6feb; color:white; }}
-    .page-inner {{ padding: 30px 38px 34px; }}
-    .header-rule {{ height: 8px; border-radius: 999px; background: linear-gradient(90deg, #1f6feb, #60a5fa); margin-bottom: 20px; }}
-    .report-header {{ font-size: 28px; font-weight: 700; margin: 0 0 4px; color: #ffffff; }}
-    .report-sub {{ color: rgba(191, 219, 254, 0.82); font-size: 13px; margin-bottom: 24px; }}
-    .status {{ display:inline-block; padding: 6px 12px; border-radius: 999px; background: rgba(16,185,129,0.18); border: 1px solid rgba(16,185,129,0.3); color:#86efac; font-size: 12px; font-weight:700; letter-spacing:0.04em; text-transform:uppercase; }}
-    .section {{ margin-top: 24px; }}
-    .section h2 {{ font-size: 13px; letter-spacing: 0.08em; text-transform: uppercase; color: rgba(191, 219, 254, 0.8); margin: 0 0 12px; }}
-    .grid {{ display:grid; grid-template-columns: 180px 1fr; gap: 10px 18px; }}
-    .label {{ color: rgba(148, 163, 184, 0.92); font-size:12px; font-weight:700; text-transform:uppercase; letter-spacing:0.06em; }}
-    .value {{ color:#f8fbff; font-size:14px; }}
-    .card {{ border: 1px solid rgba(148, 163, 184, 0.14); border-radius: 14px; padding: 16px 18px; background: rgba(255,255,255,0.03); }}
-    .footer {{ margin-top: 28px; padding-top: 16px; border-top: 1px solid rgba(148, 163, 184, 0.14); color:rgba(203, 213, 225, 0.86); font-size:12px; line-height:1.6; white-space:pre-wrap; }}
-    @media (max-width: 760px) {{ .shell {{ padding: 0; }} .page {{ margin: 0; border-radius: 0; border: 0; box-shadow:none; }} .page-inner {{ padding: 22px 18px 28px; }} .grid {{ grid-template-columns: 1fr; gap: 6px; }} .toolbar {{ flex-direction:column; align-items:flex-start; }} }}
-  </style>
-</head>
-<body>
-  <div class="shell">
-  <div class="page">
-    <div class="toolbar">
-      <div>
-        <strong>Decision Report Preview</strong><br>
-        <span style="color:#526274;font-size:12px;">Sample layout using the current header and footer settings.</span>
-      </div>
-      <a class="btn" href="/settings?tab=report">Back to Settings</a>
-    </div>
-    <div class="page-inner">
-      <div class="header-rule"></div>
-      <div class="report-header">{html.escape(header_text)}</div>
-      <div class="report-sub">Preview generated {html.escape(sample_now)}</div>
-      <span class="status">Approved with Comment</span>
-
-      <div class="section">
-        <h2>Case Summary</h2>
-        <div class="card">
-          <div class="grid">
-            <div class="label">Case ID</div><div class="value">PREVIEW-001</div>
-            <div class="label">Patient</div><div class="value">Jane Example</div>
-            <div class="label">Patient ID</div><div class="value">RAD-12345</div>
-            <div class="label">Study</div><div class="value">MRI Brain with contrast</div>
-            <div class="label">Institution</div><div class="value">{html.escape(org_name or 'Sample Institution')}</div>
-            <div class="label">Practitioner</div><div class="value">Dr Sample Practitioner</div>
-            <div class="label">Recorded At</div><div class="value">{html.escape(sample_now)}</div>
-          </div>
-        </div>
-      </div>
-
-      <div class="section">
-        <h2>Decision</h2>
-        <div class="card">
-          <div class="grid">
-            <div class="label">Decision</div><div class="value">Approved with Comment</div>
-            <div class="label">Protocol</div><div class="value">MRI Brain with contrast protocol</div>
-            <div class="label">Comment</div><div class="value">Clinical details support the request. Please correlate with prior imaging and proceed with contrast if renal function is satisfactory.</div>
-          </div>
-        </div>
-      </div>
-
-      <div class="section">
-        <h2>Protocol Notes</h2>
-        <div class="card">
-          Use thin-slice acquisition through the posterior fossa and include post-contrast axial and coronal sequences.
-        </div>
-      </div>
-
-      <div class="footer">{html.escape(footer_text)}</div>
-    </div>
-  </div>
-  </div>
-</body>
-</html>"""
-    return HTMLResponse(body)
+    return templates.TemplateResponse(
+        "report_preview.html",
+        {
+            "request": request,
+            "header_text": header_text,
+            "footer_text": footer_text,
+            "org_name": org_name,
+            "sample_now": sample_now,
+        },
+    )
 
 
 @app.post("/settings/institution/add")
@@ -8180,7 +8944,7 @@ def add_user(
     radiologist_name = radiologist_name.strip() or None
     gmc = gmc.strip()
     speciality = speciality.strip()
-    mfa_required_value = 1 if str(mfa_required).strip().lower() in {"1", "true", "on", "yes"} else 0
+    mfa_required_value = 1 if form_flag(mfa_required) else 0
 
     # For radiologist users, create profile with their name
     if role == "radiologist":
@@ -8194,42 +8958,40 @@ def add_user(
 
     # Extended schema: create user plus membership when org-scoped records exist
     if table_has_column("users", "is_superuser") and org_id:
-        salt = secrets.token_bytes(16)
+        salt = new_password_salt()
         pw_hash = hash_password(password, salt)
         now = utc_now_iso()
 
         conn = get_db()
         try:
             email_val = email.strip() or None  # store NULL not '' to avoid UNIQUE constraint clashes
-            if using_postgres():
-                user_row = conn.execute(
+            try:
+                user_id = insert_returning_id(
+                    conn,
                     """
                     INSERT INTO users(username, email, password_hash, salt_hex, is_superuser, is_active, created_at, modified_at, first_name, surname)
                     VALUES(?, ?, ?, ?, 0, 1, ?, ?, ?, ?)
-                    RETURNING id
                     """,
                     (username, email_val, pw_hash.hex(), salt.hex(), now, now, first_name.strip(), surname.strip()),
-                ).fetchone()
-                user_id = user_row["id"] if isinstance(user_row, dict) else user_row[0]
-            else:
-                try:
-                    conn.execute(
-                        """
-                        INSERT INTO users(username, email, password_hash, salt_hex, is_superuser, is_active, created_at, modified_at, first_name, surname)
-                        VALUES(?, ?, ?, ?, 0, 1, ?, ?, ?, ?)
-                        """,
-                        (username, email_val, pw_hash.hex(), salt.hex(), now, now, first_name.strip(), surname.strip()),
-                    )
-                except Exception as _insert_err:
-                    _msg = str(_insert_err).lower()
-                    if "unique" in _msg and "username" in _msg:
-                        return RedirectResponse(url="/settings?error=username_taken", status_code=303)
-                    if "unique" in _msg and "email" in _msg:
-                        return RedirectResponse(url="/settings?error=email_taken", status_code=303)
+                )
+            except IntegrityError as _insert_err:
+                # Postgres default names: users_username_key / users_email_key.
+                _constraint = str(getattr(getattr(_insert_err.orig, "diag", None), "constraint_name", "") or "")
+                if "username" in _constraint:
+                    return RedirectResponse(url="/settings?error=username_taken", status_code=303)
+                if "email" in _constraint:
+                    return RedirectResponse(url="/settings?error=email_taken", status_code=303)
+                raise
+            except sqlite3.IntegrityError as _insert_err:
+                if getattr(_insert_err, "sqlite_errorcode", SQLITE_CONSTRAINT_UNIQUE) != SQLITE_CONSTRAINT_UNIQUE:
                     raise
-
-                user_row = conn.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
-                user_id = user_row["id"] if user_row else None
+                # "UNIQUE constraint failed: users.<column>"
+                _msg = str(_insert_err)
+                if _msg.endswith("users.username"):
+                    return RedirectResponse(url="/settings?error=username_taken", status_code=303)
+                if _msg.endswith("users.email"):
+                    return RedirectResponse(url="/settings?error=email_taken", status_code=303)
+                raise
             if not user_id:
                 raise HTTPException(status_code=500, detail="Failed to create user")
 
@@ -8238,7 +9000,7 @@ def add_user(
                 (mfa_required_value, now, user_id),
             )
 
-            org_role = "org_admin" if role == "admin" else "radiologist" if role == "radiologist" else "org_user"
+            org_role = _ROLE_TO_ORG_ROLE.get(role, "org_user")
             conn.execute(
                 """
                 INSERT INTO memberships (org_id, user_id, org_role, is_active, created_at, modified_at)
@@ -8250,21 +9012,22 @@ def add_user(
             if role == "radiologist":
                 display = radiologist_name or f"{first_name.strip()} {surname.strip()}".strip() or username
                 if using_postgres():
+                    # One round-trip: the radiologists insert rides along as a data-modifying CTE.
                     conn.execute(
                         """
-                        INSERT INTO radiologists(name, first_name, email, surname, gmc, speciality)
-                        VALUES(?, ?, ?, ?, ?, ?)
-                        ON CONFLICT DO NOTHING
-                        """,
-                        (display, first_name.strip(), email.strip(), surname.strip(), gmc, speciality),
-                    )
-                    conn.execute(
-                        """
+                        WITH new_radiologist AS (
+                            INSERT INTO radiologists(name, first_name, email, surname, gmc, speciality)
+                            VALUES(?, ?, ?, ?, ?, ?)
+                            ON CONFLICT DO NOTHING
+                        )
                         INSERT INTO radiologist_profiles(user_id, gmc, specialty, display_name, created_at, modified_at)
                         VALUES(?, ?, ?, ?, ?, ?)
                         ON CONFLICT (user_id) DO NOTHING
                         """,
-                        (user_id, gmc or None, speciality or None, display, now, now),
+                        (
+                            display, first_name.strip(), email.strip(), surname.strip(), gmc, speciality,
+                            user_id, gmc or None, speciality or None, display, now, now,
+                        ),
                     )
                 else:
                     conn.execute(
@@ -8287,7 +9050,7 @@ def add_user(
             conn.close()
     elif table_has_column("users", "is_superuser"):
         # New schema but no org_id context — create user only (no membership row)
-        salt = secrets.token_bytes(16)
+        salt = new_password_salt()
         pw_hash = hash_password(password, salt)
         now = utc_now_iso()
         conn = get_db()
@@ -8338,7 +9101,7 @@ def edit_user(
     username = username.strip()
     role = role.strip()
     radiologist_name = radiologist_name.strip() or None
-    mfa_required_value = 1 if str(mfa_required).strip().lower() in {"1", "true", "on", "yes"} else 0
+    mfa_required_value = 1 if form_flag(mfa_required) else 0
     
     conn = get_db()
     user = conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
@@ -8362,12 +9125,14 @@ def edit_user(
         if conflict:
             return RedirectResponse(url="/settings?error=email_taken", status_code=303)
     
+    target_id = None
     if table_has_column("users", "is_superuser"):
         # Extended schema
-        conn = get_db()
         if password.strip():
-            salt = secrets.token_bytes(16)
+            salt = new_password_salt()
             pw_hash = hash_password(password, salt)
+        conn = get_db()
+        if password.strip():
             if email_changed:
                 conn.execute(
                     "UPDATE users SET first_name = ?, surname = ?, email = ?, password_hash = ?, salt_hex = ? WHERE username = ?",
@@ -8391,7 +9156,7 @@ def edit_user(
                 )
 
         if org_id and table_exists("memberships"):
-            org_role = "org_admin" if role == "admin" else "radiologist" if role == "radiologist" else "org_user"
+            org_role = _ROLE_TO_ORG_ROLE.get(role, "org_user")
             target = conn.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
             target_id = target["id"] if target else None
             if target_id:
@@ -8427,7 +9192,7 @@ def edit_user(
     else:
         # Legacy schema
         if password.strip():
-            salt = secrets.token_bytes(16)
+            salt = new_password_salt()
             pw_hash = hash_password(password, salt)
             conn = get_db()
             if email_changed:
@@ -8465,6 +9230,8 @@ def edit_user(
     
     conn.commit()
     conn.close()
+    if target_id:
+        invalidate_membership_cache(target_id)
     return RedirectResponse(url="/settings", status_code=303)
 
 
@@ -8498,12 +9265,14 @@ def update_user_access(
             )
         else:
             # Legacy fallback
-            role = "admin" if org_role == "org_admin" else "radiologist" if org_role == "radiologist" else "user"
+            role = _ORG_ROLE_TO_ROLE.get(org_role, "user")
             conn.execute("UPDATE users SET role = ? WHERE username = ?", (role, username.strip()))
 
         conn.commit()
     finally:
         conn.close()
+    if user_id:
+        invalidate_membership_cache(user_id)
 
     return RedirectResponse(url="/settings", status_code=303)
 
@@ -8924,22 +9693,16 @@ def referral_trial_attachment_preview(request: Request, attachment_token: str):
     file_bytes = trial_path.read_bytes()
 
     if lower_name.endswith(".pdf"):
-        return HTMLResponse(
-            f"""<!doctype html><html><head><meta charset="utf-8"><style>html,body{{height:100%;margin:0;background:#0b1220}}iframe{{width:100%;height:100%;border:0;background:#fff}}</style></head><body><iframe src="/submit/referral-trial/attachment/{html.escape(attachment_token)}/inline#view=FitH"></iframe></body></html>"""
-        )
+        return render_pdf_frame_preview_html(f"/submit/referral-trial/attachment/{attachment_token}/inline")
     if lower_name.endswith((".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp")):
-        return HTMLResponse(
-            f"""<!doctype html><html><head><meta charset="utf-8"><style>html,body{{height:100%;margin:0;background:#0b1220}}body{{display:flex;align-items:center;justify-content:center;padding:12px;box-sizing:border-box}}img{{max-width:100%;max-height:100%;object-fit:contain;background:#fff;border-radius:8px}}</style></head><body><img src="/submit/referral-trial/attachment/{html.escape(attachment_token)}/inline" alt="{html.escape(filename)}"></body></html>"""
-        )
+        return render_image_preview_html(f"/submit/referral-trial/attachment/{attachment_token}/inline", filename)
     if lower_name.endswith((".txt", ".csv", ".json", ".xml", ".html", ".htm", ".md")):
         return render_text_preview_html(file_bytes)
     if lower_name.endswith(".docx"):
         docx_preview = render_docx_preview_html(file_bytes, filename)
         if docx_preview:
             return docx_preview
-    return HTMLResponse(
-        f"""<!doctype html><html><head><meta charset="utf-8"><style>html,body{{height:100%;margin:0;background:#0b1220;color:#e2e8f0;font-family:Segoe UI,Arial,sans-serif}}body{{display:flex;align-items:center;justify-content:center;padding:24px;box-sizing:border-box}}.card{{max-width:520px;background:rgba(15,23,42,0.9);border:1px solid rgba(148,163,184,0.2);border-radius:14px;padding:24px;text-align:center}}.name{{font-weight:600;color:#fff;margin-bottom:10px}}.msg{{color:#cbd5e1;line-height:1.6;margin-bottom:16px}}.btn{{display:inline-block;padding:10px 14px;border-radius:8px;background:#1f6feb;color:#fff;text-decoration:none}}</style></head><body><div class="card"><div class="name">{html.escape(filename)}</div><div class="msg">Preview is not available for this file type in the current environment.</div><a class="btn" href="/submit/referral-trial/attachment/{html.escape(attachment_token)}/inline" target="_blank" rel="noopener">Open file</a></div></body></html>"""
-    )
+    return render_preview_unavailable_html(filename, f"/submit/referral-trial/attachment/{attachment_token}/inline", "Open file")
 
 
 @app.post("/submit/referral-trial/create")
@@ -9955,12 +10718,11 @@ def download_attachment(request: Request, case_id: str):
     media_type, _ = mimetypes.guess_type(filename)
     
     # Try blob storage first
-    file_bytes = None
     if BLOB_STORAGE_ENABLED and stored_path and not stored_path.startswith("/"):
-        file_bytes = download_from_blob(stored_path)
-        if file_bytes:
+        blob_chunks = stream_from_blob(stored_path)
+        if blob_chunks is not None:
             return StreamingResponse(
-                io.BytesIO(file_bytes),
+                blob_chunks,
                 media_type=media_type or "application/octet-stream",
                 headers={"Content-Disposition": f'attachment; filename="{filename}"'},
             )
@@ -9985,10 +10747,10 @@ def download_specific_attachment(request: Request, case_id: str, attachment_id:
     media_type, _ = mimetypes.guess_type(filename)
 
     if BLOB_STORAGE_ENABLED and stored_path and not str(stored_path).startswith("/"):
-        file_bytes = download_from_blob(str(stored_path))
-        if file_bytes:
+        blob_chunks = stream_from_blob(str(stored_path))
+        if blob_chunks is not None:
             return StreamingResponse(
-                io.BytesIO(file_bytes),
+                blob_chunks,
                 media_type=media_type or "application/octet-stream",
                 headers={"Content-Disposition": f'attachment; filename="{filename}"'},
             )
@@ -10008,10 +10770,10 @@ def view_specific_attachment_inline(request: Request, case_id: str, attachment_i
     headers = {"Content-Disposition": f'inline; filename="{filename}"'}
 
     if BLOB_STORAGE_ENABLED and stored_path and not str(stored_path).startswith("/"):
-        file_bytes = download_from_blob(str(stored_path))
-        if file_bytes:
+        blob_chunks = stream_from_blob(str(stored_path))
+        if blob_chunks is not None:
             return StreamingResponse(
-                io.BytesIO(file_bytes),
+                blob_chunks,
                 media_type=media_type or "application/octet-stream",
                 headers=headers,
             )
@@ -10028,13 +10790,9 @@ def view_specific_attachment_preview(request: Request, case_id: str, attachment_
     filename = attachment.get("uploaded_filename") or "Attachment"
     lower_name = str(filename).lower()
     if lower_name.endswith(".pdf"):
-        return HTMLResponse(
-            f"""<!doctype html><html><head><meta charset="utf-8"><style>html,body{{height:100%;margin:0;background:#0b1220}}iframe{{width:100%;height:100%;border:0;background:#fff}}</style></head><body><iframe src="/case/{case_id}/attachments/{attachment_id}/inline#view=FitH"></iframe></body></html>"""
-        )
+        return render_pdf_frame_preview_html(f"/case/{case_id}/attachments/{attachment_id}/inline")
     if lower_name.endswith((".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp")):
-        return HTMLResponse(
-            f"""<!doctype html><html><head><meta charset="utf-8"><style>html,body{{height:100%;margin:0;background:#0b1220}}body{{display:flex;align-items:center;justify-content:center;padding:12px;box-sizing:border-box}}img{{max-width:100%;max-height:100%;object-fit:contain;background:#fff;border-radius:8px}}</style></head><body><img src="/case/{case_id}/attachments/{attachment_id}/inline" alt="{html.escape(filename)}"></body></html>"""
-        )
+        return render_image_preview_html(f"/case/{case_id}/attachments/{attachment_id}/inline", filename)
 
     file_bytes = load_case_attachment_bytes(attachment.get("stored_filepath"))
     if file_bytes is None:
@@ -10048,9 +10806,7 @@ def view_specific_attachment_preview(request: Request, case_id: str, attachment_
         if docx_preview:
             return docx_preview
 
-    return HTMLResponse(
-        f"""<!doctype html><html><head><meta charset="utf-8"><style>html,body{{height:100%;margin:0;background:#0b1220;color:#e2e8f0;font-family:Segoe UI,Arial,sans-serif}}body{{display:flex;align-items:center;justify-content:center;padding:24px;box-sizing:border-box}}.card{{max-width:520px;background:rgba(15,23,42,0.9);border:1px solid rgba(148,163,184,0.2);border-radius:14px;padding:24px;text-align:center}}.name{{font-weight:600;color:#fff;margin-bottom:10px}}.msg{{color:#cbd5e1;line-height:1.6;margin-bottom:16px}}.btn{{display:inline-block;padding:10px 14px;border-radius:8px;background:#1f6feb;color:#fff;text-decoration:none}}</style></head><body><div class="card"><div class="name">{html.escape(filename)}</div><div class="msg">Preview is not available for this file type in the current environment.</div><a class="btn" href="/case/{case_id}/attachments/{attachment_id}/inline" target="_blank" rel="noopener">Open attachment</a></div></body></html>"""
-    )
+    return render_preview_unavailable_html(filename, f"/case/{case_id}/attachments/{attachment_id}/inline", "Open attachment")
 
 
 @app.get("/case/{case_id}/attachment/inline")
@@ -10085,12 +10841,11 @@ def view_attachment_inline(request: Request, case_id: str):
     headers = {"Content-Disposition": f'inline; filename="{filename}"'}
     
     # Try blob storage first
-    file_bytes = None
     if BLOB_STORAGE_ENABLED and stored_path and not stored_path.startswith("/"):
-        file_bytes = download_from_blob(stored_path)
-        if file_bytes:
+        blob_chunks = stream_from_blob(stored_path)
+        if blob_chunks is not None:
             return StreamingResponse(
-                io.BytesIO(file_bytes),
+                blob_chunks,
                 media_type=media_type or "application/octet-stream",
                 headers=headers
             )
@@ -10136,18 +10891,10 @@ def view_attachment_preview(request: Request, case_id: str):
     media_type, _ = mimetypes.guess_type(filename)
 
     if lower_name.endswith(".pdf"):
-        return HTMLResponse(
-            f"""<!doctype html>
-<html><head><meta charset="utf-8"><style>html,body{{height:100%;margin:0;background:#0b1220}}iframe{{width:100%;height:100%;border:0;background:#fff}}</style></head>
-<body><iframe src="/case/{case_id}/attachment/inline#view=FitH"></iframe></body></html>"""
-        )
+        return render_pdf_frame_preview_html(f"/case/{case_id}/attachment/inline")
 
     if lower_name.endswith((".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp")):
-        return HTMLResponse(
-            f"""<!doctype html>
-<html><head><meta charset="utf-8"><style>html,body{{height:100%;margin:0;background:#0b1220}}body{{display:flex;align-items:center;justify-content:center;padding:12px;box-sizing:border-box}}img{{max-width:100%;max-height:100%;object-fit:contain;background:#fff;border-radius:8px}}</style></head>
-<body><img src="/case/{case_id}/attachment/inline" alt="{html.escape(filename)}"></body></html>"""
-        )
+        return render_image_preview_html(f"/case/{case_id}/attachment/inline", filename)
 
     file_bytes = load_case_attachment_bytes(stored_path)
     if file_bytes is None:
@@ -10166,517 +10913,553 @@ def view_attachment_preview(request: Request, case_id: str):
         "Preview is not available for this file type in the current environment. "
         "Use the download link below to open the original attachment."
     )
-    return HTMLResponse(
-        f"""<!doctype html>
-<html><head><meta charset="utf-8"><style>
-html,body{{height:100%;margin:0;background:#0b1220;color:#e2e8f0;font-family:Segoe UI,Arial,sans-serif}}
-body{{display:flex;align-items:center;justify-content:center;padding:24px;box-sizing:border-box}}
-.card{{max-width:520px;background:rgba(15,23,42,0.9);border:1px solid rgba(148,163,184,0.2);border-radius:14px;padding:24px;text-align:center}}
-.name{{font-weight:600;color:#fff;margin-bottom:10px}}
-.msg{{color:#cbd5e1;line-height:1.6;margin-bottom:16px}}
-.btn{{display:inline-block;padding:10px 14px;border-radius:8px;background:#1f6feb;color:#fff;text-decoration:none}}
-</style></head>
-<body><div class="card"><div class="name">{html.escape(filename)}</div><div class="msg">{html.escape(fallback_message)}</div><a class="btn" href="/case/{case_id}/attachment">Download attachment</a></div></body></html>"""
+    return render_preview_unavailable_html(
+        filename,
+        f"/case/{case_id}/attachment",
+        "Download attachment",
+        message=fallback_message,
+        new_tab=False,
     )
 
 
-@app.get("/case/{case_id}/pdf")
-def case_pdf(request: Request, case_id: str, inline: bool = False, include_timeline: bool = False):
-    try:
-        user = require_login(request)
-
-        conn = get_db()
-        row = conn.execute("SELECT * FROM cases WHERE id = ?", (case_id,)).fetchone()
-        conn.close()
-        if not row:
-            raise HTTPException(status_code=404, detail="Case not found")
-        if user.get("role") == "radiologist":
-            raise HTTPException(status_code=403, detail="Radiologists are not allowed to download PDFs")
-
-        org_id = user.get("org_id")
-        case_data = row if isinstance(row, dict) else dict(row)
-
-        if org_id and not user.get("is_superuser") and case_data.get("org_id") and case_data.get("org_id") != org_id:
-            raise HTTPException(status_code=403, detail="Access denied")
-
-        suffix = "_timeline" if include_timeline else ""
-        pdf_path = UPLOAD_DIR / f"{case_id}_vetting{suffix}.pdf"
-
-        # Bug 8: Convert row to dict to avoid sqlite3.Row.get() issues
-        if isinstance(row, dict):
-            case_data = row
-        else:
-            case_data = dict(row)
-
-        # Organisation name
-        org_name = ""
-        if case_data.get("org_id"):
-            conn = get_db()
-            org_row = conn.execute("SELECT name FROM organisations WHERE id = ?", (case_data.get("org_id"),)).fetchone()
-            conn.close()
-            if org_row:
-                org_name = org_row.get("name") if isinstance(org_row, dict) else org_row[0]
-        report_setting_scope = case_data.get("org_id") or org_id or 0
-        report_header_text = get_setting(f"report_header:{report_setting_scope}", org_name or "").strip() or (org_name or "Organisation")
-        report_footer_text = get_setting(f"report_footer:{report_setting_scope}", "Confidential workflow document").strip() or "Confidential workflow document"
-
-        events: list[dict] = []
-        if table_exists("case_events"):
-            conn = get_db()
-            event_rows = conn.execute(
-                "SELECT * FROM case_events WHERE case_id = ? ORDER BY created_at ASC",
-                (case_id,),
-            ).fetchall()
-            conn.close()
-            events = [dict(e) for e in event_rows]
-
-        # Radiologist details (profile + GMC)
-        rad_name = case_data.get("radiologist", "")
-        rad_display = rad_name
-        rad_gmc = ""
-        if rad_name and table_exists("radiologist_profiles") and table_exists("users"):
-            conn = get_db()
-            params = [rad_name, rad_name]
-            sql = (
-                "SELECT rp.display_name, rp.gmc, u.username "
-                "FROM radiologist_profiles rp "
-                "JOIN users u ON u.id = rp.user_id "
-            )
-            if table_exists("memberships") and case_data.get("org_id"):
-                sql += "LEFT JOIN memberships m ON m.user_id = u.id "
-                sql += "WHERE (rp.display_name = ? OR u.username = ?) AND m.org_id = ? "
-                params.append(case_data.get("org_id"))
-            else:
-                sql += "WHERE rp.display_name = ? OR u.username = ? "
-            sql += "LIMIT 1"
-            prof = conn.execute(sql, params).fetchone()
-            conn.close()
-            if prof:
-                prof = dict(prof)
-                rad_display = prof.get("display_name") or rad_display
-                rad_gmc = prof.get("gmc") or ""
-        elif rad_name:
-            rad = get_radiologist(rad_name)
-            if rad:
-                rad_gmc = rad.get("gmc", "")
-
-        institution_name = ""
-        if case_data.get("institution_id"):
-            inst = get_institution(case_data.get("institution_id"))
-            if inst:
-                institution_name = inst["name"]
-
-        def format_datetime(iso_string: str | None) -> str:
-            return format_display_datetime(iso_string)
-
-        def decision_label(case_row: dict) -> str:
-            return display_decision_label(case_row.get("decision"), fallback_status=case_row.get("status"))
-
-        def status_label(status_value: str | None) -> str:
-            return display_case_status(status_value).upper()
-
-        def event_label(event: dict) -> str:
+def _render_case_pdf(
+    pdf_path: Path,
+    case_data: dict,
+    events: list[dict],
+    *,
+    include_timeline: bool,
+    protocol_notes: str,
+    report_header_text: str,
+    report_footer_text: str,
+    rad_display: str,
+    rad_gmc: str,
+    institution_name: str,
+) -> None:
+    """Draw the vetting report for a case to pdf_path. Runs on PDF_RENDER_EXECUTOR."""
+
+    def format_datetime(iso_string: str | None) -> str:
+        return format_display_datetime(iso_string)
+
+    def decision_label(case_row: dict) -> str:
+        return display_decision_label(case_row.get("decision"), fallback_status=case_row.get("status"))
+
+    def status_label(status_value: str | None) -> str:
+        return display_case_status(status_value).upper()
+
+    def event_label(event: dict) -> str:
+        event_type = str(event.get("event_type") or "").upper()
+        if event_type in {"SUBMITTED", "CREATED"}:
+            return "Case created"
+        if event_type == "ASSIGNED":
+            return "Assigned to practitioner"
+        if event_type == "OPENED":
+            return "Case opened by practitioner"
+        if event_type == "REOPENED":
+            return "Case reopened by admin"
+        if event_type == "VETTED":
+            return "Decision recorded"
+        if event_type == "REPORT_SENT":
+            return "Justification sent"
+        if event_type == "JUSTIFICATION_NOT_REQUIRED":
+            return "No justification required"
+        if event_type == "REPORT_SENT_RESET":
+            return "Justification sent status reset"
+        if event_type == "DELETED":
+            return "Case deleted"
+        if event_type == "EXAM_CATALOGUE_EXCEPTION":
+            return "Temporary uncatalogued exam"
+        if event_type == "EDITED":
+            return "Case edited"
+        return event_type.title()
+
+    def note_entries_from_events(all_events: list[dict]) -> list[dict]:
+        entries: list[dict] = []
+        for event in all_events:
             event_type = str(event.get("event_type") or "").upper()
+            comment = str(event.get("comment") or "").strip()
+            if not comment:
+                continue
             if event_type in {"SUBMITTED", "CREATED"}:
-                return "Case created"
-            if event_type == "ASSIGNED":
-                return "Assigned to practitioner"
-            if event_type == "OPENED":
-                return "Case opened by practitioner"
-            if event_type == "REOPENED":
-                return "Case reopened by admin"
-            if event_type == "VETTED":
-                return "Decision recorded"
-            if event_type == "REPORT_SENT":
-                return "Justification sent"
-            if event_type == "JUSTIFICATION_NOT_REQUIRED":
-                return "No justification required"
-            if event_type == "REPORT_SENT_RESET":
-                return "Justification sent status reset"
-            if event_type == "DELETED":
-                return "Case deleted"
-            if event_type == "EXAM_CATALOGUE_EXCEPTION":
-                return "Temporary uncatalogued exam"
-            if event_type == "EDITED":
-                return "Case edited"
-            return event_type.title()
-
-        def note_entries_from_events(all_events: list[dict]) -> list[dict]:
-            entries: list[dict] = []
-            for event in all_events:
-                event_type = str(event.get("event_type") or "").upper()
-                comment = str(event.get("comment") or "").strip()
-                if not comment:
-                    continue
-                if event_type in {"SUBMITTED", "CREATED"}:
+                entries.append({
+                    "kind": "Admin note",
+                    "created_at": event.get("created_at"),
+                    "text": comment,
+                })
+            elif event_type == "REOPENED":
+                entries.append({
+                    "kind": "Reopened note",
+                    "created_at": event.get("created_at"),
+                    "text": comment,
+                })
+            elif event_type == "EDITED" and "Notes:" in comment:
+                note_text = comment.split("Notes:", 1)[1].strip()
+                if note_text:
                     entries.append({
                         "kind": "Admin note",
                         "created_at": event.get("created_at"),
-                        "text": comment,
-                    })
-                elif event_type == "REOPENED":
-                    entries.append({
-                        "kind": "Reopened note",
-                        "created_at": event.get("created_at"),
-                        "text": comment,
+                        "text": note_text,
                     })
-                elif event_type == "EDITED" and "Notes:" in comment:
-                    note_text = comment.split("Notes:", 1)[1].strip()
-                    if note_text:
-                        entries.append({
-                            "kind": "Admin note",
-                            "created_at": event.get("created_at"),
-                            "text": note_text,
-                        })
-            return entries
-
-        protocol_notes = ""
-        protocol_name = case_data.get("protocol")
-        if normalize_decision_label(case_data.get("decision")) != "Rejected" and protocol_name:
-            try:
-                conn = get_db()
-                if case_data.get("org_id") and case_data.get("institution_id"):
-                    protocol_row = conn.execute(
-                        "SELECT instructions FROM protocols WHERE name = ? AND institution_id = ? AND org_id = ? LIMIT 1",
-                        (protocol_name, case_data.get("institution_id"), case_data.get("org_id")),
-                    ).fetchone()
-                elif case_data.get("institution_id"):
-                    protocol_row = conn.execute(
-                        "SELECT instructions FROM protocols WHERE name = ? AND institution_id = ? LIMIT 1",
-                        (protocol_name, case_data.get("institution_id")),
-                    ).fetchone()
-                else:
-                    protocol_row = conn.execute(
-                        "SELECT instructions FROM protocols WHERE name = ? LIMIT 1",
-                        (protocol_name,),
-                    ).fetchone()
-                conn.close()
-                if protocol_row:
-                    protocol_notes = protocol_row.get("instructions") if isinstance(protocol_row, dict) else protocol_row["instructions"]
-            except Exception as exc:
-                print(f"Error fetching protocol instructions: {exc}")
-
-        c = canvas.Canvas(str(pdf_path), pagesize=A4)
-        width, height = A4
-        left = 42
-        right = width - 42
+        return entries
+
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(str(pdf_path), pagesize=A4)
+    width, height = A4
+    left = 42
+    right = width - 42
+    y = height - 54
+
+    accent = colors.HexColor("#1f6feb")
+    accent_soft = colors.HexColor("#dbeafe")
+    ink = colors.HexColor("#0f172a")
+    muted = colors.HexColor("#475569")
+    border = colors.HexColor("#cbd5e1")
+    note_fill = colors.HexColor("#f8fafc")
+    reopened_fill = colors.HexColor("#ecfeff")
+    reopened_border = colors.HexColor("#67e8f9")
+    if str(case_data.get("status") or "").lower() == "rejected":
+        status_fill = colors.HexColor("#fee2e2")
+        status_text = colors.HexColor("#b91c1c")
+    elif str(case_data.get("status") or "").lower() == "reopened":
+        status_fill = colors.HexColor("#cffafe")
+        status_text = colors.HexColor("#0f766e")
+    elif str(case_data.get("status") or "").lower() == "vetted":
+        status_fill = colors.HexColor("#dcfce7")
+        status_text = colors.HexColor("#166534")
+    else:
+        status_fill = colors.HexColor("#fef3c7")
+        status_text = colors.HexColor("#92400e")
+
+    def new_page():
+        nonlocal y
+        c.showPage()
         y = height - 54
 
-        accent = colors.HexColor("#1f6feb")
-        accent_soft = colors.HexColor("#dbeafe")
-        ink = colors.HexColor("#0f172a")
-        muted = colors.HexColor("#475569")
-        border = colors.HexColor("#cbd5e1")
-        note_fill = colors.HexColor("#f8fafc")
-        reopened_fill = colors.HexColor("#ecfeff")
-        reopened_border = colors.HexColor("#67e8f9")
-        if str(case_data.get("status") or "").lower() == "rejected":
-            status_fill = colors.HexColor("#fee2e2")
-            status_text = colors.HexColor("#b91c1c")
-        elif str(case_data.get("status") or "").lower() == "reopened":
-            status_fill = colors.HexColor("#cffafe")
-            status_text = colors.HexColor("#0f766e")
-        elif str(case_data.get("status") or "").lower() == "vetted":
-            status_fill = colors.HexColor("#dcfce7")
-            status_text = colors.HexColor("#166534")
-        else:
-            status_fill = colors.HexColor("#fef3c7")
-            status_text = colors.HexColor("#92400e")
-
-        def new_page():
-            nonlocal y
-            c.showPage()
-            y = height - 54
-
-        def ensure_space(required: int):
-            nonlocal y
-            if y - required < 50:
-                new_page()
-
-        def draw_wrapped(text_value: str, x: int, y_top: int, max_width: int, *, font_name: str = "Helvetica", font_size: int = 10, color=ink, leading: int = 13) -> int:
-            text = str(text_value or "").strip()
-            if not text:
-                return y_top
-            c.setFillColor(color)
-            c.setFont(font_name, font_size)
-            paragraphs = text.splitlines() or [text]
-            y_cursor = y_top
-            for paragraph in paragraphs:
-                words = paragraph.split() or [""]
-                line_buf = words[0]
-                for word in words[1:]:
-                    candidate = f"{line_buf} {word}".strip()
-                    if c.stringWidth(candidate, font_name, font_size) <= max_width:
-                        line_buf = candidate
-                    else:
-                        c.drawString(x, y_cursor, line_buf)
-                        y_cursor -= leading
-                        line_buf = word
-                c.drawString(x, y_cursor, line_buf)
-                y_cursor -= leading
-            return y_cursor
-
-        def wrap_lines(text_value: str, max_width: int, *, font_name: str = "Helvetica", font_size: int = 10) -> list[str]:
-            text = str(text_value or "").strip()
-            if not text:
-                return []
-            output: list[str] = []
-            paragraphs = text.splitlines() or [text]
-            for paragraph in paragraphs:
-                words = paragraph.split() or [""]
-                line_buf = words[0]
-                for word in words[1:]:
-                    candidate = f"{line_buf} {word}".strip()
-                    if c.stringWidth(candidate, font_name, font_size) <= max_width:
-                        line_buf = candidate
-                    else:
-                        output.append(line_buf)
-                        line_buf = word
-                output.append(line_buf)
-            return output
-
-        def wrapped_height(text_value: str, max_width: int, *, font_name: str = "Helvetica", font_size: int = 10, leading: int = 13) -> int:
-            text = str(text_value or "").strip()
-            if not text:
-                return 0
-            paragraphs = text.splitlines() or [text]
-            total_lines = 0
-            for paragraph in paragraphs:
-                words = paragraph.split() or [""]
-                line_buf = words[0]
-                line_count = 1
-                for word in words[1:]:
-                    candidate = f"{line_buf} {word}".strip()
-                    if c.stringWidth(candidate, font_name, font_size) <= max_width:
-                        line_buf = candidate
-                    else:
-                        line_count += 1
-                        line_buf = word
-                total_lines += line_count
-            return total_lines * leading
-
-        def section_title(title: str):
-            nonlocal y
-            ensure_space(52)
-            c.setFillColor(accent)
-            c.setFont("Helvetica-Bold", 13)
-            c.drawString(left, y, title)
-            y -= 12
-            c.setStrokeColor(accent_soft)
-            c.setLineWidth(1)
-            c.line(left, y, right, y)
-            y -= 20
-
-        def draw_info_grid(rows: list[tuple[str, str]]):
-            nonlocal y
-            col_gap = 24
-            col_width = (right - left - col_gap) / 2
-            grid_rows = [rows[i:i + 2] for i in range(0, len(rows), 2)]
-            row_heights: list[int] = []
-            for pair in grid_rows:
-                max_height = 34
-                for _, value in pair:
-                    value_height = wrapped_height(value or "-", int(col_width - 24), font_size=10, leading=12)
-                    max_height = max(max_height, 22 + value_height)
-                row_heights.append(max_height)
-            box_height = sum(row_heights) + 18
-            ensure_space(int(box_height + 24))
-            top = y
-            c.setFillColor(colors.white)
-            c.setStrokeColor(border)
-            c.roundRect(left, top - box_height + 8, right - left, box_height, 10, stroke=1, fill=1)
-            current_y = top - 18
-            for pair, this_row_height in zip(grid_rows, row_heights):
-                for idx, (label, value) in enumerate(pair):
-                    x = left + (col_width + col_gap) * idx + 14
-                    c.setFillColor(muted)
-                    c.setFont("Helvetica-Bold", 8)
-                    c.drawString(x, current_y, label.upper())
-                    c.setFillColor(ink)
-                    c.setFont("Helvetica", 10)
-                    draw_wrapped(value or "-", x, current_y - 13, int(col_width - 24), font_size=10, color=ink, leading=12)
-                current_y -= this_row_height
-            y = top - box_height - 14
-
-        def draw_text_card(text_value: str, *, min_height: int = 92, font_size: int = 10, leading: int = 13):
-            nonlocal y
-            content = str(text_value or "").strip() or "Not recorded"
-            text_height = wrapped_height(content, int(right - left - 28), font_size=font_size, leading=leading)
-            box_height = max(min_height, text_height + 36)
-            ensure_space(box_height + 18)
-            top = y
-            c.setFillColor(colors.white)
-            c.setStrokeColor(accent_soft)
-            c.roundRect(left, top - box_height, right - left, box_height, 12, stroke=1, fill=1)
-            draw_wrapped(content, left + 14, top - 22, int(right - left - 28), font_size=font_size, color=ink, leading=leading)
-            y = top - box_height - 16
-
-        def draw_note_card(kind: str, created_at: str | None, text_value: str):
-            nonlocal y
-            lines = str(text_value or "").strip().splitlines() or [""]
-            estimated_height = 52 + max(0, len(lines) - 1) * 12
-            ensure_space(estimated_height + 12)
-            fill_color = reopened_fill if "Reopened" in kind else note_fill
-            stroke_color = reopened_border if "Reopened" in kind else border
-            c.setFillColor(fill_color)
-            c.setStrokeColor(stroke_color)
-            c.roundRect(left, y - estimated_height, right - left, estimated_height, 10, stroke=1, fill=1)
-            c.setFillColor(accent if "Reopened" in kind else muted)
-            c.setFont("Helvetica-Bold", 9)
-            c.drawString(left + 14, y - 16, kind.upper())
-            c.setFillColor(muted)
-            c.setFont("Helvetica", 9)
-            c.drawRightString(right - 14, y - 16, format_datetime(created_at))
-            y_text = y - 34
-            y_after = draw_wrapped(text_value, left + 14, y_text, int(right - left - 28), font_size=10, color=ink, leading=13)
-            y = min(y - estimated_height - 10, y_after - 8)
-
-        def draw_timeline_row(timestamp: str, label: str, details: str = ""):
-            nonlocal y
-            detail_lines = details.splitlines() if details else []
-            row_height = 22 + len(detail_lines) * 11
-            ensure_space(row_height + 10)
-            c.setStrokeColor(border)
-            c.line(left, y, right, y)
-            y -= 14
-            c.setFillColor(muted)
-            c.setFont("Helvetica-Bold", 9)
-            c.drawString(left, y, timestamp)
-            c.setFillColor(ink)
-            c.setFont("Helvetica-Bold", 10)
-            c.drawString(left + 118, y, label)
-            y -= 13
-            if details:
-                y = draw_wrapped(details, left + 118, y, int(right - left - 118), font_size=9, color=muted, leading=11)
-            y -= 6
-
-        # Header
+    def ensure_space(required: int):
+        nonlocal y
+        if y - required < 50:
+            new_page()
+
+    def draw_wrapped(text_value: str, x: int, y_top: int, max_width: int, *, font_name: str = "Helvetica", font_size: int = 10, color=ink, leading: int = 13) -> int:
+        text = str(text_value or "").strip()
+        if not text:
+            return y_top
+        c.setFillColor(color)
+        c.setFont(font_name, font_size)
+        paragraphs = text.splitlines() or [text]
+        y_cursor = y_top
+        for paragraph in paragraphs:
+            words = paragraph.split() or [""]
+            line_buf = words[0]
+            for word in words[1:]:
+                candidate = f"{line_buf} {word}".strip()
+                if c.stringWidth(candidate, font_name, font_size) <= max_width:
+                    line_buf = candidate
+                else:
+                    c.drawString(x, y_cursor, line_buf)
+                    y_cursor -= leading
+                    line_buf = word
+            c.drawString(x, y_cursor, line_buf)
+            y_cursor -= leading
+        return y_cursor
+
+    def wrap_lines(text_value: str, max_width: int, *, font_name: str = "Helvetica", font_size: int = 10) -> list[str]:
+        text = str(text_value or "").strip()
+        if not text:
+            return []
+        output: list[str] = []
+        paragraphs = text.splitlines() or [text]
+        for paragraph in paragraphs:
+            words = paragraph.split() or [""]
+            line_buf = words[0]
+            for word in words[1:]:
+                candidate = f"{line_buf} {word}".strip()
+                if c.stringWidth(candidate, font_name, font_size) <= max_width:
+                    line_buf = candidate
+                else:
+                    output.append(line_buf)
+                    line_buf = word
+            output.append(line_buf)
+        return output
+
+    def wrapped_height(text_value: str, max_width: int, *, font_name: str = "Helvetica", font_size: int = 10, leading: int = 13) -> int:
+        text = str(text_value or "").strip()
+        if not text:
+            return 0
+        paragraphs = text.splitlines() or [text]
+        total_lines = 0
+        for paragraph in paragraphs:
+            words = paragraph.split() or [""]
+            line_buf = words[0]
+            line_count = 1
+            for word in words[1:]:
+                candidate = f"{line_buf} {word}".strip()
+                if c.stringWidth(candidate, font_name, font_size) <= max_width:
+                    line_buf = candidate
+                else:
+                    line_count += 1
+                    line_buf = word
+            total_lines += line_count
+        return total_lines * leading
+
+    def section_title(title: str):
+        nonlocal y
+        ensure_space(52)
         c.setFillColor(accent)
-        c.roundRect(left, y, right - left, 8, 4, stroke=0, fill=1)
-        y -= 28
-        c.setFillColor(muted)
-        header_bottom_y = draw_wrapped(
-            report_header_text,
-            left,
-            y,
-            int(right - left - 180),
-            font_name="Helvetica-Bold",
-            font_size=13,
-            color=muted,
-            leading=15,
-        )
-        c.setFont("Helvetica", 10)
-        c.drawRightString(right, y + 3, f"Generated: {format_datetime(utc_now_iso())}")
-        y = header_bottom_y - 14
-        c.setFillColor(ink)
-        c.setFont("Helvetica-Bold", 20)
-        c.drawString(left, y, "Vetting Report")
-        y -= 18
-        c.setFillColor(muted)
-        c.setFont("Helvetica", 10)
-        c.drawRightString(right, y, f"Case ID: {case_data.get('id', '')}")
-        y -= 28
-
-        badge_width = 110
-        c.setFillColor(status_fill)
-        c.setStrokeColor(status_fill)
-        c.roundRect(left, y - 6, badge_width, 24, 12, stroke=1, fill=1)
-        c.setFillColor(status_text)
-        c.setFont("Helvetica-Bold", 10)
-        c.drawCentredString(left + badge_width / 2, y + 2, status_label(case_data.get("status")))
-        y -= 28
-
-        section_title("Case Summary")
-        patient_name = f"{case_data.get('patient_first_name') or ''} {case_data.get('patient_surname') or ''}".strip() or "Not recorded"
-        draw_info_grid([
-            ("Patient Name", patient_name),
-            ("Patient ID / NHS Number", case_data.get("patient_referral_id") or "Not recorded"),
-            ("Date of Birth", case_data.get("patient_dob") or "Not recorded"),
-            ("Institution", institution_name or "Not recorded"),
-            ("Modality", case_data.get("modality") or "Not recorded"),
-            ("Study Description", case_data.get("study_description") or "Not recorded"),
-            ("Radiologist", rad_display or "Not assigned"),
-            ("Radiologist GMC", rad_gmc or "Not recorded"),
-        ])
+        c.setFont("Helvetica-Bold", 13)
+        c.drawString(left, y, title)
+        y -= 12
+        c.setStrokeColor(accent_soft)
+        c.setLineWidth(1)
+        c.line(left, y, right, y)
+        y -= 20
 
-        section_title("Justification Decision")
-        decision_value_width = int(right - left - 175)
-        decision_rows = [
-            ("Decision", decision_label(case_data)),
-            ("Protocol", case_data.get("protocol") or "Not recorded"),
-            ("Reviewed By", rad_display or "Not assigned"),
-            ("Radiologist GMC", rad_gmc or "Not recorded"),
-            ("Recorded At", format_datetime(case_data.get("vetted_at")) or "Not recorded"),
-        ]
+    def draw_info_grid(rows: list[tuple[str, str]]):
+        nonlocal y
+        col_gap = 24
+        col_width = (right - left - col_gap) / 2
+        grid_rows = [rows[i:i + 2] for i in range(0, len(rows), 2)]
         row_heights: list[int] = []
-        for _, value in decision_rows:
-            row_heights.append(max(18, wrapped_height(str(value), decision_value_width, font_size=10, leading=12)))
-        comment_height = wrapped_height(case_data.get("decision_comment") or "", int(right - left - 28), font_size=10, leading=12)
-        decision_box_height = 22 + sum(row_heights) + (len(row_heights) - 1) * 10
-        if case_data.get("decision_comment"):
-            decision_box_height += 30 + comment_height
-        decision_box_height += 20
-        ensure_space(decision_box_height + 18)
+        for pair in grid_rows:
+            max_height = 34
+            for _, value in pair:
+                value_height = wrapped_height(value or "-", int(col_width - 24), font_size=10, leading=12)
+                max_height = max(max_height, 22 + value_height)
+            row_heights.append(max_height)
+        box_height = sum(row_heights) + 18
+        ensure_space(int(box_height + 24))
+        top = y
+        c.setFillColor(colors.white)
+        c.setStrokeColor(border)
+        c.roundRect(left, top - box_height + 8, right - left, box_height, 10, stroke=1, fill=1)
+        current_y = top - 18
+        for pair, this_row_height in zip(grid_rows, row_heights):
+            for idx, (label, value) in enumerate(pair):
+                x = left + (col_width + col_gap) * idx + 14
+                c.setFillColor(muted)
+                c.setFont("Helvetica-Bold", 8)
+                c.drawString(x, current_y, label.upper())
+                c.setFillColor(ink)
+                c.setFont("Helvetica", 10)
+                draw_wrapped(value or "-", x, current_y - 13, int(col_width - 24), font_size=10, color=ink, leading=12)
+            current_y -= this_row_height
+        y = top - box_height - 14
+
+    def draw_text_card(text_value: str, *, min_height: int = 92, font_size: int = 10, leading: int = 13):
+        nonlocal y
+        content = str(text_value or "").strip() or "Not recorded"
+        text_height = wrapped_height(content, int(right - left - 28), font_size=font_size, leading=leading)
+        box_height = max(min_height, text_height + 36)
+        ensure_space(box_height + 18)
+        top = y
         c.setFillColor(colors.white)
         c.setStrokeColor(accent_soft)
-        c.roundRect(left, y - decision_box_height, right - left, decision_box_height, 12, stroke=1, fill=1)
-        top_y = y - 18
-        row_y = top_y
-        for idx, (label, value) in enumerate(decision_rows):
-            c.setFillColor(muted)
-            c.setFont("Helvetica-Bold", 8)
-            c.drawString(left + 14, row_y, label.upper())
-            c.setFillColor(ink)
-            c.setFont("Helvetica", 10)
-            value_y = draw_wrapped(str(value), left + 145, row_y, decision_value_width, font_size=10, color=ink, leading=12)
-            row_y -= row_heights[idx] + 10
-        if case_data.get("decision_comment"):
-            row_y -= 2
-            c.setFillColor(muted)
-            c.setFont("Helvetica-Bold", 8)
-            c.drawString(left + 14, row_y, "DECISION COMMENT")
-            row_y -= 16
-            row_y = draw_wrapped(case_data.get("decision_comment") or "", left + 14, row_y, int(right - left - 28), font_size=10, color=ink, leading=12)
-        y = y - decision_box_height - 16
-
-        if protocol_notes:
-            section_title("Protocol Notes")
-            draw_text_card(protocol_notes, min_height=92, font_size=10, leading=13)
-
-        if include_timeline:
-            section_title("Timeline")
-            if events:
-                for event in events:
-                    event_details = ""
-                    if str(event.get("event_type") or "").upper() in {"SUBMITTED", "CREATED"}:
-                        event_details = ""
-                    elif event.get("comment"):
-                        event_details = str(event.get("comment") or "").strip()
-                    elif event.get("decision"):
-                        event_details = display_decision_label(event.get("decision"))
-                    draw_timeline_row(
-                        format_datetime(event.get("created_at")),
-                        event_label(event),
-                        event_details,
-                    )
-            else:
-                draw_timeline_row(format_datetime(case_data.get("created_at")), "Case created", "")
-
-        footer_lines = wrap_lines(report_footer_text, int((right - left) * 0.52), font_name="Helvetica", font_size=8) or ["Confidential workflow document"]
-        footer_height = max(16, len(footer_lines) * 10)
-        ensure_space(22 + footer_height)
+        c.roundRect(left, top - box_height, right - left, box_height, 12, stroke=1, fill=1)
+        draw_wrapped(content, left + 14, top - 22, int(right - left - 28), font_size=font_size, color=ink, leading=leading)
+        y = top - box_height - 16
+
+    def draw_note_card(kind: str, created_at: str | None, text_value: str):
+        nonlocal y
+        lines = str(text_value or "").strip().splitlines() or [""]
+        estimated_height = 52 + max(0, len(lines) - 1) * 12
+        ensure_space(estimated_height + 12)
+        fill_color = reopened_fill if "Reopened" in kind else note_fill
+        stroke_color = reopened_border if "Reopened" in kind else border
+        c.setFillColor(fill_color)
+        c.setStrokeColor(stroke_color)
+        c.roundRect(left, y - estimated_height, right - left, estimated_height, 10, stroke=1, fill=1)
+        c.setFillColor(accent if "Reopened" in kind else muted)
+        c.setFont("Helvetica-Bold", 9)
+        c.drawString(left + 14, y - 16, kind.upper())
+        c.setFillColor(muted)
+        c.setFont("Helvetica", 9)
+        c.drawRightString(right - 14, y - 16, format_datetime(created_at))
+        y_text = y - 34
+        y_after = draw_wrapped(text_value, left + 14, y_text, int(right - left - 28), font_size=10, color=ink, leading=13)
+        y = min(y - estimated_height - 10, y_after - 8)
+
+    def draw_timeline_row(timestamp: str, label: str, details: str = ""):
+        nonlocal y
+        detail_lines = details.splitlines() if details else []
+        row_height = 22 + len(detail_lines) * 11
+        ensure_space(row_height + 10)
         c.setStrokeColor(border)
         c.line(left, y, right, y)
-        y -= 16
+        y -= 14
         c.setFillColor(muted)
-        c.setFont("Helvetica", 8)
-        c.drawString(left, y, "Generated by RadFlow")
-        footer_y = y
-        for idx, line in enumerate(footer_lines):
-            c.drawRightString(right, footer_y - (idx * 10), line)
+        c.setFont("Helvetica-Bold", 9)
+        c.drawString(left, y, timestamp)
+        c.setFillColor(ink)
+        c.setFont("Helvetica-Bold", 10)
+        c.drawString(left + 118, y, label)
+        y -= 13
+        if details:
+            y = draw_wrapped(details, left + 118, y, int(right - left - 118), font_size=9, color=muted, leading=11)
+        y -= 6
 
-        c.showPage()
-        c.save()
+    # Header
+    c.setFillColor(accent)
+    c.roundRect(left, y, right - left, 8, 4, stroke=0, fill=1)
+    y -= 28
+    c.setFillColor(muted)
+    header_bottom_y = draw_wrapped(
+        report_header_text,
+        left,
+        y,
+        int(right - left - 180),
+        font_name="Helvetica-Bold",
+        font_size=13,
+        color=muted,
+        leading=15,
+    )
+    c.setFont("Helvetica", 10)
+    c.drawRightString(right, y + 3, f"Generated: {format_datetime(utc_now_iso())}")
+    y = header_bottom_y - 14
+    c.setFillColor(ink)
+    c.setFont("Helvetica-Bold", 20)
+    c.drawString(left, y, "Vetting Report")
+    y -= 18
+    c.setFillColor(muted)
+    c.setFont("Helvetica", 10)
+    c.drawRightString(right, y, f"Case ID: {case_data.get('id', '')}")
+    y -= 28
+
+    badge_width = 110
+    c.setFillColor(status_fill)
+    c.setStrokeColor(status_fill)
+    c.roundRect(left, y - 6, badge_width, 24, 12, stroke=1, fill=1)
+    c.setFillColor(status_text)
+    c.setFont("Helvetica-Bold", 10)
+    c.drawCentredString(left + badge_width / 2, y + 2, status_label(case_data.get("status")))
+    y -= 28
+
+    section_title("Case Summary")
+    patient_name = f"{case_data.get('patient_first_name') or ''} {case_data.get('patient_surname') or ''}".strip() or "Not recorded"
+    draw_info_grid([
+        ("Patient Name", patient_name),
+        ("Patient ID / NHS Number", case_data.get("patient_referral_id") or "Not recorded"),
+        ("Date of Birth", case_data.get("patient_dob") or "Not recorded"),
+        ("Institution", institution_name or "Not recorded"),
+        ("Modality", case_data.get("modality") or "Not recorded"),
+        ("Study Description", case_data.get("study_description") or "Not recorded"),
+        ("Radiologist", rad_display or "Not assigned"),
+        ("Radiologist GMC", rad_gmc or "Not recorded"),
+    ])
+
+    section_title("Justification Decision")
+    decision_value_width = int(right - left - 175)
+    decision_rows = [
+        ("Decision", decision_label(case_data)),
+        ("Protocol", case_data.get("protocol") or "Not recorded"),
+        ("Reviewed By", rad_display or "Not assigned"),
+        ("Radiologist GMC", rad_gmc or "Not recorded"),
+        ("Recorded At", format_datetime(case_data.get("vetted_at")) or "Not recorded"),
+    ]
+    row_heights: list[int] = []
+    for _, value in decision_rows:
+        row_heights.append(max(18, wrapped_height(str(value), decision_value_width, font_size=10, leading=12)))
+    comment_height = wrapped_height(case_data.get("decision_comment") or "", int(right - left - 28), font_size=10, leading=12)
+    decision_box_height = 22 + sum(row_heights) + (len(row_heights) - 1) * 10
+    if case_data.get("decision_comment"):
+        decision_box_height += 30 + comment_height
+    decision_box_height += 20
+    ensure_space(decision_box_height + 18)
+    c.setFillColor(colors.white)
+    c.setStrokeColor(accent_soft)
+    c.roundRect(left, y - decision_box_height, right - left, decision_box_height, 12, stroke=1, fill=1)
+    top_y = y - 18
+    row_y = top_y
+    for idx, (label, value) in enumerate(decision_rows):
+        c.setFillColor(muted)
+        c.setFont("Helvetica-Bold", 8)
+        c.drawString(left + 14, row_y, label.upper())
+        c.setFillColor(ink)
+        c.setFont("Helvetica", 10)
+        value_y = draw_wrapped(str(value), left + 145, row_y, decision_value_width, font_size=10, color=ink, leading=12)
+        row_y -= row_heights[idx] + 10
+    if case_data.get("decision_comment"):
+        row_y -= 2
+        c.setFillColor(muted)
+        c.setFont("Helvetica-Bold", 8)
+        c.drawString(left + 14, row_y, "DECISION COMMENT")
+        row_y -= 16
+        row_y = draw_wrapped(case_data.get("decision_comment") or "", left + 14, row_y, int(right - left - 28), font_size=10, color=ink, leading=12)
+    y = y - decision_box_height - 16
+
+    if protocol_notes:
+        section_title("Protocol Notes")
+        draw_text_card(protocol_notes, min_height=92, font_size=10, leading=13)
+
+    if include_timeline:
+        section_title("Timeline")
+        if events:
+            for event in events:
+                event_details = ""
+                if str(event.get("event_type") or "").upper() in {"SUBMITTED", "CREATED"}:
+                    event_details = ""
+                elif event.get("comment"):
+                    event_details = str(event.get("comment") or "").strip()
+                elif event.get("decision"):
+                    event_details = display_decision_label(event.get("decision"))
+                draw_timeline_row(
+                    format_datetime(event.get("created_at")),
+                    event_label(event),
+                    event_details,
+                )
+        else:
+            draw_timeline_row(format_datetime(case_data.get("created_at")), "Case created", "")
+
+    footer_lines = wrap_lines(report_footer_text, int((right - left) * 0.52), font_name="Helvetica", font_size=8) or ["Confidential workflow document"]
+    footer_height = max(16, len(footer_lines) * 10)
+    ensure_space(22 + footer_height)
+    c.setStrokeColor(border)
+    c.line(left, y, right, y)
+    y -= 16
+    c.setFillColor(muted)
+    c.setFont("Helvetica", 8)
+    c.drawString(left, y, "Generated by RadFlow")
+    footer_y = y
+    for idx, line in enumerate(footer_lines):
+        c.drawRightString(right, footer_y - (idx * 10), line)
+
+    c.showPage()
+    c.save()
+
+
+def _load_case_pdf_context(request: Request, case_id: str, include_timeline: bool) -> dict:
+    """Authorise the caller and gather everything _render_case_pdf needs for a case."""
+
+    user = require_login(request)
+
+    conn = get_db()
+    # Protocol instructions ride along with the case row; the scoping mirrors
+    # the protocol lookup rules (institution first, then org within it).
+    row = conn.execute(
+        """
+        SELECT c.*,
+               (
+                   SELECT p.instructions FROM protocols p
+                   WHERE p.name = c.protocol
+                     AND (c.institution_id IS NULL OR p.institution_id = c.institution_id)
+                     AND (c.org_id IS NULL OR c.institution_id IS NULL OR p.org_id = c.org_id)
+                   LIMIT 1
+               ) AS protocol_instructions
+        FROM cases c
+        WHERE c.id = ?
+        """,
+        (case_id,),
+    ).fetchone()
+    conn.close()
+    if not row:
+        raise HTTPException(status_code=404, detail="Case not found")
+    if user.get("role") == "radiologist":
+        raise HTTPException(status_code=403, detail="Radiologists are not allowed to download PDFs")
+
+    org_id = user.get("org_id")
+    case_data = row if isinstance(row, dict) else dict(row)
+
+    if org_id and not user.get("is_superuser") and case_data.get("org_id") and case_data.get("org_id") != org_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    suffix = "_timeline" if include_timeline else ""
+    pdf_path = UPLOAD_DIR / f"{case_id}_vetting{suffix}.pdf"
+
+    # Bug 8: Convert row to dict to avoid sqlite3.Row.get() issues
+    if isinstance(row, dict):
+        case_data = row
+    else:
+        case_data = dict(row)
+
+    # Organisation name
+    org_name = ""
+    if case_data.get("org_id"):
+        conn = get_db()
+        org_row = conn.execute("SELECT name FROM organisations WHERE id = ?", (case_data.get("org_id"),)).fetchone()
+        conn.close()
+        if org_row:
+            org_name = org_row.get("name") if isinstance(org_row, dict) else org_row[0]
+    report_setting_scope = case_data.get("org_id") or org_id or 0
+    report_header_text = get_setting(f"report_header:{report_setting_scope}", org_name or "").strip() or (org_name or "Organisation")
+    report_footer_text = get_setting(f"report_footer:{report_setting_scope}", "Confidential workflow document").strip() or "Confidential workflow document"
+
+    events: list[dict] = []
+    if table_exists("case_events"):
+        conn = get_db()
+        event_rows = conn.execute(
+            "SELECT * FROM case_events WHERE case_id = ? ORDER BY created_at ASC",
+            (case_id,),
+        ).fetchall()
+        conn.close()
+        events = [dict(e) for e in event_rows]
+
+    # Radiologist details (profile + GMC)
+    rad_name = case_data.get("radiologist", "")
+    rad_display = rad_name
+    rad_gmc = ""
+    if rad_name and table_exists("radiologist_profiles") and table_exists("users"):
+        conn = get_db()
+        params = [rad_name, rad_name]
+        sql = (
+            "SELECT rp.display_name, rp.gmc, u.username "
+            "FROM radiologist_profiles rp "
+            "JOIN users u ON u.id = rp.user_id "
+        )
+        if table_exists("memberships") and case_data.get("org_id"):
+            sql += "LEFT JOIN memberships m ON m.user_id = u.id "
+            sql += "WHERE (rp.display_name = ? OR u.username = ?) AND m.org_id = ? "
+            params.append(case_data.get("org_id"))
+        else:
+            sql += "WHERE rp.display_name = ? OR u.username = ? "
+        sql += "LIMIT 1"
+        prof = conn.execute(sql, params).fetchone()
+        conn.close()
+        if prof:
+            prof = dict(prof)
+            rad_display = prof.get("display_name") or rad_display
+            rad_gmc = prof.get("gmc") or ""
+    elif rad_name:
+        rad = get_radiologist(rad_name)
+        if rad:
+            rad_gmc = rad.get("gmc", "")
+
+    institution_name = ""
+    if case_data.get("institution_id"):
+        inst = get_institution(case_data.get("institution_id"))
+        if inst:
+            institution_name = inst["name"]
+
+    protocol_notes = ""
+    if normalize_decision_label(case_data.get("decision")) != "Rejected" and case_data.get("protocol"):
+        protocol_notes = case_data.get("protocol_instructions") or ""
+
+    return {
+        "pdf_path": pdf_path,
+        "case_data": case_data,
+        "events": events,
+        "include_timeline": include_timeline,
+        "protocol_notes": protocol_notes,
+        "report_header_text": report_header_text,
+        "report_footer_text": report_footer_text,
+        "rad_display": rad_display,
+        "rad_gmc": rad_gmc,
+        "institution_name": institution_name,
+    }
+
+
+@app.get("/case/{case_id}/pdf")
+async def case_pdf(request: Request, case_id: str, inline: bool = False, include_timeline: bool = False):
+    try:
+        pdf_context = await run_in_threadpool(_load_case_pdf_context, request, case_id, include_timeline)
+        # ReportLab rendering is CPU-bound; keep it on its own bounded pool so a burst of
+        # PDF downloads cannot exhaust the threadpool shared by every sync route.
+        await asyncio.get_running_loop().run_in_executor(
+            PDF_RENDER_EXECUTOR,
+            functools.partial(_render_case_pdf, **pdf_context),
+        )
+        pdf_path = pdf_context["pdf_path"]
+        suffix = "_timeline" if include_timeline else ""
 
         if inline:
             headers = {"Content-Disposition": f'inline; filename="vetting_{case_id}{suffix}.pdf"'}
@@ -10718,22 +11501,6 @@ def account_page(request: Request, msg: str = "", error: str = ""):
     else:
         back_url = "/radiologist"
 
-    msg_html = ""
-    if msg == "saved":
-        msg_html = '<div style="background:rgba(74,222,128,0.12);border:1px solid rgba(74,222,128,0.3);color:#4ade80;padding:12px 16px;border-radius:8px;margin-bottom:16px;">✅ Your profile has been updated.</div>'
-    elif msg == "pw_changed":
-        msg_html = '<div style="background:rgba(74,222,128,0.12);border:1px solid rgba(74,222,128,0.3);color:#4ade80;padding:12px 16px;border-radius:8px;margin-bottom:16px;">✅ Password changed successfully.</div>'
-
-    error_html = ""
-    if error == "email_taken":
-        error_html = '<div style="background:rgba(239,68,68,0.12);border:1px solid rgba(239,68,68,0.4);color:#fca5a5;padding:12px 16px;border-radius:8px;margin-bottom:16px;">⚠️ That email address is already in use by another account.</div>'
-    elif error == "pw_mismatch":
-        error_html = '<div style="background:rgba(239,68,68,0.12);border:1px solid rgba(239,68,68,0.4);color:#fca5a5;padding:12px 16px;border-radius:8px;margin-bottom:16px;">⚠️ New passwords do not match. Please try again.</div>'
-    elif error == "pw_wrong":
-        error_html = '<div style="background:rgba(239,68,68,0.12);border:1px solid rgba(239,68,68,0.4);color:#fca5a5;padding:12px 16px;border-radius:8px;margin-bottom:16px;">⚠️ Current password is incorrect.</div>'
-    elif error == "pw_short":
-        error_html = '<div style="background:rgba(239,68,68,0.12);border:1px solid rgba(239,68,68,0.4);color:#fca5a5;padding:12px 16px;border-radius:8px;margin-bottom:16px;">⚠️ New password must be at least 8 characters.</div>'
-
     msg_map = {
         "saved": "Your profile has been updated.",
         "pw_changed": "Password changed successfully.",
@@ -10744,14 +11511,6 @@ def account_page(request: Request, msg: str = "", error: str = ""):
         "mfa_managed": "MFA is currently managed by your administrator and cannot be disabled here.",
     }
     msg_text = msg_map.get(msg, "")
-    msg_html = (
-        f'<div style="background:rgba(74,222,128,0.12);border:1px solid rgba(74,222,128,0.3);color:#4ade80;padding:12px 16px;border-radius:8px;margin-bottom:16px;">{html.escape(msg_text)}</div>'
-        if msg_text else ""
-    )
-    if msg == "mfa_started":
-        msg_html = f'<div style="background:rgba(96,165,250,0.12);border:1px solid rgba(96,165,250,0.3);color:#93c5fd;padding:12px 16px;border-radius:8px;margin-bottom:16px;">{html.escape(msg_text)}</div>'
-    elif msg == "mfa_required":
-        msg_html = f'<div style="background:rgba(234,179,8,0.12);border:1px solid rgba(234,179,8,0.35);color:#fde68a;padding:12px 16px;border-radius:8px;margin-bottom:16px;">{html.escape(msg_text)}</div>'
 
     error_map = {
         "email_taken": "That email address is already in use by another account.",
@@ -10763,215 +11522,26 @@ def account_page(request: Request, msg: str = "", error: str = ""):
         "mfa_managed": "MFA is currently managed by your administrator and cannot be disabled here.",
     }
     error_text = error_map.get(error, "")
-    error_html = (
-        f'<div style="background:rgba(239,68,68,0.12);border:1px solid rgba(239,68,68,0.4);color:#fca5a5;padding:12px 16px;border-radius:8px;margin-bottom:16px;">{html.escape(error_text)}</div>'
-        if error_text else ""
-    )
 
-    mfa_enabled = bool(db_user.get("mfa_enabled"))
-    mfa_required = bool(db_user.get("mfa_required"))
     mfa_pending_secret = db_user.get("mfa_pending_secret") or ""
     mfa_uri = build_totp_uri(mfa_pending_secret, db_user["username"]) if mfa_pending_secret else ""
-    mfa_qr_data_uri = build_totp_qr_data_uri(mfa_uri) if mfa_uri else ""
-    mfa_required_notice = (
-        '<div class="read-only" style="margin-bottom:12px;color:#fde68a;">'
-        "Your organisation currently requires MFA for this account."
-        "</div>"
-        if mfa_required else ""
-    )
-    mfa_disable_control = (
-        '<button type="submit" class="btn secondary">Disable MFA</button>'
-        if not mfa_required else
-        '<div class="read-only" style="color:#93c5fd;">'
-        "MFA is required for this account and can only be turned off by an administrator."
-        "</div>"
+    return templates.TemplateResponse(
+        "account.html",
+        {
+            "request": request,
+            "back_url": back_url,
+            "db_user": db_user,
+            "msg": msg,
+            "msg_text": msg_text,
+            "error_text": error_text,
+            "mfa_enabled": bool(db_user.get("mfa_enabled")),
+            "mfa_required": bool(db_user.get("mfa_required")),
+            "mfa_pending_secret": mfa_pending_secret,
+            "mfa_uri": mfa_uri,
+            "mfa_qr_data_uri": get_pending_totp_qr_data_uri(db_user["username"], mfa_uri) if mfa_uri else "",
+        },
     )
 
-    page_html = f"""<!DOCTYPE html>
-<html>
-<head>
-    <title>My Account</title>
-    <link rel="stylesheet" href="/static/css/site.css">
-    <style>
-        .account-wrap {{ max-width: 1400px; width: 95%; margin: 0 auto; padding: 14px 20px 32px; }}
-        .account-shell {{ max-width: 1280px; margin: 0 auto; }}
-        .page-title {{ font-size: 2em; color: white; margin: 0 0 6px 0; }}
-        .page-sub {{ color: var(--muted); margin: 0 0 28px 0; }}
-        .card {{
-            background: var(--card-bg);
-            border: 1px solid var(--card-border);
-            border-radius: 10px;
-            padding: 24px;
-            margin-bottom: 24px;
-        }}
-        .cards-grid {{
-            display: grid;
-            grid-template-columns: 1fr 1fr;
-            gap: 24px;
-            align-items: start;
-            margin-bottom: 24px;
-        }}
-        .cards-grid .card {{
-            margin-bottom: 0;
-        }}
-        .card h3 {{ margin-top: 0; color: rgba(255,255,255,0.9); font-size: 1.15em; }}
-        .form-group {{ display: flex; flex-direction: column; gap: 5px; margin-bottom: 16px; }}
-        .form-group label {{ font-size: 0.88em; color: rgba(255,255,255,0.65); font-weight: 500; }}
-        .form-group input {{
-            background: rgba(255,255,255,0.06);
-            border: 1px solid rgba(255,255,255,0.15);
-            border-radius: 6px;
-            color: #fff;
-            padding: 9px 12px;
-            font-size: 0.95em;
-        }}
-        .form-group input:focus {{ outline: none; border-color: rgba(31,111,235,0.6); }}
-        .topbar {{ display: flex; justify-content: space-between; align-items: center; gap: 10px; margin-bottom: 24px; }}
-        .topbar-actions {{ display: flex; gap: 10px; align-items: center; }}
-        .profile-grid {{ display: grid; grid-template-columns: 1fr 1fr; gap: 16px; }}
-        .read-only {{ color: rgba(255,255,255,0.5); font-size: 0.92em; padding: 8px 0; }}
-        @media (max-width: 900px) {{
-            .account-wrap {{ width: 100%; padding: 14px 12px 24px; box-sizing: border-box; }}
-            .profile-grid {{ grid-template-columns: 1fr; }}
-            .cards-grid {{ grid-template-columns: 1fr; }}
-        }}
-        @media (max-width: 640px) {{
-            .topbar {{ flex-direction: column; align-items: stretch; }}
-            .topbar-actions {{ width: 100%; justify-content: space-between; }}
-        }}
-    </style>
-</head>
-<body>
-<div id="session-expiry-warning" style="display:none;position:fixed;top:0;left:0;right:0;z-index:9999;
-    background:rgba(234,179,8,0.95);color:#1a1200;text-align:center;padding:10px 16px;font-weight:600;font-size:14px;">
-    ⚠️ Your session will expire soon due to inactivity.
-    <button onclick="document.getElementById('session-expiry-warning').style.display='none'"
-        style="margin-left:16px;background:rgba(0,0,0,0.15);border:none;border-radius:4px;padding:4px 10px;cursor:pointer;font-weight:600;">
-        Dismiss
-    </button>
-</div>
-<div class="account-wrap">
-    <div class="account-shell">
-    <div class="topbar">
-        <a href="{back_url}" class="btn secondary">&larr; Back</a>
-        <div class="topbar-actions">
-            <a href="/logout" class="btn secondary">Logout</a>
-        </div>
-    </div>
-    <h1 class="page-title">My Account</h1>
-    <p class="page-sub">Edit your personal details. Role and permissions are managed by your administrator.</p>
-
-    {msg_html}{error_html}
-
-    <div class="cards-grid">
-    <!-- Profile Details -->
-    <div class="card">
-        <h3>Personal Details</h3>
-        <form method="POST" action="/account/edit">
-            <div class="profile-grid">
-                <div class="form-group" style="flex:1;">
-                    <label>First Name</label>
-                    <input type="text" name="first_name" value="{db_user.get('first_name') or ''}">
-                </div>
-                <div class="form-group" style="flex:1;">
-                    <label>Surname</label>
-                    <input type="text" name="surname" value="{db_user.get('surname') or ''}">
-                </div>
-            </div>
-            <div class="form-group">
-                <label>Email Address</label>
-                <input type="email" name="email" value="{db_user.get('email') or ''}">
-            </div>
-            <div class="form-group">
-                <label>Username <span style="color:var(--muted);font-weight:400;">(cannot be changed)</span></label>
-                <div class="read-only">{db_user['username']}</div>
-            </div>
-            <button type="submit" class="btn btn-primary">Save Details</button>
-        </form>
-    </div>
-
-    <!-- Change Password -->
-    <div class="card">
-        <h3>Change Password</h3>
-        <form method="POST" action="/account/change-password">
-            <div class="form-group">
-                <label>Current Password</label>
-                <input type="password" name="current_password" required autocomplete="current-password">
-            </div>
-            <div class="form-group">
-                <label>New Password</label>
-                <input type="password" name="new_password" required autocomplete="new-password"
-                       minlength="8" placeholder="At least 8 characters">
-            </div>
-            <div class="form-group">
-                <label>Confirm New Password</label>
-                <input type="password" name="confirm_password" required autocomplete="new-password">
-            </div>
-            <button type="submit" class="btn btn-primary">Change Password</button>
-        </form>
-    </div>
-    </div>
-
-    <div class="card">
-        <h3>Authenticator App MFA</h3>
-        <p class="page-sub" style="margin-bottom:16px;">Use Microsoft Authenticator, Google Authenticator, or another TOTP app for a second sign-in step.</p>
-        {mfa_required_notice}
-        {(
-            f'''
-        <div class="read-only" style="margin-bottom:12px;color:#4ade80;">Authenticator-based MFA is enabled for this account.</div>
-        <form method="POST" action="/account/mfa/disable">
-            <div class="form-group">
-                <label>Current Password</label>
-                <input type="password" name="current_password" required autocomplete="current-password">
-            </div>
-            <div class="form-group">
-                <label>Authenticator Code</label>
-                <input type="text" name="code" inputmode="numeric" pattern="[0-9]{{6}}" maxlength="6" placeholder="123456" required>
-            </div>
-            {mfa_disable_control}
-        </form>
-            '''
-            if mfa_enabled else
-            (
-                f'''
-        <div class="read-only" style="margin-bottom:12px;">Setup is in progress. Add this secret to your authenticator app and then verify with a current 6-digit code.</div>
-        <div style="display:flex;justify-content:center;margin:8px 0 18px;">
-            <img src="{mfa_qr_data_uri}" alt="MFA QR code" style="background:#fff;padding:10px;border-radius:10px;max-width:220px;width:100%;height:auto;">
-        </div>
-        <div class="form-group">
-            <label>Manual Setup Secret</label>
-            <input type="text" value="{mfa_pending_secret}" readonly>
-        </div>
-        <div class="form-group">
-            <label>Setup URI</label>
-            <input type="text" value="{html.escape(mfa_uri, quote=True)}" readonly>
-        </div>
-        <form method="POST" action="/account/mfa/enable">
-            <div class="form-group">
-                <label>6-Digit Code From App</label>
-                <input type="text" name="code" inputmode="numeric" pattern="[0-9]{{6}}" maxlength="6" placeholder="123456" required>
-            </div>
-            <button type="submit" class="btn btn-primary">Enable MFA</button>
-        </form>
-                '''
-                if mfa_pending_secret else
-                '''
-        <div class="read-only" style="margin-bottom:12px;">Authenticator-based MFA is currently disabled.</div>
-        <form method="POST" action="/account/mfa/begin">
-            <button type="submit" class="btn btn-primary">Set Up Authenticator App</button>
-        </form>
-                '''
-            )
-        )}
-    </div>
-    </div>
-</div>
-<script src="/static/js/session.js"></script>
-</body>
-</html>"""
-
-    return HTMLResponse(content=page_html)
-
 
 @app.post("/account/edit")
 def account_edit(
@@ -11053,7 +11623,7 @@ def account_change_password(
         return RedirectResponse(url="/account?error=pw_wrong", status_code=303)
 
     # Set new password
-    new_salt = secrets.token_bytes(16)
+    new_salt = new_password_salt()
     new_hash = hash_password(new_password, new_salt)
 
     conn = get_db()
@@ -11081,6 +11651,7 @@ def account_mfa_begin(request: Request):
     )
     conn.commit()
     conn.close()
+    discard_pending_totp_qr(user["username"])
     return RedirectResponse(url="/account?msg=mfa_started", status_code=303)
 
 
@@ -11110,6 +11681,7 @@ def account_mfa_enable(request: Request, code: str = Form(...)):
     )
     conn.commit()
     conn.close()
+    discard_pending_totp_qr(user["username"])
     user["mfa_enabled"] = 1
     request.session["user"] = user
     return RedirectResponse(url="/account?msg=mfa_enabled", status_code=303)
@@ -11152,6 +11724,7 @@ def account_mfa_disable(
     )
     conn.commit()
     conn.close()
+    discard_pending_totp_qr(user["username"])
     user["mfa_enabled"] = 0
     request.session["user"] = user
     return RedirectResponse(url="/account?msg=mfa_disabled", status_code=303)
@@ -65,49 +65,37 @@
     backdrop.classList.add("open");
   }
 
-  function interceptConfirmedForm(form) {
-    if (!form || form.dataset.confirmHandled === "1") {
+  // One delegated listener covers every confirm form on the page, including rows added later,
+  // instead of binding a handler to each form on load.
+  function handleConfirmedSubmit(event) {
+    const form = event.target;
+    if (!(form instanceof HTMLFormElement) || !form.dataset.confirmMessage) {
       return;
     }
-    form.dataset.confirmHandled = "1";
-    form.addEventListener("submit", function (event) {
-      if (form.dataset.confirmBypassed === "1") {
-        delete form.dataset.confirmBypassed;
-        return;
-      }
-      const message = form.dataset.confirmMessage;
-      if (!message) {
-        return;
-      }
-      event.preventDefault();
-      openModal({
-        title: form.dataset.confirmTitle || "Confirm Action",
-        message: message,
-        confirmLabel: form.dataset.confirmLabel || "Delete",
-        confirmClass: form.dataset.confirmClass || "btn-danger",
-        onConfirm: function () {
-          form.dataset.confirmBypassed = "1";
-          if (form.requestSubmit) {
-            form.requestSubmit();
-          } else {
-            form.submit();
-          }
-        },
-      });
+    if (form.dataset.confirmBypassed === "1") {
+      delete form.dataset.confirmBypassed;
+      return;
+    }
+    event.preventDefault();
+    openModal({
+      title: form.dataset.confirmTitle || "Confirm Action",
+      message: form.dataset.confirmMessage,
+      confirmLabel: form.dataset.confirmLabel || "Delete",
+      confirmClass: form.dataset.confirmClass || "btn-danger",
+      onConfirm: function () {
+        form.dataset.confirmBypassed = "1";
+        if (form.requestSubmit) {
+          form.requestSubmit();
+        } else {
+          form.submit();
+        }
+      },
     });
   }
 
-  function init() {
-    document.querySelectorAll("form[data-confirm-message]").forEach(interceptConfirmedForm);
-  }
-
   window.showConfirmModal = function (options) {
     openModal(options || {});
   };
 
-  if (document.readyState === "loading") {
-    document.addEventListener("DOMContentLoaded", init);
-  } else {
-    init();
-  }
+  document.addEventListener("submit", handleConfirmedSubmit);
 })();
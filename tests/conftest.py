@@ -0,0 +1,6 @@
+import os
+import tempfile
+
+# app.main opens and initialises DB_PATH at import time; point every test run at a throwaway
+# database before any test module imports it, so the repo's hub.db is never touched.
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="radflow-tests-"), "hub.db")
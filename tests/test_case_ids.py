@@ -0,0 +1,73 @@
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+from app.main import generate_case_ids
+
+
+def legacy_max_sequence(case_ids: list[str], prefix: str) -> int:
+    """The original Python scan: highest all-digit suffix after the last '-'."""
+    max_seq = 0
+    for case_id in case_ids:
+        if not case_id.startswith(prefix):
+            continue
+        suffix = case_id.rsplit("-", 1)[-1]
+        if suffix.isdigit():
+            max_seq = max(max_seq, int(suffix))
+    return max_seq
+
+
+class GenerateCaseIdsTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmpdir.name) / "case_ids.db"
+        self.date_prefix = datetime.now(timezone.utc).strftime("%Y%m%d")
+        self.case_ids = [
+            f"{self.date_prefix}-ABC-0009",
+            f"{self.date_prefix}-ABC-0010",
+            f"{self.date_prefix}-ABC-X12",
+            f"{self.date_prefix}-ABD-0050",
+            f"{self.date_prefix}-0007",
+            "19990101-ABC-0999",
+        ]
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE cases (id TEXT PRIMARY KEY)")
+        conn.executemany("INSERT INTO cases (id) VALUES (?)", [(case_id,) for case_id in self.case_ids])
+        conn.commit()
+        conn.close()
+
+        patchers = [
+            patch("app.main.DB_PATH", self.db_path),
+            patch("app.main.DATABASE_URL", ""),
+            patch("app.main.get_institution", return_value={"id": 1, "name": "Abc General Hospital"}),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def test_institution_sequence_ignores_non_numeric_and_other_institutions(self):
+        prefix = f"{self.date_prefix}-ABC-"
+        expected_seq = legacy_max_sequence(self.case_ids, prefix) + 1
+        self.assertEqual(expected_seq, 11)
+        self.assertEqual(
+            generate_case_ids(2, institution_id=1),
+            [f"{prefix}{expected_seq:04d}", f"{prefix}{expected_seq + 1:04d}"],
+        )
+
+    def test_sequence_without_institution_matches_legacy_scan(self):
+        prefix = f"{self.date_prefix}-"
+        expected_seq = legacy_max_sequence(self.case_ids, prefix) + 1
+        self.assertEqual(expected_seq, 51)
+        self.assertEqual(generate_case_ids(1), [f"{prefix}{expected_seq:04d}"])
+
+    def test_sequence_starts_at_one_for_a_new_prefix(self):
+        with patch("app.main.get_institution", return_value={"id": 2, "name": "Zeta Clinic"}):
+            self.assertEqual(generate_case_ids(1, institution_id=2), [f"{self.date_prefix}-ZET-0001"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+from datetime import datetime, timezone
 from unittest.mock import patch
 
 from app.main import (
@@ -7,13 +8,16 @@ from app.main import (
     display_case_event_label,
     display_case_status,
     display_decision_label,
+    format_display_datetime,
     format_exam_label,
+    format_tat,
     find_matching_exam_catalogue_item,
     get_exam_catalogue_review_summary,
     get_report_sent_summary,
     normalize_decision_label,
     resolve_case_exam_selection,
     should_allow_same_origin_frame,
+    tat_seconds,
 )
 
 
@@ -139,6 +143,42 @@ class DisplayHelperTests(unittest.TestCase):
         self.assertIsNotNone(match)
         self.assertEqual(match["id"], 11)
 
+    def test_format_display_datetime_handles_z_suffix_and_offsets(self):
+        self.assertEqual(format_display_datetime("2026-04-09T09:15:00Z"), "09/04/2026 09:15")
+        self.assertEqual(format_display_datetime("2026-04-09T10:15:00+01:00"), "09/04/2026 09:15")
+        self.assertEqual(format_display_datetime("2026-04-09T09:15:00"), "09/04/2026 09:15")
+
+    def test_format_display_datetime_passes_through_unparseable_values(self):
+        self.assertEqual(format_display_datetime("not a date"), "not a date")
+        self.assertEqual(format_display_datetime("  ", "-"), "-")
+        self.assertEqual(format_display_datetime(None, "-"), "-")
+
+    def test_tat_seconds_accepts_parsed_created_at_and_explicit_now(self):
+        created = datetime(2026, 4, 9, 9, 0, tzinfo=timezone.utc)
+        now = datetime(2026, 4, 9, 10, 30, tzinfo=timezone.utc)
+        self.assertEqual(tat_seconds(created, None, now), 5400)
+        self.assertEqual(tat_seconds("2026-04-09T09:00:00Z", None, now), 5400)
+
+    def test_tat_seconds_prefers_vetted_at_over_now(self):
+        now = datetime(2026, 4, 10, 9, 0, tzinfo=timezone.utc)
+        self.assertEqual(tat_seconds("2026-04-09T09:00:00Z", "2026-04-09T09:45:00+00:00", now), 2700)
+
+    def test_tat_seconds_handles_unparseable_and_future_values(self):
+        now = datetime(2026, 4, 9, 9, 0, tzinfo=timezone.utc)
+        self.assertEqual(tat_seconds("not a date", None, now), 0)
+        self.assertEqual(tat_seconds(None, None, now), 0)
+        self.assertEqual(tat_seconds("2026-04-09T10:00:00Z", None, now), 0)
+
+    def test_format_tat_boundaries(self):
+        self.assertEqual(format_tat(0), "<1m")
+        self.assertEqual(format_tat(59), "<1m")
+        self.assertEqual(format_tat(60), "1m")
+        self.assertEqual(format_tat(3599), "59m")
+        self.assertEqual(format_tat(3600), "01h 00m")
+        self.assertEqual(format_tat(86399), "23h 59m")
+        self.assertEqual(format_tat(86400), "1d 00h 00m")
+        self.assertEqual(format_tat(2 * 86400 + 3 * 3600 + 4 * 60 + 5), "2d 03h 04m")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import uuid
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+import app.main as main
+
+
+class ResetPasswordTests(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(main.app)
+        self.username = f"reset-{uuid.uuid4().hex[:8]}"
+        self.token = main.generate_token()
+        salt = main.new_password_salt()
+        now = main.utc_now_iso()
+
+        conn = main.get_db()
+        self.user_id = main.insert_returning_id(
+            conn,
+            """
+            INSERT INTO users(username, email, password_hash, salt_hex, is_superuser, is_active, created_at, modified_at)
+            VALUES (?, ?, ?, ?, 0, 1, ?, ?)
+            """,
+            (self.username, f"{self.username}@example.com", main.hash_password("original-pass", salt).hex(), salt.hex(), now, now),
+        )
+        conn.execute(
+            """
+            INSERT INTO password_reset_tokens (user_id, token_hash, expires_at, used_at, created_at)
+            VALUES (?, ?, ?, NULL, ?)
+            """,
+            (
+                self.user_id,
+                main.hash_token(self.token),
+                (datetime.now(timezone.utc) + timedelta(minutes=60)).isoformat(),
+                now,
+            ),
+        )
+        conn.commit()
+        conn.close()
+
+    def stored_credentials(self) -> tuple[str, str]:
+        conn = main.get_db()
+        row = conn.execute("SELECT password_hash, salt_hex FROM users WHERE id = ?", (self.user_id,)).fetchone()
+        conn.close()
+        return row["password_hash"], row["salt_hex"]
+
+    def submit(self, password: str):
+        return self.client.post(
+            "/reset-password",
+            data={"token": self.token, "password": password, "confirm_password": password},
+            follow_redirects=False,
+        )
+
+    def test_second_submit_with_same_token_is_rejected(self):
+        first = self.submit("first-new-pass")
+        self.assertEqual(first.status_code, 303)
+        after_first = self.stored_credentials()
+
+        second = self.submit("second-new-pass")
+        self.assertEqual(second.status_code, 400)
+        self.assertIn("Reset link already used.", second.text)
+        self.assertEqual(self.stored_credentials(), after_first)
+
+    def test_token_claimed_by_concurrent_submit_is_rejected(self):
+        before = self.stored_credentials()
+        real_hash_password = main.hash_password
+
+        def hash_after_concurrent_claim(password, salt):
+            # Another submit claims the token after this one has read it as unused.
+            conn = main.get_db()
+            conn.execute(
+                "UPDATE password_reset_tokens SET used_at = ? WHERE token_hash = ?",
+                (main.utc_now_iso(), main.hash_token(self.token)),
+            )
+            conn.commit()
+            conn.close()
+            return real_hash_password(password, salt)
+
+        with patch("app.main.hash_password", side_effect=hash_after_concurrent_claim):
+            response = self.submit("racing-new-pass")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Reset link already used.", response.text)
+        self.assertEqual(self.stored_credentials(), before)
+
+
+if __name__ == "__main__":
+    unittest.main()
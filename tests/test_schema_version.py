@@ -0,0 +1,33 @@
+import unittest
+
+import app.main as main
+
+
+def ensure_example_schema() -> None:
+    pass
+
+
+class SchemaVersionTests(unittest.TestCase):
+    def test_startup_stamps_the_derived_version(self):
+        self.assertTrue(main.SCHEMA_VERSION)
+        self.assertEqual(main.get_setting("schema_version", ""), main.SCHEMA_VERSION)
+        self.assertTrue(main.schema_is_current())
+
+    def test_version_changes_when_the_migration_set_changes(self):
+        base = (main.init_db, *main.SCHEMA_UPGRADES)
+        self.assertEqual(main.compute_schema_version(base), main.SCHEMA_VERSION)
+        self.assertNotEqual(main.compute_schema_version((*base, ensure_example_schema)), main.SCHEMA_VERSION)
+
+    def test_every_ensure_schema_function_is_versioned(self):
+        # Always-run steps are deliberately outside the gate.
+        always_run = {"ensure_extended_identity_schema"}
+        versioned = {upgrade.__name__ for upgrade in main.SCHEMA_UPGRADES}
+        defined = {
+            name
+            for name, value in vars(main).items()
+            if name.startswith("ensure_") and name.endswith("_schema") and callable(value)
+        }
+        self.assertEqual(defined - always_run - versioned, set())
+
+    def test_missing_source_never_counts_as_current(self):
+        self.assertEqual(main.compute_schema_version((len,)), "")
@@ -0,0 +1,107 @@
+import time
+import unittest
+from unittest.mock import patch
+
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.main import (
+    SESSION_REFRESH_SECONDS,
+    SESSION_TIMEOUT_MINUTES,
+    SlidingSessionMiddleware,
+    get_session_user,
+)
+
+SECRET = "test-session-secret"
+MAX_AGE = SESSION_TIMEOUT_MINUTES * 60
+
+
+async def login(request):
+    # age lets a test start from a session whose login_time is already in the past.
+    age = float(request.query_params.get("age", "0"))
+    request.session["user"] = {"username": "alice"}
+    request.session["login_time"] = time.time() - age
+    return PlainTextResponse("ok")
+
+
+async def whoami(request):
+    user = get_session_user(request)
+    return PlainTextResponse(user["username"] if user else "anonymous")
+
+
+async def logout(request):
+    request.session.clear()
+    return PlainTextResponse("bye")
+
+
+def build_app() -> Starlette:
+    app = Starlette(
+        routes=[
+            Route("/login", login),
+            Route("/whoami", whoami),
+            Route("/logout", logout),
+        ]
+    )
+    app.add_middleware(SlidingSessionMiddleware, secret_key=SECRET, same_site="lax", max_age=MAX_AGE)
+    return app
+
+
+class SlidingSessionMiddlewareTests(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(build_app())
+
+    def test_login_sets_signed_cookie(self):
+        response = self.client.get("/login")
+        set_cookie = response.headers.get("set-cookie", "")
+        self.assertTrue(set_cookie.startswith("session="))
+        self.assertIn(f"Max-Age={MAX_AGE}", set_cookie)
+
+    def test_unchanged_session_within_refresh_window_sends_no_cookie(self):
+        self.client.get("/login")
+        response = self.client.get("/whoami")
+        self.assertEqual(response.text, "alice")
+        self.assertNotIn("set-cookie", response.headers)
+
+    def test_refresh_after_window_resigns_cookie(self):
+        self.client.get(f"/login?age={SESSION_REFRESH_SECONDS + 1}")
+        old_cookie = self.client.cookies.get("session")
+
+        response = self.client.get("/whoami")
+        self.assertEqual(response.text, "alice")
+        self.assertTrue(response.headers.get("set-cookie", "").startswith("session="))
+        self.assertNotEqual(self.client.cookies.get("session"), old_cookie)
+
+        # The refreshed login_time is now current, so the next request is quiet again.
+        self.assertNotIn("set-cookie", self.client.get("/whoami").headers)
+
+    def test_logout_expires_cookie(self):
+        self.client.get("/login")
+        response = self.client.get("/logout")
+        set_cookie = response.headers.get("set-cookie", "")
+        self.assertTrue(set_cookie.startswith("session=null;"))
+        self.assertIn("expires=Thu, 01 Jan 1970 00:00:00 GMT", set_cookie)
+
+    def test_inactivity_timeout_expires_cookie(self):
+        self.client.get(f"/login?age={MAX_AGE + 1}")
+        response = self.client.get("/whoami")
+        self.assertEqual(response.text, "anonymous")
+        self.assertTrue(response.headers.get("set-cookie", "").startswith("session=null;"))
+
+    def test_expired_signature_yields_empty_session(self):
+        # Signed MAX_AGE + 10 seconds ago, with a login_time that is still current.
+        with patch("time.time", return_value=time.time() - MAX_AGE - 10):
+            self.client.get(f"/login?age={-(MAX_AGE + 10)}")
+        response = self.client.get("/whoami")
+        self.assertEqual(response.text, "anonymous")
+        self.assertNotIn("set-cookie", response.headers)
+
+    def test_tampered_cookie_yields_empty_session(self):
+        self.client.get("/login")
+        self.client.cookies.set("session", self.client.cookies.get("session") + "x")
+        self.assertEqual(self.client.get("/whoami").text, "anonymous")
+
+
+if __name__ == "__main__":
+    unittest.main()